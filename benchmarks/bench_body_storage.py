@@ -0,0 +1,128 @@
+"""
+Benchmark: espacio que ocupan los cuerpos de una campaña antes y después de
+moverlos a email_contents (direccionados por contenido y comprimidos)
+
+Genera una campaña sintética en una base SQLite con el esquema anterior
+(body y html_body como TEXT en emails), mide el archivo, la migra con
+migrate_email_bodies.py y lo vuelve a medir.
+
+- --emails: destinatarios de la campaña
+- --variants: renders distintos que comparten los no personalizados
+  (ej: versiones de un test A/B)
+- --personalized: proporción de emails con un render propio (nombre del
+  destinatario en la plantilla), que no se puede deduplicar
+
+Ejecutar: python -m benchmarks.bench_body_storage --emails 20000 --personalized 0.2
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, text
+from migrate_email_bodies import drop_legacy_columns, ensure_schema, migrate, storage_totals, vacuum
+from utils.template_engine import Jinja2TemplateEngine
+
+BODY = "Por favor, visualiza este email en un cliente compatible con HTML."
+
+LEGACY_SCHEMA = """
+CREATE TABLE emails (
+    id INTEGER PRIMARY KEY,
+    recipient VARCHAR(255) NOT NULL,
+    subject VARCHAR(500) NOT NULL,
+    body TEXT,
+    html_body TEXT,
+    status VARCHAR(7) NOT NULL,
+    error_message TEXT,
+    sent_at DATETIME,
+    claimed_at DATETIME,
+    next_attempt_at DATETIME,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL
+)
+"""
+
+
+def campaign(engine: Jinja2TemplateEngine, template: str, emails: int, variants: int, personalized: float):
+    """Filas de la campaña: los primeros `personalized` con render propio, el resto repartido en `variants`"""
+    context = {"empresa": "TechCorp", "mensaje_adicional": "Tu cuenta ha sido activada"}
+    shared = [engine.render(template, {**context, "nombre": f"Variante {i}"}) for i in range(variants)]
+    personalized_count = int(emails * personalized)
+    now = datetime.utcnow()
+
+    for i in range(emails):
+        if i < personalized_count:
+            html_body = engine.render(template, {**context, "nombre": f"Usuario {i}"})
+        else:
+            html_body = shared[i % variants]
+        yield {
+            "recipient": f"user{i}@example.com",
+            "subject": "Bienvenido a TechCorp",
+            "body": BODY,
+            "html_body": html_body,
+            "status": "PENDING",
+            "created_at": now,
+            "updated_at": now
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=20000)
+    parser.add_argument("--variants", type=int, default=3)
+    parser.add_argument("--personalized", type=float, default=0.2, help="Proporción de renders personalizados (0-1)")
+    parser.add_argument("--templates-dir", default="templates")
+    parser.add_argument("--template", default="welcome.html")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_body_storage_")
+    path = os.path.join(directory, "emails.db")
+    engine = create_engine(f"sqlite:///{path}")
+
+    try:
+        rows = list(campaign(
+            Jinja2TemplateEngine(args.templates_dir), args.template,
+            args.emails, args.variants, args.personalized
+        ))
+        with engine.begin() as conn:
+            conn.execute(text(LEGACY_SCHEMA))
+            conn.execute(text(
+                "INSERT INTO emails (recipient, subject, body, html_body, status, created_at, updated_at) "
+                "VALUES (:recipient, :subject, :body, :html_body, :status, :created_at, :updated_at)"
+            ), rows)
+        vacuum(engine)
+        before = os.path.getsize(path)
+
+        started = time.perf_counter()
+        ensure_schema(engine)
+        report = migrate(engine)
+        drop_legacy_columns(engine)
+        elapsed = time.perf_counter() - started
+        vacuum(engine)
+        after = os.path.getsize(path)
+
+        totals = storage_totals(engine)
+        print(json.dumps({
+            "emails": args.emails,
+            "variants": args.variants,
+            "personalized": args.personalized,
+            "distinct_contents": totals["contents"],
+            "text_bytes": report["text_bytes"],
+            "stored_text_bytes": totals["text_bytes"],
+            "stored_compressed_bytes": totals["compressed_bytes"],
+            "database_bytes_before": before,
+            "database_bytes_after": after,
+            "reduction": round(1 - after / before, 3),
+            "migration_seconds": round(elapsed, 2)
+        }, indent=2))
+    finally:
+        engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
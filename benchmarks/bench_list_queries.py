@@ -0,0 +1,107 @@
+"""
+Benchmark: costo de una página de GET /emails/ cargando objetos del ORM
+vs. una consulta de columnas (EmailSummary)
+
+- orm: session.query(Email) + EmailResponse (comportamiento anterior)
+- projection: EmailRepository.get_all (columnas de EmailSummary, sin
+  identity map)
+- projection_with_bodies: get_all + get_contents (include_body=true), con el
+  cache de cuerpos vacío
+
+Usa una base SQLite temporal. Reporta páginas/segundo y el pico de memoria
+asignada por página (tracemalloc).
+
+Ejecutar: python -m benchmarks.bench_list_queries --emails 5000 --page-size 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=500, help="Páginas por escenario")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_list_queries_")
+    # La conexión se configura al importar: la URL debe estar antes
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'emails.db')}"
+
+    from config.database.connection import SessionLocal, engine, init_db
+    from models.email_model import Email
+    from repositories.email_repository import EmailRepository
+    from schemas.email_schema import EmailCreate, EmailResponse
+    from utils.content_store import CONTENT_CACHE
+
+    try:
+        init_db()
+        db = SessionLocal()
+        repository = EmailRepository(db)
+        html = "<html><body>" + "<p>Contenido de la campaña</p>" * 200 + "</body></html>"
+        asyncio.run(repository.create_many([
+            EmailCreate(recipient=f"user{i}@example.com", subject="Campaña", body="Hola", html_body=f"{html}{i}")
+            for i in range(args.emails)
+        ]))
+
+        def orm_page():
+            emails = (
+                db.query(Email)
+                .order_by(Email.created_at.desc(), Email.id.desc())
+                .limit(args.page_size)
+                .all()
+            )
+            result = [EmailResponse.model_validate(email) for email in emails]
+            db.expunge_all()
+            return result
+
+        def projection_page():
+            return [EmailResponse.model_validate(email) for email in asyncio.run(repository.get_all(limit=args.page_size))]
+
+        def projection_with_bodies_page():
+            CONTENT_CACHE.clear()
+            emails = asyncio.run(repository.get_all(limit=args.page_size))
+            contents = asyncio.run(repository.get_contents(
+                digest for email in emails for digest in (email.body_hash, email.html_body_hash) if digest
+            ))
+            return emails, contents
+
+        report = {"emails": args.emails, "page_size": args.page_size}
+        for name, page in (
+            ("orm", orm_page),
+            ("projection", projection_page),
+            ("projection_with_bodies", projection_with_bodies_page)
+        ):
+            page()
+            started = time.perf_counter()
+            for _ in range(args.pages):
+                page()
+            elapsed = time.perf_counter() - started
+
+            tracemalloc.start()
+            page()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            report[name] = {
+                "pages_per_second": round(args.pages / elapsed, 1),
+                "peak_kib_per_page": round(peak / 1024, 1)
+            }
+
+        db.close()
+        print(json.dumps(report, indent=2))
+    finally:
+        engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
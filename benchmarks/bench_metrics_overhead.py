@@ -0,0 +1,101 @@
+"""
+Benchmark: costo de la instrumentación de utils/metrics en el camino crítico
+
+- baseline: el mismo bucle sin instrumentar
+- observe: Histogram.observe() en una serie ya resuelta
+- timer: bloque `with serie.time()`
+- labels_observe: labels(...) + observe() (como SEND_SECONDS por resultado)
+- counter_inc: Counter.inc()
+- timed_coroutine: método async decorado con @timed (como el repositorio)
+
+Al final estima el costo por POST /emails/send sumando las observaciones que
+registra un envío síncrono (fases del servicio, repositorio y SMTP).
+
+Ejecutar: python -m benchmarks.bench_metrics_overhead --iterations 200000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from utils.metrics import MetricsRegistry, timed
+
+
+def per_op_ns(func, iterations: int) -> float:
+    started = time.perf_counter()
+    func(iterations)
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "bench", ["phase"])
+    counter = registry.counter("bench_events", "bench", ["outcome"])
+    series = histogram.labels("render")
+    events = counter.labels("sent")
+
+    def baseline(n):
+        for _ in range(n):
+            pass
+
+    def observe(n):
+        for _ in range(n):
+            series.observe(0.004)
+
+    def timer(n):
+        for _ in range(n):
+            with series.time():
+                pass
+
+    def labels_observe(n):
+        for _ in range(n):
+            histogram.labels("sent").observe(0.004)
+
+    def counter_inc(n):
+        for _ in range(n):
+            events.inc()
+
+    async def noop():
+        return None
+
+    decorated = timed(series)(noop)
+
+    def coroutine_loop(func):
+        async def run(n):
+            for _ in range(n):
+                await func()
+        return lambda n: asyncio.run(run(n))
+
+    base = per_op_ns(baseline, args.iterations)
+    report = {
+        "baseline_ns": round(base, 1),
+        "observe_ns": round(per_op_ns(observe, args.iterations) - base, 1),
+        "timer_ns": round(per_op_ns(timer, args.iterations) - base, 1),
+        "labels_observe_ns": round(per_op_ns(labels_observe, args.iterations) - base, 1),
+        "counter_inc_ns": round(per_op_ns(counter_inc, args.iterations) - base, 1)
+    }
+    plain = per_op_ns(coroutine_loop(noop), args.iterations)
+    report["timed_coroutine_ns"] = round(per_op_ns(coroutine_loop(decorated), args.iterations) - plain, 1)
+
+    # Un envío síncrono: 4 fases del servicio + resultado, 2 operaciones del
+    # repositorio (create y update_status), 2 fases SMTP
+    # (queue, send) y los contadores de intento y de envío SMTP
+    per_send_ns = (
+        4 * report["timer_ns"]
+        + report["labels_observe_ns"]
+        + 2 * report["timed_coroutine_ns"]
+        + 2 * report["timer_ns"]
+        + report["labels_observe_ns"]
+        + report["counter_inc_ns"]
+    )
+    report["estimated_per_send_us"] = round(per_send_ns / 1000, 2)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: mensajes/segundo de SMTPEmailSender con y sin pool de conexiones
+
+Ejecutar: python -m benchmarks.bench_smtp_pool --messages 500 --latency 0.002
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from benchmarks.smtp_sink import start_sink
+from utils.smtp_email_sender import SMTPEmailSender
+
+
+async def run(sender: SMTPEmailSender, messages: int) -> float:
+    """Envía `messages` emails y retorna los mensajes por segundo"""
+    started = time.perf_counter()
+    for i in range(messages):
+        ok = await sender.send(
+            recipient=f"user{i}@example.com",
+            subject="Benchmark",
+            body="Hola",
+            html_body="<p>Hola</p>"
+        )
+        if not ok:
+            raise RuntimeError("El envío falló durante el benchmark")
+    elapsed = time.perf_counter() - started
+    await sender.close()
+    return messages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.002, help="Latencia por comando del sink (s)")
+    parser.add_argument("--pool-size", type=int, default=5)
+    args = parser.parse_args()
+
+    sink = start_sink(latency=args.latency)
+    host, port = sink.server_address
+
+    results = {}
+    for label, pool_size in (("without_pool", 0), ("with_pool", args.pool_size)):
+        sender = SMTPEmailSender(
+            smtp_host=host,
+            smtp_port=port,
+            smtp_user="bench@example.com",
+            smtp_password="secret",
+            use_tls=False,
+            pool_size=pool_size
+        )
+        connections_before = sink.stats["connections"]
+        rate = asyncio.run(run(sender, args.messages))
+        results[label] = {
+            "messages_per_second": round(rate, 1),
+            "connections": sink.stats["connections"] - connections_before
+        }
+
+    results["speedup"] = round(
+        results["with_pool"]["messages_per_second"] / results["without_pool"]["messages_per_second"], 2
+    )
+    sink.shutdown()
+    print(json.dumps({"messages": args.messages, "latency": args.latency, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: envíos concurrentes con el cliente SMTP asíncrono vs smtplib en hilos
+
+Además del throughput mide el retraso máximo del event loop (un ticker que
+debería despertar cada 10 ms), que muestra si el envío lo está bloqueando.
+
+Ejecutar: python -m benchmarks.bench_smtp_transport --messages 1000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from benchmarks.smtp_sink import start_sink
+from interfaces.email_interfaces import IEmailSender, EmailDeliveryError
+from utils.async_smtp_sender import AsyncSMTPEmailSender
+from utils.smtp_email_sender import SMTPEmailSender
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Retorna el mayor retraso observado del event loop en segundos"""
+    worst = 0.0
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - expected)
+    return worst
+
+
+async def run(sender: IEmailSender, messages: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+
+    async def send_one(i: int) -> bool:
+        async with semaphore:
+            try:
+                return await sender.send(
+                    recipient=f"user{i}@example.com",
+                    subject="Benchmark",
+                    body="Hola",
+                    html_body="<p>Hola</p>"
+                )
+            except EmailDeliveryError:
+                return False
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(send_one(i) for i in range(messages)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    max_lag = await lag_task
+    await sender.close()
+
+    return {
+        "messages_per_second": round(messages / elapsed, 1),
+        "failed": results.count(False),
+        "max_loop_lag_ms": round(max_lag * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.005, help="Latencia por comando del sink (s)")
+    args = parser.parse_args()
+
+    sink = start_sink(latency=args.latency)
+    host, port = sink.server_address
+    common = dict(
+        smtp_host=host,
+        smtp_port=port,
+        smtp_user="bench@example.com",
+        smtp_password="secret",
+        use_tls=False,
+        pool_size=args.pool_size
+    )
+
+    results = {}
+    for label, factory in (("async", AsyncSMTPEmailSender), ("thread", SMTPEmailSender)):
+        results[label] = asyncio.run(run(factory(**common), args.messages, args.concurrency))
+
+    sink.shutdown()
+    print(json.dumps({
+        "messages": args.messages,
+        "concurrency": args.concurrency,
+        "pool_size": args.pool_size,
+        "latency": args.latency,
+        **results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: latencia de render de plantillas con el cache frío y caliente
+
+- per_request: un motor nuevo en cada render (comportamiento anterior de
+  get_template_engine: Environment nuevo y plantilla compilada desde disco)
+- bytecode_cache: un motor nuevo en cada render, pero con el bytecode en disco
+  (equivale al primer render de un proceso recién iniciado)
+- warm: un único motor compartido (la plantilla compilada queda en memoria)
+- mail_merge: render_many con --contexts contextos, en el proceso actual y
+  repartido entre --workers procesos
+
+Ejecutar: python -m benchmarks.bench_template_render --renders 2000 --contexts 20000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List
+from utils.template_engine import Jinja2TemplateEngine, SimpleTemplateEngine
+
+
+CONTEXT = {
+    "nombre": "Juan",
+    "empresa": "TechCorp",
+    "mensaje_adicional": "Tu cuenta ha sido activada",
+    "link_accion": "https://example.com"
+}
+
+
+def measure(render: Callable[[], str], renders: int) -> Dict[str, float]:
+    """Ejecuta `renders` renders y resume la latencia en microsegundos"""
+    latencies: List[float] = []
+    for _ in range(renders):
+        started = time.perf_counter()
+        render()
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    return {
+        "renders": renders,
+        "mean_us": round(sum(latencies) / renders * 1e6, 1),
+        "p50_us": round(latencies[renders // 2] * 1e6, 1),
+        "p99_us": round(latencies[min(renders - 1, int(renders * 0.99))] * 1e6, 1)
+    }
+
+
+def measure_merge(engine: Jinja2TemplateEngine, template: str, contexts: int) -> Dict[str, float]:
+    """Renderiza `contexts` contextos con render_many y retorna renders/segundo"""
+    started = time.perf_counter()
+    errors = 0
+    for result in engine.render_many(template, ({**CONTEXT, "nombre": f"user{i}"} for i in range(contexts))):
+        errors += result.error is not None
+    elapsed = time.perf_counter() - started
+    engine.close()
+    return {"contexts": contexts, "renders_per_second": round(contexts / elapsed, 1), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=2000)
+    parser.add_argument("--templates-dir", default="templates")
+    parser.add_argument("--template", default="welcome.html")
+    parser.add_argument("--contexts", type=int, default=20000, help="Contextos del mail-merge")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos del mail-merge")
+    args = parser.parse_args()
+
+    bytecode_dir = tempfile.mkdtemp(prefix="bench_jinja_")
+    try:
+        def per_request():
+            return Jinja2TemplateEngine(args.templates_dir).render(args.template, CONTEXT)
+
+        def bytecode_cache():
+            engine = Jinja2TemplateEngine(args.templates_dir, bytecode_cache_dir=bytecode_dir)
+            return engine.render(args.template, CONTEXT)
+
+        shared = Jinja2TemplateEngine(args.templates_dir)
+
+        def warm():
+            return shared.render(args.template, CONTEXT)
+
+        # El motor simple usa str.format(): una plantilla sin llaves de Jinja
+        simple_dir = tempfile.mkdtemp(prefix="bench_simple_")
+        with open(f"{simple_dir}/simple.html", "w", encoding="utf-8") as f:
+            f.write("<p>Hola {nombre}, bienvenido a {empresa}</p>" * 50)
+        simple_shared = SimpleTemplateEngine(simple_dir)
+
+        def simple_per_request():
+            return SimpleTemplateEngine(simple_dir).render("simple.html", CONTEXT)
+
+        def simple_warm():
+            return simple_shared.render("simple.html", CONTEXT)
+
+        # Llena el bytecode en disco antes de medir
+        bytecode_cache()
+
+        report = {
+            "jinja2": {
+                "per_request": measure(per_request, args.renders),
+                "bytecode_cache": measure(bytecode_cache, args.renders),
+                "warm": measure(warm, args.renders)
+            },
+            "mail_merge": {
+                "inline": measure_merge(Jinja2TemplateEngine(args.templates_dir), args.template, args.contexts),
+                f"processes_{args.workers}": measure_merge(
+                    Jinja2TemplateEngine(args.templates_dir, bytecode_cache_dir=bytecode_dir, render_workers=args.workers),
+                    args.template,
+                    args.contexts
+                )
+            },
+            "simple": {
+                "per_request": measure(simple_per_request, args.renders),
+                "warm": measure(simple_warm, args.renders)
+            }
+        }
+        shutil.rmtree(simple_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(bytecode_dir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
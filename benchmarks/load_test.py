@@ -0,0 +1,301 @@
+"""
+Prueba de carga HTTP para la API de emails
+
+Mide peticiones/segundo, latencias (p50/p95/p99) y tasa de errores de
+POST /emails/send, GET /emails/ y GET /emails/{id} con N peticiones
+concurrentes. Puede atacar un servidor ya levantado (--url) o levantar uno
+propio con uvicorn (--spawn), opcionalmente una vez por cada implementación
+del repositorio (--compare-repositories).
+
+Al levantar el servidor se puede usar:
+- --embedded-db: una base SQLite temporal en lugar de PostgreSQL
+- --smtp-sink: un servidor SMTP local que descarta los mensajes, con
+  latencia (--smtp-latency) y tasa de rechazos (--smtp-failure-rate)
+
+El reporte es JSON (--output lo guarda en un archivo). Con --baseline se
+compara contra un reporte anterior y el proceso termina con código 1 si el
+throughput bajó o el p95 subió más de --tolerance.
+
+Ejecutar:
+    python -m benchmarks.load_test --url http://127.0.0.1:8000
+    python -m benchmarks.load_test --spawn --embedded-db --smtp-sink --smtp-latency 0.005 --output baseline.json
+    python -m benchmarks.load_test --spawn --embedded-db --smtp-sink --baseline baseline.json
+    python -m benchmarks.load_test --compare-repositories --requests 2000 --concurrency 50
+
+Requiere httpx (pip install -r benchmarks/requirements.txt).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+import httpx
+from benchmarks.smtp_sink import start_sink
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por el método del rango más cercano"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    make_request: Callable[[httpx.AsyncClient, int, List[int]], "asyncio.Future"],
+    email_ids: List[int],
+    requests: int,
+    concurrency: int
+) -> Dict[str, float]:
+    """Ejecuta `requests` peticiones con `concurrency` en vuelo y resume los resultados"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await make_request(client, i, email_ids)
+                statuses[str(response.status_code)] += 1
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "error_rate": round(errors / requests, 4),
+        "status_codes": dict(sorted(statuses.items()))
+    }
+
+
+def send_request(client: httpx.AsyncClient, i: int, email_ids: List[int]):
+    # Un dominio distinto cada 1000 envíos: los límites por dominio del
+    # scheduler de entrega no deben ser el cuello de botella de la prueba
+    return client.post("/emails/send", json={
+        "recipient": f"load{i}@d{i % 1000}.example.com",
+        "subject": "Prueba de carga",
+        "body": "Hola"
+    })
+
+
+def list_request(client: httpx.AsyncClient, i: int, email_ids: List[int]):
+    return client.get("/emails/", params={"page": 1, "page_size": 20})
+
+
+def get_request(client: httpx.AsyncClient, i: int, email_ids: List[int]):
+    return client.get(f"/emails/{email_ids[i % len(email_ids)]}")
+
+
+SCENARIOS = {
+    "send": send_request,
+    "list": list_request,
+    "get": get_request
+}
+
+
+async def collect_email_ids(client: httpx.AsyncClient, minimum: int = 100) -> List[int]:
+    """IDs de emails existentes para GET /emails/{id} (crea algunos si no hay)"""
+    response = await client.get("/emails/", params={"page_size": 100})
+    ids = [email["id"] for email in response.json()["emails"]]
+
+    for i in range(len(ids), minimum):
+        created = await send_request(client, i, ids)
+        if created.status_code < 400:
+            ids.append(created.json()["id"])
+
+    return ids
+
+
+async def run_all(url: str, scenarios: List[str], requests: int, concurrency: int) -> Dict[str, dict]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        email_ids = await collect_email_ids(client) if "get" in scenarios else []
+        results = {}
+        for name in scenarios:
+            results[name] = await run_scenario(client, SCENARIOS[name], email_ids, requests, concurrency)
+        return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def spawn_server(env_overrides: Dict[str, str], workers: int = 1) -> Iterator[str]:
+    """Levanta la app con uvicorn en un subproceso y espera a que responda"""
+    port = free_port()
+    env = {**os.environ, **env_overrides}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("El servidor terminó antes de estar listo")
+            try:
+                httpx.get(f"{url}/emails/", params={"page_size": 1}, timeout=1)
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("El servidor no respondió a tiempo")
+                time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+@contextmanager
+def embedded_database() -> Iterator[str]:
+    """Base SQLite en un directorio temporal (una por servidor levantado)"""
+    directory = tempfile.mkdtemp(prefix="load_test_db_")
+    try:
+        yield f"sqlite:///{os.path.join(directory, 'emails.db')}"
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def parse_env(pairs: Optional[List[str]]) -> Dict[str, str]:
+    env = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        env[key] = value
+    return env
+
+
+def find_regressions(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Compara throughput y p95 de cada escenario contra un reporte anterior"""
+    regressions = []
+    for label, scenarios in report["runs"].items():
+        for name, result in scenarios.items():
+            previous = baseline.get("runs", {}).get(label, {}).get(name)
+            if previous is None:
+                continue
+            if result["requests_per_second"] < previous["requests_per_second"] * (1 - tolerance):
+                regressions.append(
+                    f"{label}/{name}: {result['requests_per_second']} req/s "
+                    f"(baseline {previous['requests_per_second']})"
+                )
+            if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{label}/{name}: p95 {result['p95_ms']} ms (baseline {previous['p95_ms']})")
+            if result["error_rate"] > previous["error_rate"] + 0.01:
+                regressions.append(
+                    f"{label}/{name}: error_rate {result['error_rate']} (baseline {previous['error_rate']})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Servidor ya levantado (si se omite se usa --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="Levantar la app con uvicorn")
+    parser.add_argument("--compare-repositories", action="store_true",
+                        help="Levantar la app con DB_ASYNC=false y DB_ASYNC=true y comparar")
+    parser.add_argument("--env", action="append", help="Variable KEY=VALUE para el servidor levantado")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Escenarios a ejecutar")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn al usar --spawn")
+    parser.add_argument("--database-url", help="DATABASE_URL del servidor levantado")
+    parser.add_argument("--embedded-db", action="store_true", help="Usar una base SQLite temporal")
+    parser.add_argument("--smtp-sink", action="store_true", help="Enviar a un servidor SMTP local que descarta")
+    parser.add_argument("--smtp-latency", type=float, default=0.0, help="Segundos por comando del sink")
+    parser.add_argument("--smtp-failure-rate", type=float, default=0.0, help="Proporción de rechazos del sink (0-1)")
+    parser.add_argument("--output", help="Guardar el reporte JSON en este archivo")
+    parser.add_argument("--baseline", help="Reporte anterior contra el cual detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    scenarios = args.scenario or ["send", "list", "get"]
+    # El repositorio síncrono bloquea el event loop si espera una conexión del
+    # pool: el pool debe cubrir todas las peticiones en vuelo
+    env = {"ENVIRONMENT": "development", "DB_POOL_SIZE": str(args.concurrency), **parse_env(args.env)}
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+
+    sink = None
+    if args.smtp_sink:
+        sink = start_sink(latency=args.smtp_latency, failure_rate=args.smtp_failure_rate)
+        host, port = sink.server_address
+        env.update(
+            ENVIRONMENT="production",
+            SMTP_HOST=host,
+            SMTP_PORT=str(port),
+            SMTP_USER="load@example.com",
+            SMTP_PASSWORD="secret"
+        )
+
+    def run_spawned(overrides: Dict[str, str]) -> Dict[str, dict]:
+        server_env = {**env, **overrides}
+        if args.embedded_db and "DATABASE_URL" not in server_env:
+            with embedded_database() as database_url, spawn_server({**server_env, "DATABASE_URL": database_url}, args.workers) as url:
+                return asyncio.run(run_all(url, scenarios, args.requests, args.concurrency))
+        with spawn_server(server_env, args.workers) as url:
+            return asyncio.run(run_all(url, scenarios, args.requests, args.concurrency))
+
+    if args.compare_repositories:
+        runs = {
+            label: run_spawned({"DB_ASYNC": db_async})
+            for label, db_async in (("sync_repository", "false"), ("async_repository", "true"))
+        }
+    elif args.url and not args.spawn:
+        runs = {"default": asyncio.run(run_all(args.url, scenarios, args.requests, args.concurrency))}
+    else:
+        runs = {"default": run_spawned({})}
+
+    report = {"runs": runs}
+    if sink is not None:
+        report["smtp_sink"] = dict(sink.stats)
+        sink.shutdown()
+
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESIÓN {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
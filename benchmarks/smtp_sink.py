@@ -0,0 +1,179 @@
+"""
+Servidor SMTP local que acepta y descarta mensajes (para benchmarks)
+
+Ejecutar: python -m benchmarks.smtp_sink --port 1025 --latency 0.005
+"""
+
+import argparse
+import random
+import socket
+import socketserver
+import threading
+import time
+from typing import Tuple
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Implementa el subconjunto de SMTP que usan los senders de la app"""
+
+    def setup(self):
+        super().setup()
+        # Sin Nagle: las respuestas a comandos en PIPELINING salen de inmediato
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        sink: "SMTPSinkServer" = self.server
+        sink.record("connections")
+        self._reply("220 smtp-sink ESMTP ready")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            command = line.decode("utf-8", errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            sink.delay()
+
+            if verb == "EHLO":
+                self._reply(
+                    "250-smtp-sink",
+                    "250-PIPELINING",
+                    "250-AUTH PLAIN LOGIN",
+                    "250-8BITMIME",
+                    "250 SIZE 52428800"
+                )
+            elif verb == "HELO":
+                self._reply("250 smtp-sink")
+            elif verb == "AUTH":
+                self._auth(command)
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._data()
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+    def _auth(self, command: str) -> None:
+        parts = command.split()
+        mechanism = parts[1].upper() if len(parts) > 1 else ""
+
+        if mechanism == "PLAIN" and len(parts) > 2:
+            self._reply("235 Authentication successful")
+        elif mechanism == "PLAIN":
+            self._reply("334 ")
+            self.rfile.readline()
+            self._reply("235 Authentication successful")
+        elif mechanism == "LOGIN":
+            if len(parts) < 3:
+                self._reply("334 VXNlcm5hbWU6")
+                self.rfile.readline()
+            self._reply("334 UGFzc3dvcmQ6")
+            self.rfile.readline()
+            self._reply("235 Authentication successful")
+        else:
+            self._reply("504 Unrecognized authentication type")
+
+    def _data(self) -> None:
+        sink: "SMTPSinkServer" = self.server
+        self._reply("354 End data with <CR><LF>.<CR><LF>")
+
+        size = 0
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                break
+            size += len(line)
+
+        if sink.should_fail():
+            sink.record("failed")
+            self._reply(sink.failure_reply)
+        else:
+            sink.record("messages")
+            sink.record("bytes", size)
+            self._reply("250 OK queued")
+
+    def _reply(self, *lines: str) -> None:
+        self.wfile.write("".join(f"{line}\r\n" for line in lines).encode("utf-8"))
+
+
+class SMTPSinkServer(socketserver.ThreadingTCPServer):
+    """
+    Servidor SMTP que descarta los mensajes recibidos
+
+    Args:
+        address: (host, puerto); puerto 0 elige uno libre
+        latency: Segundos de espera antes de responder cada comando
+            (simula la latencia de red hasta el relay)
+        failure_rate: Proporción de mensajes rechazados al final de DATA
+        failure_reply: Respuesta SMTP usada para los rechazos
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # El backlog por defecto (5) descarta conexiones cuando muchos clientes conectan a la vez
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        failure_reply: str = "451 4.3.0 Temporary failure"
+    ):
+        super().__init__(address, SMTPSinkHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_reply = failure_reply
+        self.stats = {"connections": 0, "messages": 0, "failed": 0, "bytes": 0}
+        self._lock = threading.Lock()
+
+    def delay(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def should_fail(self) -> bool:
+        return self.failure_rate > 0 and random.random() < self.failure_rate
+
+    def record(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+
+def start_sink(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    failure_rate: float = 0.0
+) -> SMTPSinkServer:
+    """Inicia el sink en un hilo en segundo plano y lo retorna"""
+    server = SMTPSinkServer((host, port), latency=latency, failure_rate=failure_rate)
+    thread = threading.Thread(target=server.serve_forever, name="smtp-sink", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMTP sink para benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos por comando")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Proporción de rechazos (0-1)")
+    args = parser.parse_args()
+
+    server = SMTPSinkServer((args.host, args.port), latency=args.latency, failure_rate=args.failure_rate)
+    print(f"📭 SMTP sink escuchando en {args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"📊 {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
+import json
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,7 +11,19 @@ app_config = {
     "DESCRIPTION": "API for sending emails using FastAPI and Python",
     "CONTACT_NAME": "Administrador",
     "PORT": os.getenv("PORT") or 8000,
-    "HOST": os.getenv("HOST") or "0.0.0.0"
+    "HOST": os.getenv("HOST") or "0.0.0.0",
+    # Expone GET /metrics (formato Prometheus)
+    "METRICS_ENABLED": (os.getenv("METRICS_ENABLED") or "true").lower() == "true"
+}
+
+log_config = {
+    "LOG_LEVEL": os.getenv("LOG_LEVEL") or "INFO",
+    # "json": una línea JSON por registro | "text": formato legible para desarrollo
+    "LOG_FORMAT": os.getenv("LOG_FORMAT") or "json",
+    # Fracción de los eventos de éxito de alto volumen (ej: "Email enviado") que se registran
+    "LOG_SAMPLE_RATE": float(os.getenv("LOG_SAMPLE_RATE") or 1.0),
+    # Registros en espera de escribirse; con la cola llena se descartan
+    "LOG_QUEUE_SIZE": int(os.getenv("LOG_QUEUE_SIZE") or 10000)
 }
 
 database_config = {
@@ -17,5 +31,121 @@ database_config = {
     "DB_PORT": os.getenv("PGPORT") or 5432,
     "DB_USER": os.getenv("PGUSER") or "your_username",
     "DB_PASSWORD": os.getenv("PGPASSWORD") or "your_password",
-    "DB_NAME": os.getenv("PGDATABASE") or "your_database"
-}
\ No newline at end of file
+    "DB_NAME": os.getenv("PGDATABASE") or "your_database",
+    # URL completa de SQLAlchemy; reemplaza a las variables PG* (ej: sqlite:///./emails.db)
+    "DATABASE_URL": os.getenv("DATABASE_URL"),
+    # Pool del engine síncrono: con DB_ASYNC=false cada petición en curso ocupa una
+    # conexión, así que DB_POOL_SIZE + DB_MAX_OVERFLOW debe cubrir la concurrencia
+    "DB_POOL_SIZE": int(os.getenv("DB_POOL_SIZE") or 5),
+    "DB_MAX_OVERFLOW": int(os.getenv("DB_MAX_OVERFLOW") or 10),
+    # Filas que GET /emails/export lee del cursor del servidor en cada lote
+    "EXPORT_BATCH_SIZE": int(os.getenv("EXPORT_BATCH_SIZE") or 1000),
+    # Cache de GET /emails/{id}: segundos que una respuesta puede servirse sin
+    # consultar la base de datos (0 lo desactiva) y respuestas guardadas
+    "EMAIL_CACHE_TTL": float(os.getenv("EMAIL_CACHE_TTL") or 10),
+    "EMAIL_CACHE_SIZE": int(os.getenv("EMAIL_CACHE_SIZE") or 10000),
+    # true: repositorio con AsyncSession + asyncpg | false: Session + psycopg2
+    "DB_ASYNC": (os.getenv("DB_ASYNC") or "false").lower() == "true",
+    # Esquema al arrancar: "full" lo verifica y aplica siempre | "version" solo si
+    # cambió la versión registrada (una consulta) | "skip" no consulta la base
+    "SCHEMA_CHECK": (os.getenv("SCHEMA_CHECK") or "version").lower()
+}
+
+delivery_config = {
+    # "sync": envía dentro de la petición | "outbox": encola y envía en segundo plano
+    "DELIVERY_MODE": os.getenv("DELIVERY_MODE") or "sync",
+    "OUTBOX_WORKERS": int(os.getenv("OUTBOX_WORKERS") or 8),
+    "OUTBOX_BATCH_SIZE": int(os.getenv("OUTBOX_BATCH_SIZE") or 100),
+    "OUTBOX_POLL_INTERVAL": float(os.getenv("OUTBOX_POLL_INTERVAL") or 5),
+    "OUTBOX_LEASE_SECONDS": int(os.getenv("OUTBOX_LEASE_SECONDS") or 300),
+    # Workers adicionales que solo envían emails de una prioridad (high, normal, low):
+    # una campaña LOW no puede ocupar todos los workers y demorar los HIGH
+    "OUTBOX_RESERVED_WORKERS": json.loads(os.getenv("OUTBOX_RESERVED_WORKERS") or '{"high": 2}'),
+    # Envíos programados (send_at): segundos hacia adelante que se cargan en
+    # memoria en cada consulta y máximo de momentos distintos por consulta
+    "SCHEDULE_WINDOW": float(os.getenv("SCHEDULE_WINDOW") or 300),
+    "SCHEDULE_MAX_TIMERS": int(os.getenv("SCHEDULE_MAX_TIMERS") or 10000),
+    "BATCH_MAX_ITEMS": int(os.getenv("BATCH_MAX_ITEMS") or 10000),
+    "BATCH_SEND_CONCURRENCY": int(os.getenv("BATCH_SEND_CONCURRENCY") or 20),
+    # Scheduler de entrega: límites de envío por dominio destinatario y por relay
+    # (opcional: activarlo inicia el worker de reintentos también en modo sync)
+    "DELIVERY_SCHEDULER": (os.getenv("DELIVERY_SCHEDULER") or "false").lower() == "true",
+    # Segundos que un envío espera su turno antes de aplazarse
+    "DELIVERY_MAX_WAIT": float(os.getenv("DELIVERY_MAX_WAIT") or 5),
+    # Límites por defecto de cada dominio (rate en envíos/segundo; 0 = sin límite)
+    "DELIVERY_DOMAIN_RATE": float(os.getenv("DELIVERY_DOMAIN_RATE") or 10),
+    "DELIVERY_DOMAIN_BURST": int(os.getenv("DELIVERY_DOMAIN_BURST") or 20),
+    "DELIVERY_DOMAIN_CONCURRENCY": int(os.getenv("DELIVERY_DOMAIN_CONCURRENCY") or 5),
+    # Límites de cada relay SMTP (todos los dominios juntos)
+    "DELIVERY_RELAY_RATE": float(os.getenv("DELIVERY_RELAY_RATE") or 0),
+    "DELIVERY_RELAY_BURST": int(os.getenv("DELIVERY_RELAY_BURST") or 100),
+    "DELIVERY_RELAY_CONCURRENCY": int(os.getenv("DELIVERY_RELAY_CONCURRENCY") or 20),
+    # Límites propios por dominio, ej: {"gmail.com": {"rate": 5, "burst": 10, "max_concurrency": 3}}
+    "DELIVERY_DOMAIN_LIMITS": json.loads(os.getenv("DELIVERY_DOMAIN_LIMITS") or "{}"),
+    # Reintentos automáticos de errores transitorios (4xx, conexión) con backoff exponencial
+    # Tras RETRY_MAX_ATTEMPTS intentos el email pasa a 'dead' (1 = sin reintentos
+    # ni worker en modo sync; con más de 1 el worker se inicia en cada proceso)
+    "RETRY_MAX_ATTEMPTS": int(os.getenv("RETRY_MAX_ATTEMPTS") or 1),
+    "RETRY_BASE_DELAY": float(os.getenv("RETRY_BASE_DELAY") or 30),
+    "RETRY_MAX_DELAY": float(os.getenv("RETRY_MAX_DELAY") or 3600),
+    # Write-behind de estados: los resultados de envío se guardan juntos con un
+    # UPDATE cada STATUS_FLUSH_INTERVAL segundos (0 = un UPDATE por envío)
+    "STATUS_FLUSH_INTERVAL": float(os.getenv("STATUS_FLUSH_INTERVAL") or 0.2),
+    "STATUS_FLUSH_MAX_ITEMS": int(os.getenv("STATUS_FLUSH_MAX_ITEMS") or 500),
+    # Idempotency-Key de POST /emails/send: segundos durante los que un reintento
+    # con la misma clave retorna el email original, y claves recientes en memoria
+    "IDEMPOTENCY_KEY_TTL": float(os.getenv("IDEMPOTENCY_KEY_TTL") or 86400),
+    "IDEMPOTENCY_CACHE_SIZE": int(os.getenv("IDEMPOTENCY_CACHE_SIZE") or 10000)
+}
+
+relay_config = {
+    # Varios relays SMTP con balanceo por peso y failover, ej:
+    # [{"name": "ses", "host": "email-smtp.us-east-1.amazonaws.com", "port": 587,
+    #   "user": "...", "password": "...", "weight": 3}, {"name": "backup", "host": "...", "weight": 0}]
+    # Vacío: un solo relay con SMTP_HOST, SMTP_PORT, SMTP_USER y SMTP_PASSWORD
+    "SMTP_RELAYS": json.loads(os.getenv("SMTP_RELAYS") or "[]"),
+    # Circuit breaker: con RELAY_ERROR_THRESHOLD de errores entre los últimos
+    # RELAY_WINDOW envíos (y al menos RELAY_MIN_REQUESTS) el relay deja de
+    # recibir envíos durante RELAY_OPEN_SECONDS
+    "RELAY_ERROR_THRESHOLD": float(os.getenv("RELAY_ERROR_THRESHOLD") or 0.5),
+    "RELAY_WINDOW": int(os.getenv("RELAY_WINDOW") or 20),
+    "RELAY_MIN_REQUESTS": int(os.getenv("RELAY_MIN_REQUESTS") or 5),
+    "RELAY_OPEN_SECONDS": float(os.getenv("RELAY_OPEN_SECONDS") or 30)
+}
+
+retention_config = {
+    # Los emails creados hace más de estos días salen de la base de datos al archivo
+    "RETENTION_DAYS": int(os.getenv("RETENTION_DAYS") or 180),
+    # Directorio de los archivos comprimidos (vacío: GET /emails/{id} no busca en el archivo)
+    "ARCHIVE_DIR": os.getenv("ARCHIVE_DIR", "archive"),
+    # Emails archivados y borrados por transacción
+    "RETENTION_BATCH_SIZE": int(os.getenv("RETENTION_BATCH_SIZE") or 1000),
+    # Con emails particionado por mes: particiones que se crean por adelantado
+    "PARTITION_MONTHS_AHEAD": int(os.getenv("PARTITION_MONTHS_AHEAD") or 3)
+}
+
+attachment_config = {
+    # Directorio de los archivos adjuntos (uno por contenido distinto, nombrado por su SHA-256)
+    "ATTACHMENTS_DIR": os.getenv("ATTACHMENTS_DIR") or "attachments",
+    # Tamaño máximo de todos los adjuntos de un email (bytes)
+    "ATTACHMENT_MAX_BYTES": int(os.getenv("ATTACHMENT_MAX_BYTES") or 25 * 1024 * 1024)
+}
+
+template_config = {
+    "TEMPLATES_DIR": os.getenv("TEMPLATES_DIR") or "templates",
+    # Máximo de plantillas compiladas que se mantienen en memoria
+    "TEMPLATE_CACHE_SIZE": int(os.getenv("TEMPLATE_CACHE_SIZE") or 100),
+    # true: recompila la plantilla si cambió su mtime | false: solo al recibir SIGHUP
+    "TEMPLATE_AUTO_RELOAD": (os.getenv("TEMPLATE_AUTO_RELOAD") or "true").lower() == "true",
+    # Directorio del bytecode compilado de Jinja2 (vacío lo desactiva)
+    "TEMPLATE_BYTECODE_CACHE_DIR": os.getenv(
+        "TEMPLATE_BYTECODE_CACHE_DIR",
+        os.path.join(tempfile.gettempdir(), "email_api_jinja_cache")
+    ),
+    # Mail-merge: procesos para renderizar lotes grandes (0 o 1 renderiza en el proceso actual)
+    "TEMPLATE_RENDER_WORKERS": int(os.getenv("TEMPLATE_RENDER_WORKERS") or os.cpu_count() or 1),
+    # Contextos a partir de los cuales se usan los procesos de render
+    "TEMPLATE_PARALLEL_THRESHOLD": int(os.getenv("TEMPLATE_PARALLEL_THRESHOLD") or 500),
+    # Contextos enviados a un proceso en cada tarea
+    "TEMPLATE_RENDER_CHUNK_SIZE": int(os.getenv("TEMPLATE_RENDER_CHUNK_SIZE") or 100)
+}
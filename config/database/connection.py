@@ -1,22 +1,68 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.pool import StaticPool
 from config.config import database_config
-from typing import Generator
+from typing import AsyncGenerator, Generator
+import logging
 
-# Construir URL de conexión
-DATABASE_URL = f"postgresql://{database_config['DB_USER']}:{database_config['DB_PASSWORD']}@{database_config['DB_HOST']}:{database_config['DB_PORT']}/{database_config['DB_NAME']}"
+logger = logging.getLogger(__name__)
+
+# Construir URL de conexión (DATABASE_URL permite usar otra base, ej: SQLite embebida)
+DATABASE_URL = database_config["DATABASE_URL"] or f"postgresql://{database_config['DB_USER']}:{database_config['DB_PASSWORD']}@{database_config['DB_HOST']}:{database_config['DB_PORT']}/{database_config['DB_NAME']}"
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# SQLite: la conexión se comparte entre los hilos del pool
+_connect_args = {"check_same_thread": False} if IS_SQLITE else {}
 
 # Crear engine de SQLAlchemy
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,  # Verifica conexiones antes de usarlas
     echo=False,  # Cambia a True para debug SQL
+    pool_size=database_config["DB_POOL_SIZE"],
+    max_overflow=database_config["DB_MAX_OVERFLOW"],
+    connect_args=_connect_args
 )
 
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    """WAL y espera ante bloqueos: lecturas y escrituras concurrentes sin 'database is locked'"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _configure_sqlite)
+
 # Crear SessionLocal
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine asíncrono (asyncpg, o aiosqlite con SQLite), solo si está habilitado con DB_ASYNC=true
+ASYNC_DATABASE_URL = (
+    DATABASE_URL
+    .replace("postgresql://", "postgresql+asyncpg://", 1)
+    .replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+
+async_engine = None
+AsyncSessionLocal = None
+
+if database_config["DB_ASYNC"]:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_pre_ping=True,
+        echo=False,
+    )
+    if IS_SQLITE:
+        event.listen(async_engine.sync_engine, "connect", _configure_sqlite)
+    # expire_on_commit=False: los objetos siguen legibles tras el commit sin
+    # disparar consultas implícitas (no permitidas con AsyncSession)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -30,31 +76,79 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
-def init_db():
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency para obtener sesión asíncrona de base de datos.
+    Se usa en FastAPI con Depends(get_async_db) cuando DB_ASYNC=true
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def init_db(schema_check: str = "full"):
     """
     Inicializa la base de datos creando todas las tablas.
     Llamar esto al inicio de la aplicación.
+    
+    Args:
+        schema_check: "full" verifica y aplica el esquema completo (ENUM,
+            create_all y migraciones); "version" solo lo hace si la versión
+            registrada en schema_version no coincide con SCHEMA_VERSION (una
+            consulta); "skip" no toca la base de datos
     """
+    if schema_check == "skip":
+        logger.info("Verificación del esquema omitida (SCHEMA_CHECK=skip)")
+        return
+    
     from models.email_model import Base
+    from config.database.migrations import SCHEMA_VERSION, apply_migrations, read_schema_version, record_schema_version
     from sqlalchemy import text
+    from sqlalchemy.exc import SQLAlchemyError
+    
+    if schema_check == "version":
+        try:
+            with engine.connect() as conn:
+                current = read_schema_version(conn)
+        except SQLAlchemyError:
+            # Base anterior a schema_version: se aplica el esquema completo
+            current = None
+        
+        if current == SCHEMA_VERSION:
+            logger.info("Esquema al día", extra={"schema_version": SCHEMA_VERSION[:12]})
+            return
+    
+    # El tipo ENUM y las migraciones son propios de PostgreSQL; en otras bases
+    # (ej: SQLite embebida para benchmarks) create_all crea el esquema completo
+    is_postgres = engine.dialect.name == "postgresql"
     
     try:
         # Verificar si el tipo ENUM existe, si no, crearlo
-        with engine.connect() as conn:
-            result = conn.execute(
-                text("SELECT 1 FROM pg_type WHERE typname = 'emailstatus'")
-            )
-            
-            if not result.fetchone():
-                conn.execute(
-                    text("CREATE TYPE emailstatus AS ENUM ('pending', 'sent', 'failed')")
+        if is_postgres:
+            with engine.connect() as conn:
+                result = conn.execute(
+                    text("SELECT 1 FROM pg_type WHERE typname = 'emailstatus'")
                 )
-                conn.commit()
-                print("✅ Tipo ENUM 'emailstatus' creado")
+                
+                if not result.fetchone():
+                    conn.execute(
+                        text("CREATE TYPE emailstatus AS ENUM ('pending', 'sent', 'failed', 'dead')")
+                    )
+                    conn.commit()
+                    logger.info("Tipo ENUM 'emailstatus' creado")
         
         # Crear todas las tablas
         Base.metadata.create_all(bind=engine)
-        print("✅ Tablas verificadas/creadas")
+        logger.info("Tablas verificadas/creadas")
+        
+        # Agregar columnas/índices nuevos a tablas existentes
+        if is_postgres:
+            with engine.connect() as conn:
+                apply_migrations(conn)
+            logger.info("Migraciones aplicadas")
+        
+        # Los próximos arranques con SCHEMA_CHECK=version no repiten lo anterior
+        with engine.begin() as conn:
+            record_schema_version(conn)
         
     except Exception as e:
-        print(f"⚠️  Base de datos ya inicializada o error: {e}")
\ No newline at end of file
+        logger.warning("Base de datos ya inicializada o error", extra={"error": str(e)})
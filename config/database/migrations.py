@@ -0,0 +1,86 @@
+"""
+Migraciones incrementales del esquema.
+
+`Base.metadata.create_all` solo crea tablas nuevas, no agrega columnas ni
+índices a tablas existentes. Cada sentencia de esta lista es idempotente
+y se ejecuta en orden después de `create_all`.
+
+SCHEMA_VERSION resume los modelos y esta lista: cambia sola al agregar una
+tabla, una columna, un índice o una migración. Se guarda en schema_version
+después de aplicar el esquema completo, y al arrancar basta una consulta
+para saber si hace falta volver a aplicarlo.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select, text, update
+from sqlalchemy.engine import Connection
+from models.email_model import Base, SchemaVersion
+
+
+MIGRATIONS = [
+    "ALTER TABLE emails ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP NULL",
+    "CREATE INDEX IF NOT EXISTS ix_emails_status_id ON emails (status, id)",
+    "CREATE INDEX IF NOT EXISTS ix_emails_created_at_id ON emails (created_at, id)",
+    "ALTER TABLE emails ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP NULL",
+    "CREATE INDEX IF NOT EXISTS ix_emails_next_attempt_at ON emails (next_attempt_at) "
+    "WHERE next_attempt_at IS NOT NULL",
+    "ALTER TABLE emails ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0",
+    "ALTER TYPE emailstatus ADD VALUE IF NOT EXISTS 'dead'",
+    # Cuerpos en email_contents (la tabla la crea create_all); los que siguen
+    # en body/html_body se mueven con `python migrate_email_bodies.py`
+    "ALTER TABLE emails ADD COLUMN IF NOT EXISTS body_hash VARCHAR(64) NULL REFERENCES email_contents (hash)",
+    "ALTER TABLE emails ADD COLUMN IF NOT EXISTS html_body_hash VARCHAR(64) NULL REFERENCES email_contents (hash)",
+    # Retención: borrar los contenidos que ya no usa ningún email
+    "CREATE INDEX IF NOT EXISTS ix_emails_body_hash ON emails (body_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_emails_html_body_hash ON emails (html_body_hash)",
+    # Carriles de prioridad (con DEFAULT constante no reescribe la tabla)
+    "ALTER TABLE emails ADD COLUMN IF NOT EXISTS priority VARCHAR(10) NOT NULL DEFAULT 'normal'",
+    "CREATE INDEX IF NOT EXISTS ix_emails_priority_status_id ON emails (priority, status, id)",
+    # Envíos programados
+    "ALTER TABLE emails ADD COLUMN IF NOT EXISTS send_at TIMESTAMP NULL",
+    "CREATE INDEX IF NOT EXISTS ix_emails_send_at ON emails (send_at) WHERE send_at IS NOT NULL",
+    # updated_at lo escribe la aplicación: el trigger lo reescribía después
+    # del flush y el ETag calculado con el valor escrito ya no coincidía
+    "DROP TRIGGER IF EXISTS update_emails_updated_at ON emails",
+]
+
+
+def apply_migrations(conn: Connection) -> None:
+    """Aplica todas las migraciones sobre una conexión PostgreSQL"""
+    for statement in MIGRATIONS:
+        conn.execute(text(statement))
+    conn.commit()
+
+
+def _schema_fingerprint() -> str:
+    """SHA-256 de las tablas, columnas e índices de los modelos y de MIGRATIONS"""
+    parts = []
+    for table in Base.metadata.sorted_tables:
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            parts.append(f"column {column.name} {column.type!r} {column.nullable} {column.primary_key}")
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            parts.append(f"index {index.name} {[column.name for column in index.columns]} {index.unique}")
+    parts.extend(MIGRATIONS)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+SCHEMA_VERSION = _schema_fingerprint()
+
+
+def read_schema_version(conn: Connection) -> Optional[str]:
+    """Versión del esquema registrada en la base de datos (None si no hay)"""
+    return conn.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+
+
+def record_schema_version(conn: Connection) -> None:
+    """Registra SCHEMA_VERSION como la versión aplicada (hay que hacer commit)"""
+    result = conn.execute(
+        update(SchemaVersion)
+        .where(SchemaVersion.id == 1)
+        .values(version=SCHEMA_VERSION, applied_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        conn.execute(SchemaVersion.__table__.insert().values(id=1, version=SCHEMA_VERSION))
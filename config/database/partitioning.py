@@ -0,0 +1,197 @@
+"""
+Particionado de emails por mes de created_at (solo PostgreSQL 13+)
+
+Con la tabla particionada, un mes que ya pasó el período de retención se
+archiva y se elimina con DROP TABLE de su partición: no hace falta borrar
+fila por fila ni hacer VACUUM después.
+
+Particiones:
+- emails_legacy: la tabla original, desde MINVALUE hasta el primer mes
+  particionado. Se vacía con el job de retención y se elimina como las demás
+- emails_YYYY_MM: una por mes, creadas por adelantado
+- emails_default: red de seguridad si un mes no tiene partición (debe
+  quedar vacía; crear la partición de un mes con filas en default falla)
+"""
+
+import re
+from datetime import date, datetime
+from typing import List, NamedTuple, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+LEGACY_PARTITION = "emails_legacy"
+DEFAULT_PARTITION = "emails_default"
+
+# Espera máxima por el bloqueo de emails: si hay una consulta larga en curso
+# es mejor fallar y reintentar que dejar en cola a todas las demás
+LOCK_TIMEOUT = "5s"
+
+_BOUND = re.compile(r"FROM \((?:MINVALUE|'([^']+)')\) TO \((?:MAXVALUE|'([^']+)')\)")
+
+
+class Partition(NamedTuple):
+    """Partición de emails; lower/upper son None en los extremos abiertos y en default"""
+    name: str
+    lower: Optional[datetime]
+    upper: Optional[datetime]
+
+
+def month_start(moment: datetime) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"emails_{month:%Y_%m}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('emails')"
+    )).first() is not None
+
+
+def list_partitions(conn: Connection) -> List[Partition]:
+    """Particiones de emails ordenadas por rango (default al final)"""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'emails'::regclass"
+    )).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND.search(bound)
+        if match is None:
+            partitions.append(Partition(name, None, None))
+            continue
+        lower, upper = (datetime.fromisoformat(value) if value else None for value in match.groups())
+        partitions.append(Partition(name, lower, upper))
+
+    return sorted(partitions, key=lambda p: (p.upper is None, p.upper or datetime.max))
+
+
+def create_month_partitions(conn: Connection, first: date, months: int) -> List[str]:
+    """
+    Crea las particiones mensuales que falten desde `first` (sin commit)
+
+    Returns:
+        List[str]: Nombres de las particiones creadas
+    """
+    ranges = [(p.lower, p.upper) for p in list_partitions(conn) if p.upper is not None]
+    created = []
+
+    for offset in range(months):
+        month = add_months(first, offset)
+        moment = datetime(month.year, month.month, 1)
+        # Ya cubierto por una partición mensual o por emails_legacy
+        if any((lower is None or lower <= moment) and moment < upper for lower, upper in ranges):
+            continue
+        name = partition_name(month)
+        conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF emails "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+        created.append(name)
+
+    return created
+
+
+def ensure_partitions(engine: Engine, months_ahead: int) -> List[str]:
+    """Crea las particiones del mes actual y de los `months_ahead` siguientes (si emails está particionado)"""
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return []
+        conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+        return create_month_partitions(conn, month_start(datetime.utcnow()), months_ahead + 1)
+
+
+def convert_to_partitioned(engine: Engine, months_ahead: int) -> date:
+    """
+    Convierte emails en una tabla particionada por mes de created_at
+
+    La tabla actual pasa a ser la partición emails_legacy sin copiar filas.
+    Lo lento (índice único (id, created_at) y validar el CHECK del rango) se
+    hace antes, sin bloquear escrituras; el cambio en sí es una transacción
+    corta de catálogo.
+
+    Returns:
+        date: Primer mes con partición propia (el límite de emails_legacy)
+    """
+    # El límite debe quedar por encima de todo lo que se inserte mientras tanto
+    boundary = add_months(month_start(datetime.utcnow()), 1)
+    if (datetime(boundary.year, boundary.month, 1) - datetime.utcnow()).days < 1:
+        boundary = add_months(boundary, 1)
+
+    # 1. Sin bloquear escrituras: la clave primaria de una tabla particionada
+    #    incluye la columna de partición, y ATTACH usa el CHECK para no recorrer la tabla
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS emails_id_created_at_key ON emails (id, created_at)"
+        ))
+        conn.execute(text("ALTER TABLE emails DROP CONSTRAINT IF EXISTS emails_legacy_range"))
+        conn.execute(text(
+            f"ALTER TABLE emails ADD CONSTRAINT emails_legacy_range "
+            f"CHECK (created_at < '{boundary.isoformat()}') NOT VALID"
+        ))
+        conn.execute(text("ALTER TABLE emails VALIDATE CONSTRAINT emails_legacy_range"))
+        conn.execute(text("RESET lock_timeout"))
+
+    # 2. Cambio de catálogo
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+        conn.execute(text("LOCK TABLE emails IN ACCESS EXCLUSIVE MODE"))
+
+        # Definiciones a recrear en la tabla particionada (dicen "ON public.emails")
+        indexes = conn.execute(text(
+            "SELECT c.relname, pg_get_indexdef(c.oid) FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid "
+            "WHERE x.indrelid = 'emails'::regclass AND NOT x.indisunique"
+        )).all()
+        foreign_keys = conn.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = 'emails'::regclass AND contype = 'f'"
+        )).all()
+        triggers = conn.execute(text(
+            "SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger "
+            "WHERE tgrelid = 'emails'::regclass AND NOT tgisinternal"
+        )).all()
+
+        conn.execute(text(f"ALTER TABLE emails RENAME TO {LEGACY_PARTITION}"))
+        conn.execute(text(f"ALTER TABLE {LEGACY_PARTITION} RENAME CONSTRAINT emails_pkey TO {LEGACY_PARTITION}_pkey"))
+        # Los nombres de índices son únicos por esquema: los originales pasan a la tabla nueva
+        for name, _ in indexes:
+            conn.execute(text(f"ALTER INDEX {name} RENAME TO {name}_legacy"))
+        # Los triggers de la tabla particionada se clonan en cada partición
+        for name, _ in triggers:
+            conn.execute(text(f"DROP TRIGGER {name} ON {LEGACY_PARTITION}"))
+
+        conn.execute(text(
+            f"CREATE TABLE emails (LIKE {LEGACY_PARTITION} INCLUDING DEFAULTS INCLUDING STORAGE) "
+            "PARTITION BY RANGE (created_at)"
+        ))
+        conn.execute(text("ALTER TABLE emails ADD CONSTRAINT emails_pkey PRIMARY KEY (id, created_at)"))
+        for _, definition in indexes:
+            conn.execute(text(definition))
+        for name, definition in foreign_keys:
+            conn.execute(text(f"ALTER TABLE emails ADD CONSTRAINT {name} {definition}"))
+        for _, definition in triggers:
+            conn.execute(text(definition))
+
+        # Reutiliza el índice (id, created_at), los índices y FKs equivalentes
+        # y el CHECK validado: no recorre ni reescribe la tabla
+        conn.execute(text(
+            f"ALTER TABLE emails ATTACH PARTITION {LEGACY_PARTITION} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}')"
+        ))
+        # DROP TABLE emails_legacy no debe llevarse la secuencia de los ids
+        conn.execute(text("ALTER SEQUENCE emails_id_seq OWNED BY emails.id"))
+
+        create_month_partitions(conn, boundary, months_ahead)
+        conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF emails DEFAULT"))
+
+    return boundary
@@ -0,0 +1,96 @@
+from typing import Optional, TYPE_CHECKING
+from fastapi import HTTPException, status
+from schemas.delivery_schema import RateLimitSchema, DeliveryLanes, DeliveryLimits, DeliveryQueues, DeliveryRelays
+from utils.delivery_scheduler import DeliveryScheduler, RateLimit
+
+if TYPE_CHECKING:
+    from services.outbox_worker import OutboxWorker
+    from utils.relay_sender import MultiRelaySender
+
+
+class DeliveryController:
+    """
+    Controlador de la configuración y el estado del scheduler de entrega
+    (Single Responsibility: solo maneja la capa de presentación/HTTP)
+    """
+    
+    def __init__(
+        self,
+        scheduler: Optional[DeliveryScheduler],
+        relays: Optional["MultiRelaySender"] = None,
+        worker: Optional["OutboxWorker"] = None
+    ):
+        self.scheduler = scheduler
+        self.relays = relays
+        self.worker = worker
+    
+    def get_limits(self) -> DeliveryLimits:
+        """Retorna los límites vigentes"""
+        return DeliveryLimits(**self._require_scheduler().limits())
+    
+    def set_default_limits(self, limits: RateLimitSchema) -> DeliveryLimits:
+        """Cambia los límites por defecto de los dominios"""
+        self._require_scheduler().set_default_limits(RateLimit(**limits.model_dump()))
+        return self.get_limits()
+    
+    def set_relay_limits(self, limits: RateLimitSchema) -> DeliveryLimits:
+        """Cambia los límites del relay"""
+        self._require_scheduler().set_relay_limits(RateLimit(**limits.model_dump()))
+        return self.get_limits()
+    
+    def set_domain_limits(self, domain: str, limits: RateLimitSchema) -> DeliveryLimits:
+        """Configura los límites de un dominio"""
+        self._require_scheduler().set_domain_limits(domain, RateLimit(**limits.model_dump()))
+        return self.get_limits()
+    
+    def reset_domain_limits(self, domain: str) -> DeliveryLimits:
+        """Vuelve a aplicar los límites por defecto a un dominio"""
+        self._require_scheduler().reset_domain_limits(domain)
+        return self.get_limits()
+    
+    def get_queues(self) -> DeliveryQueues:
+        """Retorna la profundidad de las colas por relay y dominio"""
+        return DeliveryQueues(**self._require_scheduler().queue_depths())
+    
+    def get_relays(self) -> DeliveryRelays:
+        """
+        Retorna el estado de cada relay SMTP
+        
+        Raises:
+            HTTPException: Si hay un solo relay (SMTP_RELAYS vacío)
+        """
+        if self.relays is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Multiple SMTP relays are not configured"
+            )
+        
+        return DeliveryRelays(relays=self.relays.stats())
+    
+    def get_lanes(self) -> DeliveryLanes:
+        """
+        Retorna el estado de los carriles de prioridad del outbox
+        
+        Raises:
+            HTTPException: Si no hay worker de envío en segundo plano
+        """
+        if self.worker is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Background delivery worker is not running"
+            )
+        
+        return DeliveryLanes(lanes=self.worker.stats())
+    
+    def _require_scheduler(self) -> DeliveryScheduler:
+        """
+        Raises:
+            HTTPException: Si el scheduler está desactivado (DELIVERY_SCHEDULER=false)
+        """
+        if self.scheduler is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Delivery scheduler is disabled"
+            )
+        
+        return self.scheduler
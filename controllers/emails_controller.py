@@ -1,7 +1,16 @@
-from typing import Optional
-from fastapi import HTTPException, status
-from schemas.email_schema import EmailCreate, EmailResponse, EmailUpdate, EmailList
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Union
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from schemas.email_schema import EmailCreate, EmailResponse, EmailUpdate, EmailList, EmailBatchCreate, EmailBatchResponse
 from services.email_services import EmailService
+from models.email_model import EmailStatus
+from interfaces.email_interfaces import Attachment, AttachmentTooLarge, IdempotencyKeyReused, SchedulingUnavailable
+from utils.email_cache import etag_matches
+from utils.export import EXPORT_MEDIA_TYPES
+from config.config import database_config, delivery_config
 
 
 class EmailController:
@@ -13,12 +22,19 @@ class EmailController:
     def __init__(self, email_service: EmailService):
         self.email_service = email_service
     
-    async def send_email(self, email_data: EmailCreate) -> EmailResponse:
+    async def send_email(
+        self,
+        email_data: EmailCreate,
+        idempotency_key: Optional[str] = None,
+        attachments: Sequence[Attachment] = ()
+    ) -> EmailResponse:
         """
         Maneja la petición de envío de email
         
         Args:
             email_data: Datos del email a enviar
+            idempotency_key: Valor del header Idempotency-Key (opcional)
+            attachments: Adjuntos ya guardados (opcional)
             
         Returns:
             EmailResponse: Respuesta con el estado del email
@@ -27,10 +43,10 @@ class EmailController:
             HTTPException: Si hay un error al procesar la petición
         """
         try:
-            result = await self.email_service.send_email(email_data)
+            result = await self.email_service.send_email(email_data, idempotency_key, attachments)
             
-            # Si el email falló al enviar, retornar 500
-            if result.status == "failed":
+            # Si el email falló al enviar y no se va a reintentar, retornar 500
+            if result.status in ("failed", "dead") and result.next_attempt_at is None:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=f"Failed to send email: {result.error_message}"
@@ -40,19 +56,112 @@ class EmailController:
             
         except HTTPException:
             raise
+        except (IdempotencyKeyReused, SchedulingUnavailable) as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=str(e)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Unexpected error: {str(e)}"
+            )
+    
+    async def send_email_with_attachments(
+        self,
+        fields: dict,
+        files: List[UploadFile],
+        idempotency_key: Optional[str] = None
+    ) -> EmailResponse:
+        """
+        Maneja la petición de envío de email con adjuntos (multipart/form-data)
+        
+        Args:
+            fields: Campos del formulario (template_data como JSON)
+            files: Archivos adjuntos
+            idempotency_key: Valor del header Idempotency-Key (opcional)
+            
+        Raises:
+            HTTPException: 422 si los campos no son válidos, 413 si los
+                adjuntos superan el máximo permitido
+        """
+        try:
+            if fields.get("template_data"):
+                fields["template_data"] = json.loads(fields["template_data"])
+            email_data = EmailCreate.model_validate({k: v for k, v in fields.items() if v is not None})
+        except (ValueError, ValidationError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Invalid form data: {str(e)}"
+            )
+        
+        try:
+            attachments = await self.email_service.store_attachments(
+                (upload.filename, upload.content_type, _upload_chunks(upload)) for upload in files
+            )
+        except AttachmentTooLarge as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Unexpected error: {str(e)}"
+            )
+        
+        return await self.send_email(email_data, idempotency_key, attachments)
+    
+    async def send_batch(self, batch: EmailBatchCreate) -> EmailBatchResponse:
+        """
+        Maneja la petición de envío masivo
+        
+        Args:
+            batch: Lote de emails a enviar
+            
+        Returns:
+            EmailBatchResponse: Resultado por item
+            
+        Raises:
+            HTTPException: Si el lote es demasiado grande o hay un error inesperado
+        """
+        size = len(batch.emails if batch.emails is not None else batch.recipients)
+        max_items = delivery_config["BATCH_MAX_ITEMS"]
+        
+        if size > max_items:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Batch size must be at most {max_items} items"
+            )
+        
+        try:
+            return await self.email_service.send_batch(
+                batch,
+                concurrency=delivery_config["BATCH_SEND_CONCURRENCY"]
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Unexpected error: {str(e)}"
             )
     
-    async def get_emails(self, page: int = 1, page_size: int = 10) -> EmailList:
+    async def get_emails(
+        self,
+        page: int = 1,
+        page_size: int = 10,
+        cursor: Optional[str] = None,
+        exact_total: bool = False,
+        include_body: bool = False
+    ) -> EmailList:
         """
         Obtiene lista paginada de emails
         
         Args:
             page: Número de página (default: 1)
             page_size: Cantidad de items por página (default: 10)
+            cursor: Cursor de la página siguiente (reemplaza a 'page')
+            exact_total: Contar el total exacto
+            include_body: Incluir body y html_body de cada email
             
         Returns:
             EmailList: Lista paginada de emails
@@ -69,30 +178,98 @@ class EmailController:
                 detail="Page size must be between 1 and 100"
             )
         
-        return await self.email_service.get_all_emails(page, page_size)
+        try:
+            return await self.email_service.get_all_emails(page, page_size, cursor, exact_total, include_body)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
     
-    async def get_email(self, email_id: int) -> EmailResponse:
+    async def export_emails(
+        self,
+        fmt: str = "ndjson",
+        email_status: Optional[EmailStatus] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after_id: Optional[int] = None
+    ) -> StreamingResponse:
+        """
+        Exporta el registro de emails como una respuesta en streaming
+        
+        Args:
+            fmt: "ndjson" o "csv"
+            email_status: Solo emails con este estado
+            since: Creados desde esta fecha (inclusive)
+            until: Creados antes de esta fecha
+            after_id: Reanudar después de este id
+            
+        Returns:
+            StreamingResponse: Filas en el formato pedido
+            
+        Raises:
+            HTTPException: Si el rango de fechas no es válido
+        """
+        if since is not None and until is not None and since >= until:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="'since' must be earlier than 'until'"
+            )
+        
+        rows = self.email_service.export_emails(
+            fmt,
+            email_status,
+            since,
+            until,
+            after_id,
+            batch_size=database_config["EXPORT_BATCH_SIZE"]
+        )
+        
+        return StreamingResponse(
+            rows,
+            media_type=EXPORT_MEDIA_TYPES[fmt],
+            headers={"Content-Disposition": f'attachment; filename="emails.{fmt}"'}
+        )
+    
+    async def get_email(
+        self,
+        email_id: int,
+        include_body: bool = False,
+        response: Optional[Response] = None,
+        if_none_match: Optional[str] = None
+    ) -> Union[EmailResponse, Response]:
         """
         Obtiene un email por su ID
         
         Args:
             email_id: ID del email
+            include_body: Incluir body y html_body
+            response: Respuesta de la ruta, donde se agrega el ETag
+            if_none_match: Valor del header If-None-Match
             
         Returns:
-            EmailResponse: Datos del email
+            EmailResponse: Datos del email, o una respuesta 304 vacía si el
+            ETag del cliente sigue vigente
             
         Raises:
             HTTPException: Si el email no existe
         """
-        email = await self.email_service.get_email(email_id)
+        entry = await self.email_service.get_email_entry(email_id, include_body)
         
-        if not email:
+        if not entry:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Email with id {email_id} not found"
             )
         
-        return email
+        # no-cache: el cliente puede guardar la respuesta pero debe revalidarla
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, entry.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        if response is not None:
+            response.headers.update(headers)
+        return entry.response
     
     async def update_email(self, email_id: int, email_data: EmailUpdate) -> EmailResponse:
         """
@@ -139,4 +316,13 @@ class EmailController:
                 detail=f"Email with id {email_id} not found"
             )
         
-        return {"message": f"Email {email_id} deleted successfully"}
\ No newline at end of file
+        return {"message": f"Email {email_id} deleted successfully"}
+
+
+async def _upload_chunks(upload: UploadFile, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    """Contenido de un archivo subido, de a `chunk_size` bytes"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
@@ -12,47 +12,92 @@ CREATE DATABASE email_db
 \c email_db
 
 -- Crear enum para estados de email
-CREATE TYPE email_status AS ENUM ('pending', 'sent', 'failed');
+CREATE TYPE email_status AS ENUM ('pending', 'sent', 'failed', 'dead');
+
+-- Crear tabla de cuerpos (texto y HTML), una fila por contenido distinto
+-- hash: SHA-256 del texto; data: texto comprimido con zlib
+CREATE TABLE IF NOT EXISTS email_contents (
+    hash VARCHAR(64) PRIMARY KEY,
+    data BYTEA NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
 
 -- Crear tabla de emails
 CREATE TABLE IF NOT EXISTS emails (
     id SERIAL PRIMARY KEY,
     recipient VARCHAR(255) NOT NULL,
     subject VARCHAR(500) NOT NULL,
-    body TEXT,
-    html_body TEXT,
+    body_hash VARCHAR(64) REFERENCES email_contents(hash),
+    html_body_hash VARCHAR(64) REFERENCES email_contents(hash),
     status email_status DEFAULT 'pending' NOT NULL,
     error_message TEXT,
     sent_at TIMESTAMP,
+    claimed_at TIMESTAMP,
+    next_attempt_at TIMESTAMP,
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    -- Carril del outbox: high (transaccionales), normal, low (campañas)
+    priority VARCHAR(10) DEFAULT 'normal' NOT NULL,
+    -- Envío programado (UTC): no se envía antes de este momento
+    send_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
 );
 
+-- Crear tabla de Idempotency-Key (reintentos de POST /emails/send)
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key VARCHAR(255) PRIMARY KEY,
+    request_hash VARCHAR(64) NOT NULL,
+    email_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX ix_idempotency_keys_email_id ON idempotency_keys(email_id);
+CREATE INDEX ix_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+
+-- Adjuntos: el contenido está en ATTACHMENTS_DIR (nombre = hash)
+CREATE TABLE IF NOT EXISTS email_attachments (
+    id SERIAL PRIMARY KEY,
+    email_id INTEGER NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    content_type VARCHAR(255) NOT NULL,
+    size BIGINT NOT NULL,
+    hash VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+CREATE INDEX ix_email_attachments_email_id ON email_attachments(email_id);
+CREATE INDEX ix_email_attachments_hash ON email_attachments(hash);
+
+-- Versión del esquema aplicada (SCHEMA_CHECK=version); vacía, la aplicación
+-- la completa al arrancar después de verificar el esquema
+CREATE TABLE IF NOT EXISTS schema_version (
+    id INTEGER PRIMARY KEY,
+    version VARCHAR(64) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
 -- Crear índices para mejorar rendimiento
 CREATE INDEX idx_emails_recipient ON emails(recipient);
 CREATE INDEX idx_emails_status ON emails(status);
 CREATE INDEX idx_emails_created_at ON emails(created_at DESC);
+CREATE INDEX ix_emails_status_id ON emails(status, id);
+CREATE INDEX ix_emails_created_at_id ON emails(created_at, id);
+CREATE INDEX ix_emails_next_attempt_at ON emails(next_attempt_at) WHERE next_attempt_at IS NOT NULL;
+CREATE INDEX ix_emails_priority_status_id ON emails(priority, status, id);
+CREATE INDEX ix_emails_send_at ON emails(send_at) WHERE send_at IS NOT NULL;
+CREATE INDEX ix_emails_body_hash ON emails(body_hash);
+CREATE INDEX ix_emails_html_body_hash ON emails(html_body_hash);
+
+-- updated_at lo escribe la aplicación en cada UPDATE (sin trigger): el ETag de
+-- GET /emails/{id} se calcula con el valor que ella misma escribió
 
--- Crear función para actualizar updated_at automáticamente
-CREATE OR REPLACE FUNCTION update_updated_at_column()
-RETURNS TRIGGER AS $$
-BEGIN
-    NEW.updated_at = CURRENT_TIMESTAMP;
-    RETURN NEW;
-END;
-$$ language 'plpgsql';
-
--- Crear trigger para actualizar updated_at
-CREATE TRIGGER update_emails_updated_at 
-    BEFORE UPDATE ON emails
-    FOR EACH ROW
-    EXECUTE FUNCTION update_updated_at_column();
-
--- Insertar datos de ejemplo (opcional)
-INSERT INTO emails (recipient, subject, body, status, sent_at) VALUES
-    ('ejemplo1@test.com', 'Email de prueba 1', 'Este es un email de prueba', 'sent', CURRENT_TIMESTAMP),
-    ('ejemplo2@test.com', 'Email de prueba 2', 'Otro email de prueba', 'sent', CURRENT_TIMESTAMP),
-    ('ejemplo3@test.com', 'Email pendiente', 'Este email está pendiente', 'pending', NULL);
+-- Insertar datos de ejemplo (opcional; sin cuerpo: los cuerpos comprimidos
+-- los guarda la aplicación)
+INSERT INTO emails (recipient, subject, status, sent_at) VALUES
+    ('ejemplo1@test.com', 'Email de prueba 1', 'sent', CURRENT_TIMESTAMP),
+    ('ejemplo2@test.com', 'Email de prueba 2', 'sent', CURRENT_TIMESTAMP);
 
 -- Verificar que todo se creó correctamente
 SELECT table_name 
@@ -1,72 +1,417 @@
-from fastapi import Depends
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Optional, TYPE_CHECKING
+from fastapi import Depends, Request
 from sqlalchemy.orm import Session
-from config.database.connection import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.config import attachment_config, database_config, delivery_config, relay_config, retention_config, template_config
+from config.database.connection import get_db, get_async_db, SessionLocal, AsyncSessionLocal
 from repositories.email_repository import EmailRepository
+from repositories.async_email_repository import AsyncEmailRepository
 from services.email_services import EmailService
 from controllers.emails_controller import EmailController
-from utils.smtp_email_sender import SMTPEmailSender, MockEmailSender
+from controllers.delivery_controller import DeliveryController
+from utils.attachment_store import AttachmentStore
+from utils.delivery_scheduler import DeliveryScheduler, LimitState, RateLimit
+from utils.email_archive import EmailArchive
+from utils.email_cache import EmailCache
+from utils.retry_policy import RetryPolicy
+from utils.status_buffer import StatusWriteBuffer
+from utils.ttl_cache import TTLCache
 from utils.template_engine import Jinja2TemplateEngine
-from interfaces.email_interfaces import IEmailSender, ITemplateEngine
+from interfaces.email_interfaces import IEmailRepository, IEmailSender, ITemplateEngine
 import os
 
+# El worker, el dispatcher y el balanceo entre relays solo se importan si se
+# usan (main los crea en el lifespan): no son parte del arranque en frío
+if TYPE_CHECKING:
+    from services.outbox_worker import OutboxWorker
+    from services.scheduled_dispatcher import ScheduledSendDispatcher
+    from utils.relay_sender import MultiRelaySender
+
 
 # ============================================
 # CONFIGURACIÓN DE DEPENDENCIAS
 # ============================================
 
+@lru_cache
 def get_email_sender() -> IEmailSender:
     """
     Factory para obtener el sender de emails apropiado
     (Dependency Inversion: retorna interface, no implementación concreta)
+    
+    Se crea una sola instancia por proceso para que el pool de conexiones
+    SMTP y los límites de envío se compartan entre peticiones.
+    """
+    if not delivery_config["DELIVERY_SCHEDULER"]:
+        return _create_transport()
+    
+    def limits(rate, burst, concurrency, overrides=None) -> RateLimit:
+        overrides = overrides or {}
+        return RateLimit(
+            rate=float(overrides.get("rate", rate)),
+            burst=int(overrides.get("burst", burst)),
+            max_concurrency=int(overrides.get("max_concurrency", concurrency))
+        )
+    
+    default_limits = limits(
+        delivery_config["DELIVERY_DOMAIN_RATE"],
+        delivery_config["DELIVERY_DOMAIN_BURST"],
+        delivery_config["DELIVERY_DOMAIN_CONCURRENCY"]
+    )
+    
+    relay_limits = limits(
+        delivery_config["DELIVERY_RELAY_RATE"],
+        delivery_config["DELIVERY_RELAY_BURST"],
+        delivery_config["DELIVERY_RELAY_CONCURRENCY"]
+    )
+    sender = _create_transport(relay_limits)
+    
+    # Con varios relays cada uno aplica sus límites al recibir el envío
+    relays = None
+    if relay_config["SMTP_RELAYS"]:
+        from utils.relay_sender import MultiRelaySender
+        
+        if isinstance(sender, MultiRelaySender):
+            relays = {relay.name: relay.limits for relay in sender.relays}
+    
+    return DeliveryScheduler(
+        sender,
+        default_limits=default_limits,
+        relay_limits=relay_limits,
+        domain_limits={
+            domain: limits(*default_limits, overrides)
+            for domain, overrides in delivery_config["DELIVERY_DOMAIN_LIMITS"].items()
+        },
+        relay=getattr(sender, "smtp_host", "mock"),
+        max_wait=delivery_config["DELIVERY_MAX_WAIT"],
+        relays=relays
+    )
+
+
+def get_delivery_scheduler() -> Optional[DeliveryScheduler]:
+    """Retorna el scheduler de entrega (None si está desactivado)"""
+    sender = get_email_sender()
+    return sender if isinstance(sender, DeliveryScheduler) else None
+
+
+def get_relay_sender() -> Optional["MultiRelaySender"]:
+    """Retorna el balanceo entre relays SMTP (None si hay un solo relay)"""
+    if not relay_config["SMTP_RELAYS"]:
+        return None
+    
+    from utils.relay_sender import MultiRelaySender
+    
+    sender = get_email_sender()
+    if isinstance(sender, DeliveryScheduler):
+        sender = sender.sender
+    return sender if isinstance(sender, MultiRelaySender) else None
+
+
+def _create_transport(relay_limits: Optional[RateLimit] = None) -> IEmailSender:
+    """
+    Crea el sender que realiza el envío (SMTP real o Mock)
+    
+    Solo se importa la implementación elegida (smtplib, ssl y el paquete
+    email no son parte del arranque de la app).
+    
+    Args:
+        relay_limits: Límites de cada relay cuando hay varios (None = sin límites)
     """
     # En producción usa SMTP real, en desarrollo usa Mock
     env = os.getenv("ENVIRONMENT", "development")
     
     if env == "production":
-        port = int(os.getenv("SMTP_PORT", "587"))
-        # Puerto 465 requiere SSL, puerto 587 requiere TLS
-        use_ssl = (port == 465)
-        use_tls = (port == 587)
+        if not relay_config["SMTP_RELAYS"]:
+            return _create_smtp_sender()
+        
+        # Varios relays: cada uno con su sender (y su pool de conexiones)
+        from utils.relay_sender import CircuitBreaker, MultiRelaySender, Relay
+        
+        relays = []
+        for index, options in enumerate(relay_config["SMTP_RELAYS"]):
+            relays.append(Relay(
+                name=options.get("name") or options.get("host") or f"relay-{index}",
+                sender=_create_smtp_sender(
+                    host=options.get("host"),
+                    port=options.get("port"),
+                    user=options.get("user"),
+                    password=options.get("password"),
+                    pool_size=options.get("pool_size")
+                ),
+                weight=float(options.get("weight", 1)),
+                breaker=CircuitBreaker(
+                    error_threshold=relay_config["RELAY_ERROR_THRESHOLD"],
+                    window=relay_config["RELAY_WINDOW"],
+                    min_requests=relay_config["RELAY_MIN_REQUESTS"],
+                    open_seconds=relay_config["RELAY_OPEN_SECONDS"]
+                ),
+                limits=LimitState(relay_limits, overridden=True) if relay_limits else None
+            ))
+        
+        return MultiRelaySender(relays, max_wait=delivery_config["DELIVERY_MAX_WAIT"])
+    else:
+        from utils.smtp_email_sender import MockEmailSender
+        
+        return MockEmailSender()
+
+
+def _create_smtp_sender(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    user: Optional[str] = None,
+    password: Optional[str] = None,
+    pool_size: Optional[int] = None
+) -> IEmailSender:
+    """Crea el sender SMTP de un relay (lo que no se indica se toma de SMTP_*)"""
+    port = int(port or os.getenv("SMTP_PORT", "587"))
+    # Puerto 465 requiere SSL, puerto 587 requiere TLS
+    use_ssl = (port == 465)
+    use_tls = (port == 587)
+    
+    # "async": cliente SMTP asíncrono | "thread": smtplib en un pool de hilos
+    if os.getenv("SMTP_TRANSPORT", "async") == "thread":
+        from utils.smtp_email_sender import SMTPEmailSender
         
         return SMTPEmailSender(
+            smtp_host=host,
+            smtp_port=port,
+            smtp_user=user,
+            smtp_password=password,
             use_tls=use_tls,
-            use_ssl=use_ssl
+            use_ssl=use_ssl,
+            pool_size=pool_size
         )
-    else:
-        return MockEmailSender()
+    
+    from utils.async_smtp_sender import AsyncSMTPEmailSender
+    
+    return AsyncSMTPEmailSender(
+        smtp_host=host,
+        smtp_port=port,
+        smtp_user=user,
+        smtp_password=password,
+        use_tls=use_tls,
+        use_ssl=use_ssl,
+        pool_size=pool_size
+    )
 
 
+@lru_cache
 def get_template_engine() -> ITemplateEngine:
     """
     Factory para obtener el motor de plantillas
+    
+    Se crea una sola instancia por proceso para que las plantillas
+    compiladas se reutilicen entre peticiones.
     """
     
-    return Jinja2TemplateEngine(templates_dir="templates")
+    return Jinja2TemplateEngine(
+        templates_dir=template_config["TEMPLATES_DIR"],
+        cache_size=template_config["TEMPLATE_CACHE_SIZE"],
+        auto_reload=template_config["TEMPLATE_AUTO_RELOAD"],
+        bytecode_cache_dir=template_config["TEMPLATE_BYTECODE_CACHE_DIR"] or None,
+        render_workers=template_config["TEMPLATE_RENDER_WORKERS"],
+        parallel_threshold=template_config["TEMPLATE_PARALLEL_THRESHOLD"],
+        chunk_size=template_config["TEMPLATE_RENDER_CHUNK_SIZE"]
+    )
 
 
 # ============================================
 # DEPENDENCIAS PARA FASTAPI
 # ============================================
 
-def get_email_repository(db: Session = Depends(get_db)) -> EmailRepository:
-    """Dependency para obtener el repositorio de emails"""
-    return EmailRepository(db)
+if database_config["DB_ASYNC"]:
+    def get_email_repository(db: AsyncSession = Depends(get_async_db)) -> IEmailRepository:
+        """Dependency para obtener el repositorio de emails (AsyncSession)"""
+        return AsyncEmailRepository(db)
+else:
+    def get_email_repository(db: Session = Depends(get_db)) -> IEmailRepository:
+        """Dependency para obtener el repositorio de emails"""
+        return EmailRepository(db)
+
+
+@lru_cache
+def get_retry_policy() -> Optional[RetryPolicy]:
+    """Política de reintentos de envíos fallidos (None si RETRY_MAX_ATTEMPTS <= 1)"""
+    if delivery_config["RETRY_MAX_ATTEMPTS"] <= 1:
+        return None
+    
+    return RetryPolicy(
+        max_attempts=delivery_config["RETRY_MAX_ATTEMPTS"],
+        base_delay=delivery_config["RETRY_BASE_DELAY"],
+        max_delay=delivery_config["RETRY_MAX_DELAY"]
+    )
+
+
+@lru_cache
+def get_email_archive() -> Optional[EmailArchive]:
+    """Archivo de los emails que salieron de la base de datos (None si ARCHIVE_DIR está vacío)"""
+    if not retention_config["ARCHIVE_DIR"]:
+        return None
+    
+    return EmailArchive(retention_config["ARCHIVE_DIR"])
+
+
+def delivery_worker_enabled() -> bool:
+    """
+    Si el proceso corre el worker en segundo plano: siempre en modo outbox y,
+    en modo sync, solo para los aplazados del scheduler y los reintentos
+    """
+    return (
+        delivery_config["DELIVERY_MODE"] == "outbox"
+        or delivery_config["DELIVERY_SCHEDULER"]
+        or delivery_config["RETRY_MAX_ATTEMPTS"] > 1
+    )
+
+
+@lru_cache
+def get_status_buffer() -> Optional[StatusWriteBuffer]:
+    """
+    Buffer de estados de envío compartido por el proceso
+    (None si STATUS_FLUSH_INTERVAL es 0: cada envío guarda su estado)
+    
+    Sin worker también es None: es quien vuelve a enviar los emails cuyo
+    estado se perdió porque el proceso murió antes de escribirlo.
+    """
+    if delivery_config["STATUS_FLUSH_INTERVAL"] <= 0 or not delivery_worker_enabled():
+        return None
+    
+    return StatusWriteBuffer(
+        repository_scope,
+        flush_interval=delivery_config["STATUS_FLUSH_INTERVAL"],
+        max_items=delivery_config["STATUS_FLUSH_MAX_ITEMS"]
+    )
+
+
+@lru_cache
+def get_idempotency_cache() -> TTLCache:
+    """Respuestas recientes por Idempotency-Key, compartidas por el proceso"""
+    return TTLCache(
+        max_items=delivery_config["IDEMPOTENCY_CACHE_SIZE"],
+        ttl=delivery_config["IDEMPOTENCY_KEY_TTL"]
+    )
+
+
+@lru_cache
+def get_email_cache() -> Optional[EmailCache]:
+    """
+    Cache de GET /emails/{id} compartido por el proceso
+    (None si EMAIL_CACHE_TTL es 0)
+    """
+    if database_config["EMAIL_CACHE_TTL"] <= 0:
+        return None
+    
+    return EmailCache(
+        max_items=database_config["EMAIL_CACHE_SIZE"],
+        ttl=database_config["EMAIL_CACHE_TTL"]
+    )
+
+
+@lru_cache
+def get_attachment_store() -> AttachmentStore:
+    """Archivos de los adjuntos, compartidos por el proceso"""
+    return AttachmentStore(
+        attachment_config["ATTACHMENTS_DIR"],
+        max_bytes=attachment_config["ATTACHMENT_MAX_BYTES"]
+    )
+
+
+def get_outbox_worker(request: Request) -> Optional["OutboxWorker"]:
+    """Dependency para obtener el worker del outbox (None en modo síncrono)"""
+    return getattr(request.app.state, "outbox_worker", None)
+
+
+def get_delivery_worker(request: Request) -> Optional["OutboxWorker"]:
+    """Dependency para obtener el worker de envío en segundo plano (outbox o reintentos)"""
+    return getattr(request.app.state, "delivery_worker", None)
+
+
+def get_scheduled_dispatcher(request: Request) -> Optional["ScheduledSendDispatcher"]:
+    """Dependency para obtener el dispatcher de envíos programados (None sin worker)"""
+    return getattr(request.app.state, "scheduled_dispatcher", None)
 
 
 def get_email_service(
-    repository: EmailRepository = Depends(get_email_repository),
+    repository: IEmailRepository = Depends(get_email_repository),
     sender: IEmailSender = Depends(get_email_sender),
-    template_engine: ITemplateEngine = Depends(get_template_engine)
+    template_engine: ITemplateEngine = Depends(get_template_engine),
+    outbox: Optional["OutboxWorker"] = Depends(get_outbox_worker),
+    retry_policy: Optional[RetryPolicy] = Depends(get_retry_policy),
+    archive: Optional[EmailArchive] = Depends(get_email_archive),
+    status_buffer: Optional[StatusWriteBuffer] = Depends(get_status_buffer),
+    idempotency_cache: TTLCache = Depends(get_idempotency_cache),
+    email_cache: Optional[EmailCache] = Depends(get_email_cache),
+    attachment_store: AttachmentStore = Depends(get_attachment_store),
+    scheduled_dispatcher: Optional["ScheduledSendDispatcher"] = Depends(get_scheduled_dispatcher)
 ) -> EmailService:
     """
     Dependency para obtener el servicio de emails
     (Inyección de dependencias completa)
     """
-    return EmailService(repository, sender, template_engine)
+    return EmailService(
+        repository,
+        sender,
+        template_engine,
+        outbox,
+        retry_policy,
+        archive,
+        status_buffer,
+        idempotency_cache,
+        idempotency_ttl=delivery_config["IDEMPOTENCY_KEY_TTL"],
+        email_cache=email_cache,
+        attachment_store=attachment_store,
+        scheduled_dispatcher=scheduled_dispatcher
+    )
 
 
 def get_email_controller(
     email_service: EmailService = Depends(get_email_service)
 ) -> EmailController:
     """Dependency para obtener el controlador de emails"""
-    return EmailController(email_service)
\ No newline at end of file
+    return EmailController(email_service)
+
+
+def get_delivery_controller(
+    scheduler: Optional[DeliveryScheduler] = Depends(get_delivery_scheduler),
+    relays: Optional["MultiRelaySender"] = Depends(get_relay_sender),
+    worker: Optional["OutboxWorker"] = Depends(get_delivery_worker)
+) -> DeliveryController:
+    """Dependency para obtener el controlador del scheduler de entrega"""
+    return DeliveryController(scheduler, relays, worker)
+
+
+# ============================================
+# DEPENDENCIAS FUERA DE UNA PETICIÓN HTTP
+# ============================================
+
+@asynccontextmanager
+async def repository_scope() -> AsyncIterator[IEmailRepository]:
+    """Entrega un repositorio con su propia sesión de base de datos"""
+    if database_config["DB_ASYNC"]:
+        async with AsyncSessionLocal() as db:
+            yield AsyncEmailRepository(db)
+        return
+    
+    db = SessionLocal()
+    try:
+        yield EmailRepository(db)
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def email_service_scope() -> AsyncIterator[EmailService]:
+    """
+    Entrega un EmailService con su propia sesión de base de datos.
+    Usado por los workers en segundo plano, que no tienen una petición HTTP.
+    """
+    async with repository_scope() as repository:
+        yield EmailService(
+            repository,
+            get_email_sender(),
+            get_template_engine(),
+            retry_policy=get_retry_policy(),
+            status_buffer=get_status_buffer(),
+            email_cache=get_email_cache(),
+            attachment_store=get_attachment_store()
+        )
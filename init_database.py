@@ -6,6 +6,7 @@ Ejecutar: python init_database.py
 from sqlalchemy import create_engine, text
 from config.config import database_config
 from models.email_model import Base, EmailStatus
+from config.database.migrations import apply_migrations, record_schema_version
 import sys
 
 def create_database():
@@ -52,7 +53,7 @@ def create_enum_type():
             if not result.fetchone():
                 # Crear tipo ENUM
                 conn.execute(
-                    text("CREATE TYPE emailstatus AS ENUM ('pending', 'sent', 'failed')")
+                    text("CREATE TYPE emailstatus AS ENUM ('pending', 'sent', 'failed', 'dead')")
                 )
                 conn.commit()
                 print("✅ Tipo ENUM 'emailstatus' creado exitosamente")
@@ -73,6 +74,15 @@ def create_tables():
         engine = create_engine(db_url)
         Base.metadata.create_all(bind=engine)
         print("✅ Tablas creadas exitosamente")
+        
+        with engine.connect() as conn:
+            apply_migrations(conn)
+        print("✅ Migraciones aplicadas")
+        
+        # Con la versión registrada, la app arranca sin revisar el esquema (SCHEMA_CHECK=version)
+        with engine.begin() as conn:
+            record_schema_version(conn)
+        print("✅ Versión del esquema registrada")
         engine.dispose()
         
     except Exception as e:
@@ -1,9 +1,72 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from models.email_model import Email
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from models.email_model import Email, EmailPriority, EmailStatus
 from schemas.email_schema import EmailCreate, EmailUpdate
 
 
+class EmailSummary(NamedTuple):
+    """
+    Columnas de un email sin sus cuerpos (para listados y consultas de estado)
+    
+    Se obtiene con una consulta de columnas, sin crear objetos del ORM.
+    """
+    id: int
+    recipient: str
+    subject: str
+    status: EmailStatus
+    priority: EmailPriority
+    sent_at: Optional[datetime]
+    error_message: Optional[str]
+    attempts: int
+    next_attempt_at: Optional[datetime]
+    send_at: Optional[datetime]
+    created_at: datetime
+    # Cambia con cada escritura (ETag de GET /emails/{id})
+    updated_at: datetime
+    body_hash: Optional[str]
+    html_body_hash: Optional[str]
+
+
+class StatusUpdate(NamedTuple):
+    """
+    Resultado de un intento de envío, con los valores finales de la fila
+    
+    Se guarda tal cual (no incrementa attempts): aplicarlo dos veces deja la
+    fila igual, así que un lote que falló se puede volver a escribir.
+    """
+    email_id: int
+    status: EmailStatus
+    error_message: Optional[str]
+    next_attempt_at: Optional[datetime]
+    attempts: int
+    # None: se conserva el sent_at guardado
+    sent_at: Optional[datetime]
+    updated_at: datetime
+
+
+class IdempotencyRecord(NamedTuple):
+    """Idempotency-Key de una petición de envío"""
+    key: str
+    # SHA-256 del contenido de la petición
+    request_hash: str
+    expires_at: datetime
+    # None hasta que se crea el email
+    email_id: Optional[int] = None
+
+
+class Attachment(NamedTuple):
+    """Archivo adjunto de un email"""
+    filename: str
+    content_type: str
+    # Tamaño en bytes (sin codificar)
+    size: int
+    # SHA-256 del contenido: nombre del archivo en ATTACHMENTS_DIR
+    hash: str
+    # Ruta del archivo; la completa AttachmentStore.resolve antes de enviar
+    path: Optional[str] = None
+
+
 class IEmailRepository(ABC):
     """
     Interface para repositorio de emails (Dependency Inversion Principle)
@@ -11,18 +74,81 @@ class IEmailRepository(ABC):
     """
     
     @abstractmethod
-    async def create(self, email_data: EmailCreate) -> Email:
-        """Crea un nuevo registro de email"""
+    async def create(
+        self,
+        email_data: EmailCreate,
+        idempotency: Optional[IdempotencyRecord] = None,
+        attachments: Sequence[Attachment] = (),
+        claim: bool = False
+    ) -> Optional[Email]:
+        """
+        Crea un nuevo registro de email
+        
+        Con `idempotency` guarda también la clave en la misma transacción; si
+        otra petición ya tiene esa clave (sin vencer) no crea nada y retorna None.
+        Los `attachments` (ya guardados en el AttachmentStore) se registran
+        en la misma transacción. Con `claim` un email no programado se crea ya reservado
+        para enviarlo en la misma petición (ver claim_pending).
+        """
+        pass
+    
+    @abstractmethod
+    async def create_many(self, emails: List[EmailCreate], claim: bool = False) -> List[int]:
+        """
+        Crea varios emails en una sola operación y retorna sus IDs en orden
+        (con `claim`, los que no están programados se crean ya reservados)
+        """
         pass
     
     @abstractmethod
     async def get_by_id(self, email_id: int) -> Optional[Email]:
-        """Obtiene un email por su ID"""
+        """Obtiene un email por su ID, con body, html_body y attachments"""
+        pass
+    
+    @abstractmethod
+    async def get_idempotency_key(self, key: str) -> Optional[IdempotencyRecord]:
+        """Obtiene una Idempotency-Key sin vencer"""
+        pass
+    
+    @abstractmethod
+    async def get_summary(self, email_id: int) -> Optional[EmailSummary]:
+        """Obtiene las columnas de un email sin sus cuerpos"""
+        pass
+    
+    @abstractmethod
+    async def get_all(self, skip: int = 0, limit: int = 100) -> List[EmailSummary]:
+        """Obtiene lista de emails (sin cuerpos) con paginación"""
+        pass
+    
+    @abstractmethod
+    async def get_page(self, limit: int, after: Optional[Tuple[datetime, int]] = None) -> List[EmailSummary]:
+        """Obtiene emails (sin cuerpos) ordenados por (created_at, id) descendente a partir de un cursor"""
         pass
     
     @abstractmethod
-    async def get_all(self, skip: int = 0, limit: int = 100) -> List[Email]:
-        """Obtiene lista de emails con paginación"""
+    async def get_contents(self, hashes: Iterable[str]) -> Dict[str, str]:
+        """Obtiene cuerpos por hash (body_hash/html_body_hash) en una sola consulta"""
+        pass
+    
+    @abstractmethod
+    def iter_summaries(
+        self,
+        batch_size: int,
+        status: Optional[EmailStatus] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after_id: Optional[int] = None
+    ) -> AsyncIterator[List[EmailSummary]]:
+        """
+        Recorre los emails (sin cuerpos) por id ascendente, en lotes de
+        `batch_size` leídos de un cursor del servidor
+        
+        Args:
+            status: Solo emails con este estado
+            since: Creados desde esta fecha (inclusive)
+            until: Creados antes de esta fecha
+            after_id: Continuar después de este id
+        """
         pass
     
     @abstractmethod
@@ -39,6 +165,119 @@ class IEmailRepository(ABC):
     async def count(self) -> int:
         """Cuenta total de emails"""
         pass
+    
+    @abstractmethod
+    async def estimate_count(self) -> Optional[int]:
+        """Total aproximado de emails según el planificador (None si no está disponible)"""
+        pass
+    
+    @abstractmethod
+    async def update_status(
+        self,
+        email_id: int,
+        status: EmailStatus,
+        error_message: Optional[str] = None,
+        next_attempt_at: Optional[datetime] = None
+    ) -> Optional[Email]:
+        """Registra el resultado de un intento de envío (incrementa attempts)"""
+        pass
+    
+    @abstractmethod
+    async def mark_status(
+        self,
+        email_ids: List[int],
+        status: EmailStatus,
+        error_message: Optional[str] = None,
+        next_attempt_at: Optional[datetime] = None
+    ) -> None:
+        """Registra el mismo resultado de intento para varios emails a la vez"""
+        pass
+    
+    @abstractmethod
+    async def apply_status_updates(self, updates: List[StatusUpdate]) -> None:
+        """Guarda los resultados de varios intentos de envío con un solo UPDATE"""
+        pass
+    
+    @abstractmethod
+    async def defer(self, email_ids: List[int], next_attempt_at: datetime, reason: Optional[str] = None) -> None:
+        """Deja emails en PENDING para reintentarlos a partir de `next_attempt_at`"""
+        pass
+    
+    @abstractmethod
+    async def claim_pending(
+        self,
+        limit: int,
+        lease_seconds: int,
+        retries_only: bool = False,
+        priority: Optional[EmailPriority] = None
+    ) -> List[Email]:
+        """
+        Reserva un lote de emails para envío en segundo plano: los pendientes y
+        los reintentos que ya vencieron (con retries_only, solo estos últimos;
+        con priority, solo los de esa prioridad)
+        """
+        pass
+    
+    @abstractmethod
+    async def get_send_times(self, after: datetime, until: datetime, limit: int) -> List[datetime]:
+        """
+        Momentos distintos de envío programado (send_at) de los emails PENDING
+        entre `after` (sin incluir) y `until`, en orden y como máximo `limit`
+        """
+        pass
+    
+    @abstractmethod
+    async def release_claims(self, email_ids: List[int]) -> None:
+        """Libera emails reservados que no llegaron a enviarse"""
+        pass
+
+
+class IdempotencyKeyReused(Exception):
+    """La Idempotency-Key ya se usó con una petición distinta"""
+    pass
+
+
+class AttachmentTooLarge(Exception):
+    """Los adjuntos de un email superan ATTACHMENT_MAX_BYTES"""
+    pass
+
+
+class SchedulingUnavailable(Exception):
+    """Se pidió un envío programado (send_at) pero no hay worker de envío en segundo plano"""
+    pass
+
+
+class DeliveryDeferred(Exception):
+    """
+    El email no se envió ahora pero no falló: debe reintentarse más tarde
+    (por ejemplo, se superó el límite de envíos hacia su dominio)
+    
+    Args:
+        retry_after: Segundos sugeridos antes de reintentar
+        reason: Motivo del aplazamiento
+    """
+    
+    def __init__(self, retry_after: float, reason: str = "Delivery deferred"):
+        super().__init__(f"{reason} (retry in {retry_after:.1f}s)")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class EmailDeliveryError(Exception):
+    """
+    El servidor rechazó el email o no se pudo contactar
+    
+    Args:
+        message: Descripción del error
+        permanent: True si reintentar no va a funcionar (ej: SMTP 5xx en el
+            destinatario); False para errores transitorios (4xx, conexión)
+        code: Código SMTP, si lo hay
+    """
+    
+    def __init__(self, message: str, permanent: bool = False, code: Optional[int] = None):
+        super().__init__(message)
+        self.permanent = permanent
+        self.code = code
 
 
 class IEmailSender(ABC):
@@ -48,14 +287,38 @@ class IEmailSender(ABC):
     """
     
     @abstractmethod
-    async def send(self, recipient: str, subject: str, body: str, html_body: Optional[str] = None) -> bool:
+    async def send(
+        self,
+        recipient: str,
+        subject: str,
+        body: str,
+        html_body: Optional[str] = None,
+        attachments: Sequence[Attachment] = ()
+    ) -> bool:
         """
         Envía un email
         
+        Args:
+            attachments: Adjuntos con `path` (se leen del disco al enviar)
+        
         Returns:
             bool: True si se envió correctamente, False si falló
+            
+        Raises:
+            DeliveryDeferred: Si el envío debe reintentarse más tarde
+            EmailDeliveryError: Si el envío falló (indica si es permanente)
         """
         pass
+    
+    async def close(self) -> None:
+        """Libera los recursos del sender (por ejemplo, conexiones abiertas)"""
+        pass
+
+
+class RenderResult(NamedTuple):
+    """Resultado de renderizar un contexto en un mail-merge"""
+    html: Optional[str]
+    error: Optional[str] = None
 
 
 class ITemplateEngine(ABC):
@@ -76,4 +339,35 @@ class ITemplateEngine(ABC):
         Returns:
             str: HTML renderizado
         """
-        pass
\ No newline at end of file
+        pass
+    
+    def render_many(self, template_name: str, contexts: Iterable[dict]) -> Iterator[RenderResult]:
+        """
+        Mail-merge: renderiza la misma plantilla con cada contexto
+        
+        Los resultados se entregan en el mismo orden que los contextos y a medida
+        que se generan. Un contexto que falla se reporta en RenderResult.error
+        sin detener el resto.
+        
+        Args:
+            template_name: Nombre del archivo de plantilla
+            contexts: Contextos a renderizar (puede ser un generador)
+            
+        Raises:
+            FileNotFoundError: Si la plantilla no existe
+        """
+        for context in contexts:
+            try:
+                yield RenderResult(self.render(template_name, context))
+            except FileNotFoundError:
+                raise
+            except Exception as e:
+                yield RenderResult(None, f"{type(e).__name__}: {e}")
+    
+    def clear_cache(self) -> None:
+        """Descarta las plantillas cacheadas (se vuelven a leer en el próximo render)"""
+        pass
+    
+    def close(self) -> None:
+        """Libera los recursos del motor (por ejemplo, procesos de render)"""
+        pass
@@ -1,10 +1,110 @@
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import signal
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from config.config import app_config
+from config.config import app_config, database_config, delivery_config, log_config
 from routes.email_routes import email_router
+from routes.delivery_routes import delivery_router
 from middlewares.cors import app_cors
-from config.database.connection import init_db
+from middlewares.correlation import app_correlation
+from config.database.connection import init_db, async_engine
+from dependencies import delivery_worker_enabled, email_service_scope, get_email_sender, get_status_buffer, get_template_engine
+from utils.logger import setup_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicializa la base de datos y el outbox al arrancar, y los detiene al apagar"""
+    log_listener = setup_logging(
+        level=log_config["LOG_LEVEL"],
+        fmt=log_config["LOG_FORMAT"],
+        sample_rate=log_config["LOG_SAMPLE_RATE"],
+        queue_size=log_config["LOG_QUEUE_SIZE"]
+    )
+    
+    init_db(database_config["SCHEMA_CHECK"])
+    logger.info("Database initialized successfully")
+    
+    # SIGHUP descarta las plantillas compiladas (recarga sin reiniciar)
+    loop = asyncio.get_running_loop()
+    hup_registered = False
+    if hasattr(signal, "SIGHUP"):
+        try:
+            loop.add_signal_handler(signal.SIGHUP, get_template_engine().clear_cache)
+            hup_registered = True
+        except (NotImplementedError, RuntimeError):
+            pass
+    
+    # Write-behind de los estados de envío
+    status_buffer = get_status_buffer()
+    if status_buffer is not None:
+        await status_buffer.start()
+    
+    app.state.outbox_worker = None
+    app.state.delivery_worker = None
+    app.state.scheduled_dispatcher = None
+    outbox_mode = delivery_config["DELIVERY_MODE"] == "outbox"
+    # En modo síncrono el worker solo envía los emails aplazados y los reintentos
+    if delivery_worker_enabled():
+        # Solo se importa si hay worker: no es parte del arranque en frío de una función serverless
+        from services.outbox_worker import OutboxWorker
+        
+        app.state.delivery_worker = OutboxWorker(
+            email_service_scope,
+            concurrency=delivery_config["OUTBOX_WORKERS"],
+            batch_size=delivery_config["OUTBOX_BATCH_SIZE"],
+            poll_interval=delivery_config["OUTBOX_POLL_INTERVAL"],
+            lease_seconds=delivery_config["OUTBOX_LEASE_SECONDS"],
+            retries_only=not outbox_mode,
+            reserved_workers=delivery_config["OUTBOX_RESERVED_WORKERS"]
+        )
+        await app.state.delivery_worker.start()
+        logger.info("Outbox iniciado", extra={"workers": delivery_config["OUTBOX_WORKERS"], "retries_only": not outbox_mode})
+        
+        # Solo en modo outbox las peticiones delegan el envío al worker
+        if outbox_mode:
+            app.state.outbox_worker = app.state.delivery_worker
+        
+        # Envíos programados (send_at): despierta al worker cuando vencen
+        from services.scheduled_dispatcher import ScheduledSendDispatcher
+        
+        app.state.scheduled_dispatcher = ScheduledSendDispatcher(
+            email_service_scope,
+            app.state.delivery_worker,
+            window=delivery_config["SCHEDULE_WINDOW"],
+            max_timers=delivery_config["SCHEDULE_MAX_TIMERS"]
+        )
+        await app.state.scheduled_dispatcher.start()
+    
+    yield
+    
+    if app.state.scheduled_dispatcher is not None:
+        await app.state.scheduled_dispatcher.stop()
+    
+    if app.state.delivery_worker is not None:
+        await app.state.delivery_worker.stop()
+        logger.info("Outbox detenido")
+    
+    # Después del outbox: sus últimos envíos también quedan guardados
+    if status_buffer is not None:
+        await status_buffer.stop()
+    
+    if hup_registered:
+        loop.remove_signal_handler(signal.SIGHUP)
+    
+    await get_email_sender().close()
+    get_template_engine().close()
+    
+    if async_engine is not None:
+        await async_engine.dispose()
+    
+    shutdown_logging(log_listener)
+
 
 app = FastAPI(
     title=app_config["APP_NAME"],
@@ -14,16 +114,11 @@ app = FastAPI(
         "name": app_config["CONTACT_NAME"]
     },
     docs_url="/",
+    lifespan=lifespan,
 )
 
-# Inicializar base de datos al arrancar
-@app.on_event("startup")
-async def startup_event():
-    """Evento que se ejecuta al iniciar la aplicación"""
-    init_db()
-    print("✅ Database initialized successfully")
-
 app_cors(app)
+app_correlation(app)
 
 app.mount("/public", StaticFiles(directory="static"), name="static")
 
@@ -36,4 +131,10 @@ async def root():
     """
     return FileResponse("static/index.html")
 
-app.include_router(email_router, prefix="/emails", tags=["Emails"])
\ No newline at end of file
+app.include_router(email_router, prefix="/emails", tags=["Emails"])
+app.include_router(delivery_router, prefix="/delivery", tags=["Delivery"])
+
+if app_config["METRICS_ENABLED"]:
+    from routes.metrics_routes import metrics_router
+    
+    app.include_router(metrics_router, tags=["Metrics"])
\ No newline at end of file
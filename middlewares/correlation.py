@@ -0,0 +1,42 @@
+from fastapi import FastAPI
+from utils.logger import log_context, new_correlation_id
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+class CorrelationIdMiddleware:
+    """
+    Middleware ASGI: asigna un correlation id a cada petición
+
+    Usa el header X-Request-ID recibido (o genera uno), lo agrega a los logs
+    emitidos durante la petición y lo devuelve en la respuesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or new_correlation_id()
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        with log_context(correlation_id=request_id):
+            await self.app(scope, receive, send_with_request_id)
+
+
+def app_correlation(app: FastAPI):
+    app.add_middleware(CorrelationIdMiddleware)
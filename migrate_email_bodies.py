@@ -0,0 +1,173 @@
+"""
+Script para mover los cuerpos de los emails existentes a email_contents
+Ejecutar: python migrate_email_bodies.py [--batch-size 1000] [--drop-columns] [--vacuum]
+
+Antes de los cuerpos direccionados por contenido, body y html_body eran
+columnas TEXT de emails. Este script:
+
+1. Crea email_contents y las columnas body_hash/html_body_hash si faltan
+2. Por lotes, guarda cada cuerpo comprimido (una vez por contenido distinto),
+   completa los hashes y deja body/html_body en NULL
+3. Con --drop-columns elimina las columnas viejas; con --vacuum compacta la
+   tabla para devolver el espacio
+
+Se puede interrumpir y volver a ejecutar: cada lote se confirma por separado
+y solo se procesan las filas que todavía tienen body o html_body.
+Ejecutarlo antes de levantar la nueva versión de la app: los emails sin
+migrar se enviarían sin cuerpo.
+"""
+
+import argparse
+import sys
+import time
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.engine import Engine
+from models.email_model import Base, EmailContent
+from config.database.migrations import apply_migrations
+from utils.content_store import content_rows, insert_contents
+
+LEGACY_COLUMNS = ("body", "html_body")
+
+
+def ensure_schema(engine: Engine) -> None:
+    """Crea email_contents y agrega body_hash/html_body_hash a emails"""
+    Base.metadata.create_all(bind=engine)
+
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            apply_migrations(conn)
+            return
+
+        columns = {column["name"] for column in inspect(conn).get_columns("emails")}
+        for column in ("body_hash", "html_body_hash"):
+            if column not in columns:
+                conn.execute(text(
+                    f"ALTER TABLE emails ADD COLUMN {column} VARCHAR(64) NULL REFERENCES email_contents (hash)"
+                ))
+        conn.commit()
+
+
+def legacy_columns(engine: Engine) -> bool:
+    """True si emails todavía tiene las columnas body y html_body"""
+    columns = {column["name"] for column in inspect(engine).get_columns("emails")}
+    return all(column in columns for column in LEGACY_COLUMNS)
+
+
+def migrate(engine: Engine, batch_size: int = 1000) -> dict:
+    """
+    Mueve los cuerpos de emails a email_contents
+
+    Returns:
+        dict: Filas migradas, bytes de texto movidos y contenidos nuevos en email_contents
+    """
+    report = {"rows": 0, "text_bytes": 0, "contents_added": 0}
+    insert_statement = insert_contents(engine.dialect.name)
+    pending = text(
+        "SELECT id, body, html_body FROM emails "
+        "WHERE body IS NOT NULL OR html_body IS NOT NULL "
+        "ORDER BY id LIMIT :limit"
+    )
+    update_row = text(
+        "UPDATE emails SET body_hash = :body_hash, html_body_hash = :html_body_hash, "
+        "body = NULL, html_body = NULL WHERE id = :id"
+    )
+
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(pending, {"limit": batch_size}).all()
+            if not rows:
+                break
+
+            hashes, contents = content_rows(value for row in rows for value in (row.body, row.html_body))
+            added = 0
+            if contents:
+                existing = conn.execute(
+                    select(func.count()).where(EmailContent.hash.in_([row["hash"] for row in contents]))
+                ).scalar_one()
+                conn.execute(insert_statement, contents)
+                added = len(contents) - existing
+
+            conn.execute(update_row, [
+                {"id": row.id, "body_hash": hashes[2 * index], "html_body_hash": hashes[2 * index + 1]}
+                for index, row in enumerate(rows)
+            ])
+
+        report["rows"] += len(rows)
+        report["text_bytes"] += sum(
+            len(value.encode("utf-8")) for row in rows for value in (row.body, row.html_body) if value
+        )
+        report["contents_added"] += added
+
+    return report
+
+
+def storage_totals(engine: Engine) -> dict:
+    """Tamaño de los cuerpos guardados en email_contents (sin comprimir y comprimido)"""
+    with engine.connect() as conn:
+        contents, size, compressed = conn.execute(
+            select(func.count(), func.sum(EmailContent.size), func.sum(func.length(EmailContent.data)))
+        ).one()
+    return {"contents": contents, "text_bytes": size or 0, "compressed_bytes": compressed or 0}
+
+
+def drop_legacy_columns(engine: Engine) -> None:
+    with engine.begin() as conn:
+        for column in LEGACY_COLUMNS:
+            conn.execute(text(f"ALTER TABLE emails DROP COLUMN {column}"))
+
+
+def vacuum(engine: Engine) -> None:
+    """Devuelve al sistema el espacio liberado (VACUUM no se puede ejecutar en una transacción)"""
+    statement = "VACUUM FULL emails" if engine.dialect.name == "postgresql" else "VACUUM"
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(statement))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Emails por transacción")
+    parser.add_argument("--drop-columns", action="store_true", help="Eliminar body y html_body al terminar")
+    parser.add_argument("--vacuum", action="store_true", help="Compactar la tabla al terminar")
+    args = parser.parse_args()
+
+    from config.database.connection import engine
+
+    print("=" * 60)
+    print("📦 Migrando cuerpos de emails a email_contents")
+    print("=" * 60)
+
+    try:
+        ensure_schema(engine)
+
+        if not legacy_columns(engine):
+            print("ℹ️  La tabla emails no tiene columnas body/html_body: nada que migrar")
+        else:
+            started = time.perf_counter()
+            report = migrate(engine, args.batch_size)
+            print(
+                f"✅ {report['rows']} emails migrados en {time.perf_counter() - started:.1f}s "
+                f"({report['text_bytes']} bytes de texto, {report['contents_added']} contenidos nuevos)"
+            )
+
+            if args.drop_columns:
+                drop_legacy_columns(engine)
+                print("✅ Columnas body y html_body eliminadas")
+
+        if args.vacuum:
+            vacuum(engine)
+            print("✅ Tabla compactada")
+
+        totals = storage_totals(engine)
+        ratio = totals["text_bytes"] / totals["compressed_bytes"] if totals["compressed_bytes"] else 0
+        print(
+            f"ℹ️  email_contents: {totals['contents']} contenidos, {totals['text_bytes']} bytes de texto "
+            f"guardados en {totals['compressed_bytes']} bytes ({ratio:.1f}x)"
+        )
+
+    except Exception as e:
+        print(f"❌ Error al migrar: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
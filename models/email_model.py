@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum
+from sqlalchemy import BigInteger, Column, Integer, String, Text, DateTime, Enum, Index, LargeBinary, ForeignKey, text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 import enum
@@ -11,17 +11,111 @@ class EmailStatus(str, enum.Enum):
     PENDING = "pending"
     SENT = "sent"
     FAILED = "failed"
+    # Dead-letter: se agotaron los reintentos automáticos
+    DEAD = "dead"
+
+
+class EmailPriority(str, enum.Enum):
+    """
+    Prioridad de envío: cada una es un carril del outbox con su propia cola
+    (en este orden: los workers compartidos atienden primero a HIGH)
+    """
+    # Transaccionales: recuperación de contraseña, bienvenida, confirmaciones
+    HIGH = "high"
+    NORMAL = "normal"
+    # Campañas y envíos masivos
+    LOW = "low"
+
+
+class EmailContent(Base):
+    """
+    Cuerpo de un email (texto o HTML) direccionado por contenido
+
+    La clave es el SHA-256 del texto: los cuerpos idénticos (ej: una campaña
+    con la misma plantilla y datos) se guardan una sola vez. `data` está
+    comprimido con zlib.
+    """
+    __tablename__ = "email_contents"
+
+    hash = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    # Tamaño sin comprimir en bytes (UTF-8)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class IdempotencyKey(Base):
+    """
+    Idempotency-Key de un POST /emails/send: un reintento con la misma clave
+    retorna el email ya creado en lugar de crear y enviar otro
+
+    Tabla propia (no una columna única de emails): un índice único en una
+    tabla particionada debe incluir la columna de partición.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    # SHA-256 de la petición original: la misma clave con otro contenido es un error
+    request_hash = Column(String(64), nullable=False)
+    # Indexado: al eliminar un email se eliminan sus claves
+    email_id = Column(Integer, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Una clave vencida se puede volver a usar (y el job de retención la borra)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class EmailAttachment(Base):
+    """
+    Archivo adjunto de un email
+
+    El contenido está en ATTACHMENTS_DIR con su SHA-256 como nombre (ver
+    AttachmentStore); un mismo archivo adjunto a muchos emails se guarda una
+    sola vez. Sin ForeignKey a emails: en la tabla particionada la clave
+    primaria de emails es (id, created_at).
+    """
+    __tablename__ = "email_attachments"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    email_id = Column(Integer, nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(255), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    # Indexado: el job de retención borra los archivos que ya no usa ningún email
+    hash = Column(String(64), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 
 class Email(Base):
     """Modelo de base de datos para emails"""
     __tablename__ = "emails"
+    __table_args__ = (
+        # Usado por el outbox para encontrar emails pendientes en orden de llegada
+        Index("ix_emails_status_id", "status", "id"),
+        # Paginación por cursor: ORDER BY created_at DESC, id DESC
+        Index("ix_emails_created_at_id", "created_at", "id"),
+        # Emails aplazados y reintentos programados (solo indexa las filas con next_attempt_at)
+        Index(
+            "ix_emails_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=text("next_attempt_at IS NOT NULL")
+        ),
+        # El outbox reserva los pendientes de cada prioridad por separado
+        Index("ix_emails_priority_status_id", "priority", "status", "id"),
+        # Próximos envíos programados (solo indexa las filas con send_at)
+        Index(
+            "ix_emails_send_at",
+            "send_at",
+            postgresql_where=text("send_at IS NOT NULL")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     recipient = Column(String(255), nullable=False, index=True)
     subject = Column(String(500), nullable=False)
-    body = Column(Text, nullable=True)
-    html_body = Column(Text, nullable=True)
+    # Referencias a email_contents (ver EmailContent); los índices permiten
+    # saber rápido si un contenido quedó sin emails al archivarlos
+    body_hash = Column(String(64), ForeignKey("email_contents.hash"), nullable=True, index=True)
+    html_body_hash = Column(String(64), ForeignKey("email_contents.hash"), nullable=True, index=True)
     status = Column(
         Enum(EmailStatus, name='emailstatus', create_type=False), 
         default=EmailStatus.PENDING, 
@@ -29,8 +123,46 @@ class Email(Base):
     )
     error_message = Column(Text, nullable=True)
     sent_at = Column(DateTime, nullable=True)
+    # Momento en que un worker del outbox tomó el email (lease para evitar envíos duplicados)
+    claimed_at = Column(DateTime, nullable=True)
+    # Un email aplazado (límite de envío) o fallido con reintento programado
+    # no se vuelve a intentar antes de este momento
+    next_attempt_at = Column(DateTime, nullable=True)
+    # Intentos de envío realizados (los aplazamientos no cuentan)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    # VARCHAR con los valores en minúscula: agregar la columna no necesita un tipo ENUM nuevo
+    priority = Column(
+        Enum(EmailPriority, native_enum=False, length=10, values_callable=lambda e: [m.value for m in e]),
+        default=EmailPriority.NORMAL,
+        server_default=EmailPriority.NORMAL.value,
+        nullable=False
+    )
+    # Envío programado: el email no se envía antes de este momento (UTC)
+    send_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    # Cuerpos ya descomprimidos y adjuntos (EmailAttachment); no son columnas:
+    # el repositorio los completa en los emails que se van a enviar
+    # (create, get_by_id, claim_pending)
+    body = None
+    html_body = None
+    attachments = ()
+
     def __repr__(self):
-        return f"<Email(id={self.id}, recipient={self.recipient}, status={self.status})>"
\ No newline at end of file
+        return f"<Email(id={self.id}, recipient={self.recipient}, status={self.status})>"
+
+
+class SchemaVersion(Base):
+    """
+    Versión del esquema aplicada a la base de datos (una sola fila)
+
+    Al arrancar se compara con la de los modelos y las migraciones
+    (config/database/migrations.py): si coincide no hace falta revisar el
+    catálogo ni ejecutar create_all y las migraciones.
+    """
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(String(64), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,9 +1,67 @@
-from typing import List, Optional
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, case, cast, delete, func, insert, literal, or_, select, text, tuple_, update
 from sqlalchemy.orm import Session
-from models.email_model import Email, EmailStatus
+from models.email_model import Email, EmailAttachment, EmailContent, EmailPriority, EmailStatus, IdempotencyKey
 from schemas.email_schema import EmailCreate, EmailUpdate
-from interfaces.email_interfaces import IEmailRepository
-from datetime import datetime
+from interfaces.email_interfaces import (
+    Attachment, EmailSummary, IdempotencyRecord, IEmailRepository, StatusUpdate
+)
+from utils.content_store import (
+    attach_contents, body_hashes, cached_contents, content_rows, decompress_contents, insert_contents
+)
+from utils.attachment_store import attach_attachments, attachment_rows, attachments_query
+from utils.idempotency import insert_idempotency_key
+from utils.metrics import REPOSITORY_SECONDS, timed
+from datetime import datetime, timedelta
+
+# Columnas de EmailSummary, en el mismo orden
+_SUMMARY_COLUMNS = [getattr(Email, field) for field in EmailSummary._fields]
+
+
+def _filtered_summaries(
+    status: Optional[EmailStatus],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    after_id: Optional[int]
+):
+    """SELECT de las columnas de EmailSummary con los filtros de la exportación"""
+    query = select(*_SUMMARY_COLUMNS)
+    if status is not None:
+        query = query.where(Email.status == status)
+    if since is not None:
+        query = query.where(Email.created_at >= since)
+    if until is not None:
+        query = query.where(Email.created_at < until)
+    if after_id is not None:
+        query = query.where(Email.id > after_id)
+    return query
+
+
+def _status_updates_statement(updates: List[StatusUpdate]):
+    """
+    UPDATE de varias filas, cada una con sus valores, en una sola sentencia
+    (SET columna = CASE id WHEN ... THEN ... END; igual en PostgreSQL y SQLite)
+    """
+    def by_id(field: str, column):
+        return case(
+            {item.email_id: literal(getattr(item, field), column.type) for item in updates},
+            value=Email.id
+        )
+
+    return (
+        update(Email)
+        .where(Email.id.in_([item.email_id for item in updates]))
+        .values(
+            # Sin CAST, PostgreSQL trata el CASE de literales como texto y no lo asigna al ENUM
+            status=cast(by_id("status", Email.status), Email.status.type),
+            error_message=by_id("error_message", Email.error_message),
+            claimed_at=None,
+            next_attempt_at=by_id("next_attempt_at", Email.next_attempt_at),
+            attempts=by_id("attempts", Email.attempts),
+            sent_at=func.coalesce(by_id("sent_at", Email.sent_at), Email.sent_at),
+            updated_at=by_id("updated_at", Email.updated_at)
+        )
+    )
 
 
 class EmailRepository(IEmailRepository):
@@ -15,33 +73,200 @@ class EmailRepository(IEmailRepository):
     def __init__(self, db: Session):
         self.db = db
     
-    async def create(self, email_data: EmailCreate) -> Email:
-        """Crea un nuevo registro de email en la base de datos"""
+    @timed(REPOSITORY_SECONDS.labels("create"))
+    async def create(
+        self,
+        email_data: EmailCreate,
+        idempotency: Optional[IdempotencyRecord] = None,
+        attachments: Sequence[Attachment] = (),
+        claim: bool = False
+    ) -> Optional[Email]:
+        """
+        Crea un nuevo registro de email en la base de datos
+        
+        Con `idempotency` la clave se guarda en la misma transacción; si otra
+        petición ya la tiene se descarta todo y se retorna None. Los adjuntos
+        (ya guardados en disco) se registran en email_attachments. Un email
+        programado queda con next_attempt_at = send_at: el outbox no lo
+        reserva antes de ese momento.
+        
+        Con `claim` un email no programado se crea ya reservado (claimed_at) y vencido
+        (next_attempt_at): quien lo crea lo envía en el momento y, si el
+        proceso muere antes de guardar el resultado, el outbox de reintentos
+        lo toma cuando vence la reserva, igual que un email reservado por él.
+        """
+        body_hash, html_body_hash = self._store_contents([email_data.body, email_data.html_body])
         email = Email(
             recipient=email_data.recipient,
             subject=email_data.subject,
-            body=email_data.body,
-            html_body=email_data.html_body,
-            status=EmailStatus.PENDING
+            body_hash=body_hash,
+            html_body_hash=html_body_hash,
+            status=EmailStatus.PENDING,
+            priority=email_data.priority,
+            send_at=email_data.send_at,
+            next_attempt_at=email_data.send_at
         )
+        if claim and email_data.send_at is None:
+            email.claimed_at = email.next_attempt_at = datetime.utcnow()
         
         self.db.add(email)
+        if idempotency is not None or attachments:
+            self.db.flush()
+        if idempotency is not None:
+            result = self.db.execute(insert_idempotency_key(self.db.get_bind().dialect.name, idempotency, email.id))
+            if result.rowcount == 0:
+                self.db.rollback()
+                return None
+        if attachments:
+            self.db.execute(insert(EmailAttachment), attachment_rows(email.id, attachments))
         self.db.commit()
         self.db.refresh(email)
         
+        email.body = email_data.body
+        email.html_body = email_data.html_body
+        email.attachments = tuple(attachments)
+        
         return email
     
+    @timed(REPOSITORY_SECONDS.labels("create_many"))
+    async def create_many(self, emails: List[EmailCreate], claim: bool = False) -> List[int]:
+        """
+        Crea varios emails con un INSERT multi-fila y retorna sus IDs
+        en el mismo orden de la lista
+        
+        Con `claim` los que no están programados se crean ya reservados, como en create.
+        """
+        if not emails:
+            return []
+        
+        hashes = self._store_contents(
+            text for email_data in emails for text in (email_data.body, email_data.html_body)
+        )
+        now = datetime.utcnow()
+        rows = [
+            {
+                "recipient": email_data.recipient,
+                "subject": email_data.subject,
+                "body_hash": hashes[2 * index],
+                "html_body_hash": hashes[2 * index + 1],
+                "status": EmailStatus.PENDING,
+                "priority": email_data.priority,
+                "send_at": email_data.send_at,
+                "claimed_at": now if claim and email_data.send_at is None else None,
+                "next_attempt_at": email_data.send_at or (now if claim else None),
+                "created_at": now,
+                "updated_at": now
+            }
+            for index, email_data in enumerate(emails)
+        ]
+        
+        result = self.db.execute(
+            insert(Email).returning(Email.id, sort_by_parameter_order=True),
+            rows
+        )
+        ids = list(result.scalars())
+        self.db.commit()
+        
+        return ids
+    
+    @timed(REPOSITORY_SECONDS.labels("get_by_id"))
     async def get_by_id(self, email_id: int) -> Optional[Email]:
-        """Obtiene un email por su ID"""
-        return self.db.query(Email).filter(Email.id == email_id).first()
+        """Obtiene un email por su ID (con body, html_body y adjuntos)"""
+        email = self._get(email_id)
+        
+        if email:
+            self._load_contents([email])
+            self._load_attachments([email])
+        
+        return email
+    
+    @timed(REPOSITORY_SECONDS.labels("get_idempotency_key"))
+    async def get_idempotency_key(self, key: str) -> Optional[IdempotencyRecord]:
+        """Obtiene una Idempotency-Key sin vencer"""
+        result = self.db.execute(
+            select(
+                IdempotencyKey.key,
+                IdempotencyKey.request_hash,
+                IdempotencyKey.expires_at,
+                IdempotencyKey.email_id
+            )
+            .where(IdempotencyKey.key == key, IdempotencyKey.expires_at > datetime.utcnow())
+        )
+        row = result.first()
+        return IdempotencyRecord(*row) if row else None
+    
+    @timed(REPOSITORY_SECONDS.labels("get_summary"))
+    async def get_summary(self, email_id: int) -> Optional[EmailSummary]:
+        """
+        Obtiene las columnas de un email sin sus cuerpos
+        
+        Consulta solo las columnas de EmailSummary: no crea objetos del ORM
+        ni los registra en la sesión.
+        """
+        row = self.db.execute(select(*_SUMMARY_COLUMNS).where(Email.id == email_id)).first()
+        return EmailSummary(*row) if row else None
+    
+    @timed(REPOSITORY_SECONDS.labels("get_all"))
+    async def get_all(self, skip: int = 0, limit: int = 100) -> List[EmailSummary]:
+        """Obtiene lista de emails (sin cuerpos) con paginación"""
+        rows = self.db.execute(
+            select(*_SUMMARY_COLUMNS)
+            .order_by(Email.created_at.desc(), Email.id.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        return [EmailSummary(*row) for row in rows]
+    
+    @timed(REPOSITORY_SECONDS.labels("get_page"))
+    async def get_page(self, limit: int, after: Optional[Tuple[datetime, int]] = None) -> List[EmailSummary]:
+        """
+        Paginación por cursor (keyset): usa el índice (created_at, id) y su
+        costo no depende de qué tan lejos esté la página
+        """
+        query = select(*_SUMMARY_COLUMNS)
+        
+        if after is not None:
+            query = query.where(tuple_(Email.created_at, Email.id) < tuple_(*after))
+        
+        rows = self.db.execute(query.order_by(Email.created_at.desc(), Email.id.desc()).limit(limit))
+        return [EmailSummary(*row) for row in rows]
+    
+    async def iter_summaries(
+        self,
+        batch_size: int,
+        status: Optional[EmailStatus] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after_id: Optional[int] = None
+    ) -> AsyncIterator[List[EmailSummary]]:
+        """
+        Recorre los emails (sin cuerpos) por id ascendente, en lotes de `batch_size`
+        
+        Usa un cursor del servidor (yield_per): la memoria no depende de
+        cuántas filas haya. Cada lote se lee de forma bloqueante, como el
+        resto de este repositorio.
+        """
+        result = self.db.execute(
+            _filtered_summaries(status, since, until, after_id)
+            .order_by(Email.id)
+            .execution_options(yield_per=batch_size)
+        )
+        
+        try:
+            for partition in result.partitions():
+                yield [EmailSummary(*row) for row in partition]
+        finally:
+            result.close()
     
-    async def get_all(self, skip: int = 0, limit: int = 100) -> List[Email]:
-        """Obtiene lista de emails con paginación"""
-        return self.db.query(Email).offset(skip).limit(limit).all()
+    @timed(REPOSITORY_SECONDS.labels("get_contents"))
+    async def get_contents(self, hashes: Iterable[str]) -> Dict[str, str]:
+        """Obtiene cuerpos por hash: del cache, y con una sola consulta los que falten"""
+        return self._get_contents(hashes)
     
+    @timed(REPOSITORY_SECONDS.labels("update"))
     async def update(self, email_id: int, email_data: EmailUpdate) -> Optional[Email]:
         """Actualiza un email existente"""
-        email = await self.get_by_id(email_id)
+        email = self._get(email_id)
         
         if not email:
             return None
@@ -58,31 +283,64 @@ class EmailRepository(IEmailRepository):
         
         return email
     
+    @timed(REPOSITORY_SECONDS.labels("delete"))
     async def delete(self, email_id: int) -> bool:
         """Elimina un email"""
-        email = await self.get_by_id(email_id)
+        email = self._get(email_id)
         
         if not email:
             return False
         
         self.db.delete(email)
+        self.db.execute(delete(EmailAttachment).where(EmailAttachment.email_id == email_id))
+        # Un reintento con su Idempotency-Key ya no tiene qué retornar: se crea de nuevo
+        self.db.execute(delete(IdempotencyKey).where(IdempotencyKey.email_id == email_id))
         self.db.commit()
         
         return True
     
+    @timed(REPOSITORY_SECONDS.labels("count"))
     async def count(self) -> int:
         """Cuenta total de emails"""
         return self.db.query(Email).count()
     
-    async def update_status(self, email_id: int, status: EmailStatus, error_message: Optional[str] = None) -> Optional[Email]:
-        """Método auxiliar para actualizar el estado de un email"""
-        email = await self.get_by_id(email_id)
+    @timed(REPOSITORY_SECONDS.labels("estimate_count"))
+    async def estimate_count(self) -> Optional[int]:
+        """Total aproximado según las estadísticas de PostgreSQL (pg_class.reltuples)"""
+        if self.db.get_bind().dialect.name != "postgresql":
+            return None
+        
+        estimate = self.db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'emails'::regclass")
+        ).scalar()
+        
+        # reltuples es -1 si la tabla nunca se analizó
+        return estimate if estimate is not None and estimate >= 0 else None
+    
+    @timed(REPOSITORY_SECONDS.labels("update_status"))
+    async def update_status(
+        self,
+        email_id: int,
+        status: EmailStatus,
+        error_message: Optional[str] = None,
+        next_attempt_at: Optional[datetime] = None
+    ) -> Optional[Email]:
+        """
+        Registra el resultado de un intento de envío
+        
+        Incrementa attempts y, si se indica next_attempt_at, deja programado
+        el reintento.
+        """
+        email = self._get(email_id)
         
         if not email:
             return None
         
         email.status = status
         email.error_message = error_message
+        email.claimed_at = None
+        email.next_attempt_at = next_attempt_at
+        email.attempts = (email.attempts or 0) + 1
         
         if status == EmailStatus.SENT:
             email.sent_at = datetime.utcnow()
@@ -90,4 +348,191 @@ class EmailRepository(IEmailRepository):
         self.db.commit()
         self.db.refresh(email)
         
-        return email
\ No newline at end of file
+        return email
+    
+    @timed(REPOSITORY_SECONDS.labels("mark_status"))
+    async def mark_status(
+        self,
+        email_ids: List[int],
+        status: EmailStatus,
+        error_message: Optional[str] = None,
+        next_attempt_at: Optional[datetime] = None
+    ) -> None:
+        """Registra el mismo resultado de intento para varios emails con un solo UPDATE"""
+        if not email_ids:
+            return
+        
+        now = datetime.utcnow()
+        values = {
+            "status": status,
+            "error_message": error_message,
+            "claimed_at": None,
+            "next_attempt_at": next_attempt_at,
+            "attempts": Email.attempts + 1,
+            "updated_at": now
+        }
+        if status == EmailStatus.SENT:
+            values["sent_at"] = now
+        
+        self.db.execute(update(Email).where(Email.id.in_(email_ids)).values(**values))
+        self.db.commit()
+    
+    @timed(REPOSITORY_SECONDS.labels("apply_status_updates"))
+    async def apply_status_updates(self, updates: List[StatusUpdate]) -> None:
+        """Guarda los resultados de varios intentos de envío (distintos por email) con un solo UPDATE"""
+        if not updates:
+            return
+        
+        self.db.execute(_status_updates_statement(updates))
+        self.db.commit()
+    
+    @timed(REPOSITORY_SECONDS.labels("defer"))
+    async def defer(self, email_ids: List[int], next_attempt_at: datetime, reason: Optional[str] = None) -> None:
+        """Libera la reserva de emails aplazados y fija cuándo reintentarlos"""
+        if not email_ids:
+            return
+        
+        self.db.execute(
+            update(Email)
+            .where(Email.id.in_(email_ids))
+            .values(
+                status=EmailStatus.PENDING,
+                error_message=reason,
+                claimed_at=None,
+                next_attempt_at=next_attempt_at,
+                updated_at=datetime.utcnow()
+            )
+        )
+        self.db.commit()
+    
+    @timed(REPOSITORY_SECONDS.labels("claim_pending"))
+    async def claim_pending(
+        self,
+        limit: int,
+        lease_seconds: int,
+        retries_only: bool = False,
+        priority: Optional[EmailPriority] = None
+    ) -> List[Email]:
+        """
+        Reserva un lote de emails para ser enviados por el outbox: los PENDING
+        nuevos y los aplazados o FAILED cuyo next_attempt_at ya llegó.
+        
+        Usa FOR UPDATE SKIP LOCKED para que varios procesos puedan drenar la
+        tabla a la vez sin tomar los mismos registros. Un email reservado cuyo
+        lease expiró (por ejemplo, el proceso murió) vuelve a estar disponible.
+        Con `priority` solo reserva emails de esa prioridad (un carril del outbox).
+        """
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=lease_seconds)
+        
+        due_retry = and_(
+            Email.status.in_([EmailStatus.PENDING, EmailStatus.FAILED]),
+            Email.next_attempt_at <= now
+        )
+        
+        query = self.db.query(Email).filter(
+            or_(Email.claimed_at.is_(None), Email.claimed_at < lease_expired)
+        )
+        
+        if retries_only:
+            query = query.filter(due_retry)
+        else:
+            query = query.filter(or_(
+                and_(Email.status == EmailStatus.PENDING, Email.next_attempt_at.is_(None)),
+                due_retry
+            ))
+        
+        if priority is not None:
+            query = query.filter(Email.priority == priority)
+        
+        emails = (
+            query
+            .order_by(Email.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        
+        for email in emails:
+            email.claimed_at = now
+        
+        self._load_contents(emails)
+        self._load_attachments(emails)
+        
+        # Desasociar los objetos antes del commit para que no se expiren
+        # y el worker pueda leerlos sin volver a consultar la base de datos
+        self.db.flush()
+        for email in emails:
+            self.db.expunge(email)
+        self.db.commit()
+        
+        return emails
+    
+    @timed(REPOSITORY_SECONDS.labels("release_claims"))
+    async def release_claims(self, email_ids: List[int]) -> None:
+        """Libera la reserva de emails que no llegaron a enviarse"""
+        if not email_ids:
+            return
+        
+        self.db.query(Email).filter(
+            Email.id.in_(email_ids),
+            Email.status.in_([EmailStatus.PENDING, EmailStatus.FAILED])
+        ).update({Email.claimed_at: None}, synchronize_session=False)
+        self.db.commit()
+    
+    @timed(REPOSITORY_SECONDS.labels("get_send_times"))
+    async def get_send_times(self, after: datetime, until: datetime, limit: int) -> List[datetime]:
+        """
+        Momentos distintos de envío programado entre `after` y `until`
+        
+        Recorre ix_emails_send_at en orden: una campaña de cientos de miles
+        de emails a la misma hora es una sola fila del resultado.
+        """
+        rows = (
+            self.db.query(Email.send_at)
+            .filter(Email.send_at > after, Email.send_at <= until, Email.status == EmailStatus.PENDING)
+            .distinct()
+            .order_by(Email.send_at)
+            .limit(limit)
+            .all()
+        )
+        return [row[0] for row in rows]
+    
+    def _get(self, email_id: int) -> Optional[Email]:
+        """Obtiene un email por su ID sin leer sus cuerpos"""
+        return self.db.query(Email).filter(Email.id == email_id).first()
+    
+    def _store_contents(self, texts: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """
+        Guarda los cuerpos en email_contents (una vez por contenido distinto)
+        y retorna el hash de cada uno, en el mismo orden
+        """
+        hashes, contents = content_rows(texts)
+        
+        if contents:
+            self.db.execute(insert_contents(self.db.get_bind().dialect.name), contents)
+        
+        return hashes
+    
+    def _get_contents(self, hashes: Iterable[Optional[str]]) -> Dict[str, str]:
+        """Cuerpos por hash: del cache, y con una sola consulta los que falten"""
+        texts, missing = cached_contents(hashes)
+        
+        if missing:
+            texts.update(decompress_contents(self.db.execute(
+                select(EmailContent.hash, EmailContent.data).where(EmailContent.hash.in_(missing))
+            )))
+        
+        return texts
+    
+    def _load_contents(self, emails: List[Email]) -> None:
+        """Completa body y html_body de los emails"""
+        attach_contents(emails, self._get_contents(body_hashes(emails)))
+    
+    def _load_attachments(self, emails: List[Email]) -> None:
+        """Completa los adjuntos de los emails con una sola consulta"""
+        if not emails:
+            return
+        
+        rows = self.db.execute(attachments_query([email.id for email in emails]))
+        attach_attachments(emails, rows)
@@ -0,0 +1,130 @@
+"""
+Script de retención: mueve los emails antiguos a archivos comprimidos
+Ejecutar:
+    python retention.py archive [--older-than-days 180] [--batch-size 1000] [--dry-run]
+    python retention.py partition [--months-ahead 3]
+    python retention.py get <id>
+
+- archive: archiva en ARCHIVE_DIR (NDJSON con gzip, un archivo por mes de
+  created_at) los emails creados hace más de RETENTION_DAYS que no tienen
+  envíos pendientes, y los borra de la base de datos por lotes. Con la tabla
+  particionada, además crea las particiones de los próximos meses y elimina
+  las de los meses vencidos. También borra las Idempotency-Key vencidas
+  (POST /emails/send) y los archivos de ATTACHMENTS_DIR que ya no usa
+  ningún email. Conviene ejecutarlo a diario (cron)
+- partition: convierte emails en una tabla particionada por mes (solo
+  PostgreSQL 13+); si ya lo está, crea las particiones que falten
+- get: busca un email archivado por id
+
+GET /emails/{id} también busca en ARCHIVE_DIR los emails que ya no están en
+la base de datos.
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from config.config import attachment_config, retention_config
+from config.database.partitioning import convert_to_partitioned, ensure_partitions, is_partitioned
+from services.retention_job import RetentionJob
+from utils.attachment_store import AttachmentStore
+from utils.email_archive import EmailArchive
+
+
+def archive(args) -> None:
+    from config.database.connection import engine
+
+    cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+    job = RetentionJob(
+        engine,
+        EmailArchive(retention_config["ARCHIVE_DIR"]),
+        batch_size=args.batch_size,
+        months_ahead=retention_config["PARTITION_MONTHS_AHEAD"],
+        attachment_store=AttachmentStore(attachment_config["ATTACHMENTS_DIR"])
+    )
+    print(f"ℹ️  Emails creados antes de {cutoff:%Y-%m-%d %H:%M} → {retention_config['ARCHIVE_DIR']}/")
+
+    if args.dry_run:
+        print(f"ℹ️  {job.count_expired(cutoff)} emails para archivar (--dry-run: no se modifica nada)")
+        return
+
+    started = time.perf_counter()
+    report = job.run(cutoff)
+
+    for name in report["partitions_created"]:
+        print(f"✅ Partición {name} creada")
+    for name in report["partitions_dropped"]:
+        print(f"✅ Partición {name} archivada y eliminada")
+    for month, count in report["by_month"].items():
+        print(f"   {month}: {count} emails")
+    print(
+        f"✅ {report['archived']} emails archivados en {report['batches']} lotes "
+        f"({time.perf_counter() - started:.1f}s); {report['contents_deleted']} cuerpos sin uso eliminados"
+    )
+    print(f"✅ {report['keys_deleted']} Idempotency-Key vencidas eliminadas")
+    print(f"✅ {report['attachments_deleted']} archivos adjuntos sin uso eliminados")
+
+
+def partition(args) -> None:
+    from config.database.connection import engine
+
+    if engine.dialect.name != "postgresql":
+        print("❌ El particionado solo está disponible con PostgreSQL")
+        sys.exit(1)
+
+    with engine.connect() as conn:
+        partitioned = is_partitioned(conn)
+
+    if partitioned:
+        created = ensure_partitions(engine, args.months_ahead)
+        print(f"ℹ️  emails ya está particionada; {len(created)} particiones nuevas {created or ''}")
+        return
+
+    boundary = convert_to_partitioned(engine, args.months_ahead)
+    print(f"✅ emails particionada por mes (emails_legacy contiene todo lo anterior a {boundary:%Y-%m})")
+
+
+def get(args) -> None:
+    email = EmailArchive(retention_config["ARCHIVE_DIR"]).get(args.id)
+    if email is None:
+        print(f"❌ El email {args.id} no está en {retention_config['ARCHIVE_DIR']}/")
+        sys.exit(1)
+    print(json.dumps(email, indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = commands.add_parser("archive", help="Archivar y borrar los emails antiguos")
+    archive_parser.add_argument("--older-than-days", type=int, default=retention_config["RETENTION_DAYS"])
+    archive_parser.add_argument(
+        "--batch-size", type=int, default=retention_config["RETENTION_BATCH_SIZE"], help="Emails por transacción"
+    )
+    archive_parser.add_argument("--dry-run", action="store_true", help="Solo contar los emails a archivar")
+    archive_parser.set_defaults(handler=archive)
+
+    partition_parser = commands.add_parser("partition", help="Particionar emails por mes (PostgreSQL)")
+    partition_parser.add_argument("--months-ahead", type=int, default=retention_config["PARTITION_MONTHS_AHEAD"])
+    partition_parser.set_defaults(handler=partition)
+
+    get_parser = commands.add_parser("get", help="Buscar un email archivado")
+    get_parser.add_argument("id", type=int)
+    get_parser.set_defaults(handler=get)
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🗄️  Retención de emails")
+    print("=" * 60)
+
+    try:
+        args.handler(args)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends
+from controllers.delivery_controller import DeliveryController
+from schemas.delivery_schema import RateLimitSchema, DeliveryLanes, DeliveryLimits, DeliveryQueues, DeliveryRelays
+from dependencies import get_delivery_controller
+
+delivery_router = APIRouter()
+
+
+@delivery_router.get("/limits", status_code=200, response_model=DeliveryLimits)
+async def get_limits(controller: DeliveryController = Depends(get_delivery_controller)):
+    """
+    Obtiene los límites de envío vigentes (por defecto, del relay y por dominio)
+    """
+    return controller.get_limits()
+
+
+@delivery_router.put("/limits/default", status_code=200, response_model=DeliveryLimits)
+async def set_default_limits(
+    limits: RateLimitSchema,
+    controller: DeliveryController = Depends(get_delivery_controller)
+):
+    """
+    Cambia los límites de los dominios sin configuración propia
+    """
+    return controller.set_default_limits(limits)
+
+
+@delivery_router.put("/limits/relay", status_code=200, response_model=DeliveryLimits)
+async def set_relay_limits(
+    limits: RateLimitSchema,
+    controller: DeliveryController = Depends(get_delivery_controller)
+):
+    """
+    Cambia los límites de cada relay SMTP (todos los dominios juntos)
+    """
+    return controller.set_relay_limits(limits)
+
+
+@delivery_router.put("/limits/domains/{domain}", status_code=200, response_model=DeliveryLimits)
+async def set_domain_limits(
+    domain: str,
+    limits: RateLimitSchema,
+    controller: DeliveryController = Depends(get_delivery_controller)
+):
+    """
+    Configura los límites de un dominio destinatario (ej: gmail.com)
+    
+    Los cambios se aplican de inmediato y se pierden al reiniciar; para
+    hacerlos permanentes usa DELIVERY_DOMAIN_LIMITS.
+    """
+    return controller.set_domain_limits(domain, limits)
+
+
+@delivery_router.delete("/limits/domains/{domain}", status_code=200, response_model=DeliveryLimits)
+async def reset_domain_limits(
+    domain: str,
+    controller: DeliveryController = Depends(get_delivery_controller)
+):
+    """
+    Vuelve a aplicar los límites por defecto a un dominio
+    """
+    return controller.reset_domain_limits(domain)
+
+
+@delivery_router.get("/queues", status_code=200, response_model=DeliveryQueues)
+async def get_queues(controller: DeliveryController = Depends(get_delivery_controller)):
+    """
+    Obtiene la profundidad de la cola de cada dominio: envíos esperando su
+    turno, en curso, enviados y aplazados
+    """
+    return controller.get_queues()
+
+
+@delivery_router.get("/relays", status_code=200, response_model=DeliveryRelays)
+async def get_relays(controller: DeliveryController = Depends(get_delivery_controller)):
+    """
+    Obtiene el estado de cada relay SMTP (SMTP_RELAYS): circuito, tasa de
+    error, latencia y envíos
+    """
+    return controller.get_relays()
+
+
+@delivery_router.get("/lanes", status_code=200, response_model=DeliveryLanes)
+async def get_lanes(controller: DeliveryController = Depends(get_delivery_controller)):
+    """
+    Obtiene el estado de los carriles de prioridad del outbox (high, normal,
+    low): emails en cola, en curso y cuánto esperan antes de enviarse
+    """
+    return controller.get_lanes()
@@ -1,37 +1,107 @@
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, File, Form, Header, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from controllers.emails_controller import EmailController
-from schemas.email_schema import EmailCreate, EmailResponse, EmailUpdate, EmailList
+from schemas.email_schema import (
+    EmailCreate, EmailResponse, EmailDetailResponse, EmailUpdate, EmailList, EmailDetailList,
+    EmailBatchCreate, EmailBatchResponse
+)
 from dependencies import get_email_controller
+from models.email_model import EmailStatus
 
 email_router = APIRouter()
 
 
-@email_router.get("/", status_code=200, response_model=EmailList)
+# EmailDetail* primero: sin body/html_body no validan y se usa el schema sin cuerpos
+@email_router.get("/", status_code=200, response_model=Union[EmailDetailList, EmailList])
 async def get_emails(
     page: int = Query(default=1, ge=1, description="Número de página"),
     page_size: int = Query(default=10, ge=1, le=100, description="Items por página"),
+    cursor: Optional[str] = Query(default=None, description="'next_cursor' de la respuesta anterior"),
+    exact_total: bool = Query(default=False, description="Calcular el total exacto (más lento en tablas grandes)"),
+    include_body: bool = Query(default=False, description="Incluir body y html_body de cada email"),
     controller: EmailController = Depends(get_email_controller)
 ):
     """
-    Obtiene lista paginada de emails enviados
+    Obtiene lista paginada de emails enviados (más recientes primero)
+    
+    Para recorrer muchos emails usa 'cursor' con el 'next_cursor' de cada
+    respuesta: su costo no crece con la página, a diferencia de 'page'.
+    El 'total' es una estimación en tablas grandes salvo que se pida
+    'exact_total=true'.
+    
+    Por defecto no incluye los cuerpos de los emails; pedirlos con
+    'include_body=true'.
+    """
+    return await controller.get_emails(page, page_size, cursor, exact_total, include_body)
+
+
+@email_router.get(
+    "/export",
+    status_code=200,
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}}
+)
+async def export_emails(
+    format: Literal["ndjson", "csv"] = Query(default="ndjson", description="Formato de salida"),
+    status: Optional[EmailStatus] = Query(default=None, description="Solo emails con este estado"),
+    since: Optional[datetime] = Query(default=None, description="Creados desde esta fecha (inclusive)"),
+    until: Optional[datetime] = Query(default=None, description="Creados antes de esta fecha"),
+    after: Optional[int] = Query(default=None, ge=0, description="Reanudar después de este id"),
+    controller: EmailController = Depends(get_email_controller)
+):
+    """
+    Exporta el registro de emails (sin cuerpos) en NDJSON o CSV
+    
+    Las filas salen por id ascendente y en streaming, sin paginar ni contar:
+    sirve para descargar el registro completo. Si la conexión se corta,
+    repite la petición con 'after' igual al id de la última fila completa
+    recibida (en CSV no se repite el encabezado).
     """
-    return await controller.get_emails(page, page_size)
+    return await controller.export_emails(format, status, since, until, after)
 
 
-@email_router.get("/{email_id}", status_code=200, response_model=EmailResponse)
+@email_router.get(
+    "/{email_id}",
+    status_code=200,
+    response_model=Union[EmailDetailResponse, EmailResponse],
+    responses={304: {"description": "El email no cambió desde el ETag de If-None-Match"}}
+)
 async def get_email(
     email_id: int,
+    response: Response,
+    include_body: bool = Query(default=False, description="Incluir body y html_body"),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
     controller: EmailController = Depends(get_email_controller)
 ):
     """
     Obtiene los detalles de un email específico
+    
+    Con 'include_body=true' incluye body y html_body.
+    
+    La respuesta trae un ETag que cambia cada vez que cambia el email: al
+    consultar el estado periódicamente, envía ese valor en 'If-None-Match'
+    y, si el email no cambió, la respuesta es 304 sin contenido.
     """
-    return await controller.get_email(email_id)
+    return await controller.get_email(email_id, include_body, response, if_none_match)
 
 
-@email_router.post("/send", status_code=201, response_model=EmailResponse)
+@email_router.post(
+    "/send",
+    status_code=201,
+    response_model=EmailResponse,
+    responses={202: {"model": EmailResponse, "description": "Email encolado para envío (modo outbox)"}}
+)
 async def send_email(
     email: EmailCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        default=None,
+        alias="Idempotency-Key",
+        max_length=255,
+        description="Clave única del envío: repetir la petición con la misma clave no envía otro email"
+    ),
     controller: EmailController = Depends(get_email_controller)
 ):
     """
@@ -41,8 +111,115 @@ async def send_email(
     1. Con texto plano: solo proporciona 'body'
     2. Con HTML directo: proporciona 'html_body'
     3. Con plantilla: proporciona 'template_name' y 'template_data'
+    
+    En modo outbox (DELIVERY_MODE=outbox) responde 202 con el email en estado
+    'pending' y el envío se realiza en segundo plano. También responde 202 si
+    el envío falló por un error transitorio y quedó un reintento programado
+    ('next_attempt_at').
+    
+    Con 'send_at' (ISO 8601, con zona horaria o en UTC) el email se guarda
+    en estado 'pending', responde 202 y se envía a esa hora. Requiere el
+    worker en segundo plano (422 si no está activo).
+    
+    Con el header 'Idempotency-Key' un reintento del cliente (timeout, red)
+    devuelve el mismo email en lugar de enviar otro. Reutilizar la clave con
+    otro contenido responde 422. Las claves vencen a los IDEMPOTENCY_KEY_TTL
+    segundos.
+    """
+    result = await controller.send_email(email, idempotency_key)
+    
+    if result.status == EmailStatus.PENDING or result.next_attempt_at is not None:
+        response.status_code = 202
+    
+    return result
+
+
+@email_router.post(
+    "/send/attachments",
+    status_code=201,
+    response_model=EmailResponse,
+    responses={
+        202: {"model": EmailResponse, "description": "Email encolado para envío (modo outbox)"},
+        413: {"description": "Los adjuntos superan ATTACHMENT_MAX_BYTES"}
+    }
+)
+async def send_email_with_attachments(
+    response: Response,
+    recipient: str = Form(..., description="Email del destinatario"),
+    subject: str = Form(..., description="Asunto del email"),
+    body: Optional[str] = Form(default=None, description="Cuerpo del email en texto plano"),
+    html_body: Optional[str] = Form(default=None, description="Cuerpo del email en HTML"),
+    template_name: Optional[str] = Form(default=None, description="Nombre de la plantilla a usar"),
+    template_data: Optional[str] = Form(default=None, description="Datos para la plantilla (objeto JSON)"),
+    priority: Optional[str] = Form(default=None, description="Prioridad de envío: high, normal o low"),
+    send_at: Optional[str] = Form(default=None, description="Envío programado (ISO 8601)"),
+    files: List[UploadFile] = File(..., description="Archivos adjuntos"),
+    idempotency_key: Optional[str] = Header(
+        default=None,
+        alias="Idempotency-Key",
+        max_length=255,
+        description="Clave única del envío: repetir la petición con la misma clave no envía otro email"
+    ),
+    controller: EmailController = Depends(get_email_controller)
+):
+    """
+    Envía un nuevo email con archivos adjuntos (multipart/form-data)
+    
+    Los campos son los mismos que en /emails/send ('template_data' como
+    texto JSON) más uno o varios 'files'. Los adjuntos se guardan en disco
+    mientras se reciben y se codifican por partes durante el envío, así que
+    la memoria no depende de su tamaño. Entre todos pueden pesar hasta
+    ATTACHMENT_MAX_BYTES (413 si lo superan).
+    
+    Responde 201, o 202 en modo outbox, igual que /emails/send.
+    """
+    fields = {
+        "recipient": recipient,
+        "subject": subject,
+        "body": body,
+        "html_body": html_body,
+        "template_name": template_name,
+        "template_data": template_data,
+        "priority": priority,
+        "send_at": send_at
+    }
+    result = await controller.send_email_with_attachments(fields, files, idempotency_key)
+    
+    if result.status == EmailStatus.PENDING or result.next_attempt_at is not None:
+        response.status_code = 202
+    
+    return result
+
+
+@email_router.post(
+    "/send/batch",
+    status_code=200,
+    response_model=EmailBatchResponse,
+    responses={202: {"model": EmailBatchResponse, "description": "Lote encolado para envío (modo outbox)"}}
+)
+async def send_batch(
+    batch: EmailBatchCreate,
+    response: Response,
+    controller: EmailController = Depends(get_email_controller)
+):
     """
-    return await controller.send_email(email)
+    Envía un lote de emails (campañas)
+    
+    Puedes enviar el lote de 2 formas:
+    1. Con 'emails': lista de emails con el mismo formato que /emails/send
+    2. Con 'recipients': asunto/plantilla comunes y una lista de destinatarios
+       con sus propios 'template_data'
+    
+    Los items inválidos se reportan con sus errores sin rechazar el lote.
+    En modo outbox responde 202 y los emails quedan en estado 'pending'.
+    Con 'send_at' (común o por item) los emails se envían a esa hora.
+    """
+    result = await controller.send_batch(batch)
+    
+    if any(item.status == EmailStatus.PENDING for item in result.results):
+        response.status_code = 202
+    
+    return result
 
 
 @email_router.put("/update/{email_id}", status_code=200, response_model=EmailResponse)
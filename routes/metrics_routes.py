@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Response
+from utils.metrics import REGISTRY
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", response_class=Response)
+async def get_metrics():
+    """
+    Métricas del proceso en formato de texto de Prometheus
+
+    Histogramas de latencia por fase del envío (render, persist, deliver,
+    status_update), del repositorio y del SMTP (queue, connect, login, send),
+    y contadores de intentos y envíos SMTP por resultado.
+    """
+    return Response(REGISTRY.expose(), media_type="text/plain; version=0.0.4; charset=utf-8")
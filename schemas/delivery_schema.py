@@ -0,0 +1,80 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List
+
+
+class RateLimitSchema(BaseModel):
+    """Límites de envío de un dominio o del relay"""
+    rate: float = Field(..., ge=0, description="Envíos por segundo (0 = sin límite)")
+    burst: int = Field(..., ge=1, description="Envíos permitidos de golpe antes de aplicar 'rate'")
+    max_concurrency: int = Field(..., ge=0, description="Envíos simultáneos (0 = sin límite)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "rate": 5,
+                "burst": 10,
+                "max_concurrency": 3
+            }
+        }
+
+
+class DeliveryLimits(BaseModel):
+    """Schema para los límites vigentes del scheduler de entrega"""
+    default: RateLimitSchema = Field(..., description="Límites de los dominios sin configuración propia")
+    relay: RateLimitSchema
+    domains: Dict[str, RateLimitSchema] = Field(..., description="Dominios con límites propios")
+
+
+class QueueStats(BaseModel):
+    """Estado de la cola de un dominio o relay"""
+    waiting: int = Field(..., description="Envíos esperando su turno")
+    in_flight: int = Field(..., description="Envíos en curso")
+    sent: int
+    deferred: int = Field(..., description="Envíos aplazados por superar los límites")
+    tokens: Optional[float] = Field(None, description="Tokens disponibles (vacío si no hay límite de ritmo)")
+    limits: RateLimitSchema
+
+
+class DeliveryQueues(BaseModel):
+    """Schema para la profundidad de las colas por relay y dominio"""
+    relay: Dict[str, QueueStats]
+    domains: Dict[str, QueueStats]
+
+
+class RelayStats(BaseModel):
+    """Estado de un relay SMTP del balanceo"""
+    name: str
+    weight: float = Field(..., description="Parte del tráfico que recibe (0 = solo como respaldo)")
+    state: str = Field(..., description="Circuito: closed, open o half_open")
+    error_rate: float = Field(..., description="Fracción de errores entre los últimos envíos")
+    latency_ms: Optional[float] = Field(None, description="Latencia promedio de los envíos exitosos")
+    in_flight: int = Field(..., description="Envíos en curso")
+    sent: int
+    failed: int = Field(..., description="Errores transitorios (conexión, timeout, 4xx)")
+    rejected: int = Field(..., description="Rechazos permanentes del destinatario o del contenido")
+    retry_after: float = Field(..., description="Segundos hasta el envío de prueba de un circuito abierto")
+
+
+class DeliveryRelays(BaseModel):
+    """Schema para el estado de los relays SMTP"""
+    relays: List[RelayStats]
+
+
+class LaneStats(BaseModel):
+    """Estado del carril de una prioridad en el outbox"""
+    priority: str = Field(..., description="high, normal o low")
+    reserved_workers: int = Field(..., description="Workers que solo envían emails de esta prioridad")
+    queued: int = Field(..., description="Emails reservados esperando un worker")
+    in_flight: int = Field(..., description="Envíos en curso")
+    processed: int = Field(..., description="Emails que los workers terminaron de procesar")
+    oldest_wait_seconds: float = Field(..., description="Espera del email más antiguo en cola")
+    wait_seconds: Optional[float] = Field(
+        None,
+        description="Promedio móvil de la espera desde que un email debía enviarse hasta que un worker lo toma"
+    )
+    max_wait_seconds: float = Field(..., description="Mayor espera desde que arrancó el outbox")
+
+
+class DeliveryLanes(BaseModel):
+    """Schema para el estado de los carriles de prioridad del outbox"""
+    lanes: List[LaneStats]
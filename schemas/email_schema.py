@@ -1,6 +1,14 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, Dict, Any
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import Optional, Dict, Any, List
+from datetime import datetime, timezone
+from models.email_model import EmailPriority
+
+
+def to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Pasa una fecha con zona horaria a UTC sin zona (como se guardan en la base); sin zona se asume UTC"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 
 class EmailBase(BaseModel):
@@ -15,6 +23,16 @@ class EmailCreate(EmailBase):
     html_body: Optional[str] = Field(None, description="Cuerpo del email en HTML")
     template_name: Optional[str] = Field(None, description="Nombre de la plantilla a usar")
     template_data: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Datos para la plantilla")
+    priority: EmailPriority = Field(
+        EmailPriority.NORMAL,
+        description="Carril de envío: high (transaccionales), normal o low (campañas)"
+    )
+    send_at: Optional[datetime] = Field(
+        None,
+        description="Envío programado (ISO 8601, ej: 2024-01-01T09:00:00-03:00; sin zona horaria es UTC)"
+    )
+
+    _send_at_utc = field_validator("send_at")(to_utc)
 
     class Config:
         json_schema_extra = {
@@ -32,15 +50,27 @@ class EmailCreate(EmailBase):
 
 class EmailResponse(EmailBase):
     """Schema para respuesta de email"""
+    # Ya se validó al crear el email: EmailStr cuesta ~80 µs por item en cada listado
+    recipient: str = Field(..., description="Email del destinatario")
     id: int
-    status: str = Field(..., description="Estado del email: sent, failed, pending")
+    status: str = Field(..., description="Estado del email: sent, failed, pending, dead")
+    priority: str = Field("normal", description="Prioridad de envío: high, normal o low")
     sent_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    attempts: int = Field(0, description="Intentos de envío realizados")
+    next_attempt_at: Optional[datetime] = Field(None, description="Próximo reintento programado")
+    send_at: Optional[datetime] = Field(None, description="Envío programado (UTC)")
 
     class Config:
         from_attributes = True
 
 
+class EmailDetailResponse(EmailResponse):
+    """Schema para respuesta de email con sus cuerpos (include_body=true)"""
+    body: Optional[str] = Field(..., description="Cuerpo del email en texto plano")
+    html_body: Optional[str] = Field(..., description="Cuerpo del email en HTML")
+
+
 class EmailUpdate(BaseModel):
     """Schema para actualizar un email"""
     status: Optional[str] = None
@@ -51,5 +81,99 @@ class EmailList(BaseModel):
     """Schema para listar emails"""
     emails: list[EmailResponse]
     total: int
-    page: int
-    page_size: int
\ No newline at end of file
+    total_is_estimate: bool = Field(False, description="True si 'total' es aproximado")
+    page: Optional[int] = Field(None, description="Página actual (vacío al paginar por cursor)")
+    page_size: int
+    next_cursor: Optional[str] = Field(None, description="Cursor para pedir la siguiente página")
+
+
+class EmailDetailList(EmailList):
+    """Schema para listar emails con sus cuerpos (include_body=true)"""
+    emails: list[EmailDetailResponse]
+
+
+class EmailBatchCreate(BaseModel):
+    """
+    Schema para envío masivo. Se usa una de dos formas:
+    1. 'emails': lista de emails completos (mismos campos que EmailCreate)
+    2. 'recipients': una plantilla/asunto común y una lista de destinatarios
+       con sus propios 'template_data'
+    
+    Los items se validan uno por uno: un item inválido no hace fallar el lote.
+    """
+    emails: Optional[List[Any]] = Field(None, description="Emails a enviar (formato EmailCreate)")
+    subject: Optional[str] = Field(None, description="Asunto común (modo 'recipients')")
+    body: Optional[str] = Field(None, description="Cuerpo de texto común (modo 'recipients')")
+    html_body: Optional[str] = Field(None, description="HTML común (modo 'recipients')")
+    template_name: Optional[str] = Field(None, description="Plantilla común (modo 'recipients')")
+    recipients: Optional[List[Any]] = Field(
+        None,
+        description="Destinatarios: [{'recipient': ..., 'template_data': {...}}] o lista de emails"
+    )
+    priority: EmailPriority = Field(
+        EmailPriority.LOW,
+        description="Prioridad de los items que no indican la suya (por defecto, carril de campañas)"
+    )
+    send_at: Optional[datetime] = Field(None, description="Envío programado de los items que no indican el suyo")
+
+    _send_at_utc = field_validator("send_at")(to_utc)
+
+    @model_validator(mode="after")
+    def check_mode(self):
+        if (self.emails is None) == (self.recipients is None):
+            raise ValueError("Provide exactly one of 'emails' or 'recipients'")
+        if self.recipients is not None and not self.subject:
+            raise ValueError("'subject' is required when using 'recipients'")
+        return self
+
+    def expand(self) -> List[Any]:
+        """Retorna los items en formato EmailCreate (sin validar)"""
+        if self.emails is not None:
+            return [
+                {"priority": self.priority, "send_at": self.send_at, **item} if isinstance(item, dict) else item
+                for item in self.emails
+            ]
+        
+        common = {
+            "subject": self.subject,
+            "body": self.body,
+            "html_body": self.html_body,
+            "template_name": self.template_name,
+            "priority": self.priority,
+            "send_at": self.send_at
+        }
+        items = []
+        for item in self.recipients:
+            if isinstance(item, str):
+                item = {"recipient": item}
+            # Los items que no son objetos se dejan tal cual y fallan al validarse
+            items.append({**common, **item} if isinstance(item, dict) else item)
+        
+        return items
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "subject": "Bienvenido a nuestra plataforma",
+                "template_name": "welcome.html",
+                "recipients": [
+                    {"recipient": "ana@example.com", "template_data": {"nombre": "Ana"}},
+                    {"recipient": "luis@example.com", "template_data": {"nombre": "Luis"}}
+                ]
+            }
+        }
+
+
+class EmailBatchItemResult(BaseModel):
+    """Resultado de un item del lote"""
+    index: int = Field(..., description="Posición del item en el lote")
+    id: Optional[int] = None
+    status: Optional[str] = Field(None, description="Estado del email; vacío si el item fue rechazado")
+    errors: Optional[List[str]] = None
+
+
+class EmailBatchResponse(BaseModel):
+    """Schema para respuesta de envío masivo"""
+    accepted: int
+    rejected: int
+    results: List[EmailBatchItemResult]
@@ -1,7 +1,64 @@
-from typing import List, Optional
-from schemas.email_schema import EmailCreate, EmailResponse, EmailUpdate, EmailList
-from interfaces.email_interfaces import IEmailRepository, IEmailSender, ITemplateEngine
-from models.email_model import EmailStatus, Email
+import asyncio
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple, TYPE_CHECKING
+from pydantic import ValidationError
+from schemas.email_schema import (
+    EmailCreate,
+    EmailResponse,
+    EmailDetailResponse,
+    EmailUpdate,
+    EmailList,
+    EmailDetailList,
+    EmailBatchCreate,
+    EmailBatchItemResult,
+    EmailBatchResponse
+)
+from interfaces.email_interfaces import (
+    Attachment,
+    EmailSummary,
+    IEmailRepository,
+    IEmailSender,
+    ITemplateEngine,
+    RenderResult,
+    DeliveryDeferred,
+    EmailDeliveryError,
+    IdempotencyKeyReused,
+    IdempotencyRecord,
+    SchedulingUnavailable,
+    StatusUpdate
+)
+from models.email_model import EmailPriority, EmailStatus, Email
+from utils.pagination import TotalCountCache, encode_cursor, decode_cursor
+from utils.export import csv_chunk, csv_header, ndjson_chunk
+from utils.attachment_store import AttachmentStore
+from utils.email_archive import EmailArchive
+from utils.email_cache import CachedEmail, EmailCache, email_etag
+from utils.retry_policy import RetryPolicy
+from utils.status_buffer import StatusWriteBuffer
+from utils.idempotency import request_hash
+from utils.ttl_cache import TTLCache
+from utils.metrics import SEND_PHASE_SECONDS, SEND_SECONDS, DELIVERY_ATTEMPTS
+from utils.logger import log_context
+
+if TYPE_CHECKING:
+    from services.outbox_worker import OutboxWorker
+    from services.scheduled_dispatcher import ScheduledSendDispatcher
+
+
+# Debajo de este tamaño (según la estimación) se cuenta de forma exacta
+EXACT_COUNT_THRESHOLD = 10000
+
+# Total estimado compartido por todas las peticiones del proceso
+_estimated_total = TotalCountCache(ttl=30.0)
+
+# Series de las fases de envío (se resuelven una vez, no en cada petición)
+_RENDER_SECONDS = SEND_PHASE_SECONDS.labels("render")
+_PERSIST_SECONDS = SEND_PHASE_SECONDS.labels("persist")
+_DELIVER_SECONDS = SEND_PHASE_SECONDS.labels("deliver")
+_STATUS_UPDATE_SECONDS = SEND_PHASE_SECONDS.labels("status_update")
 
 
 class EmailService:
@@ -15,68 +72,548 @@ class EmailService:
         self,
         repository: IEmailRepository,
         sender: IEmailSender,
-        template_engine: Optional[ITemplateEngine] = None
+        template_engine: Optional[ITemplateEngine] = None,
+        outbox: Optional["OutboxWorker"] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        archive: Optional[EmailArchive] = None,
+        status_buffer: Optional[StatusWriteBuffer] = None,
+        idempotency_cache: Optional[TTLCache] = None,
+        idempotency_ttl: float = 86400.0,
+        email_cache: Optional[EmailCache] = None,
+        attachment_store: Optional[AttachmentStore] = None,
+        scheduled_dispatcher: Optional["ScheduledSendDispatcher"] = None
     ):
         self.repository = repository
         self.sender = sender
         self.template_engine = template_engine
+        self.outbox = outbox
+        # Sin política de reintentos un error deja el email en FAILED definitivamente
+        self.retry_policy = retry_policy
+        # Emails que el job de retención sacó de la base de datos
+        self.archive = archive
+        # Write-behind: los estados de envío se guardan agrupados (None: uno por envío)
+        self.status_buffer = status_buffer
+        # Respuestas recientes por Idempotency-Key (evita consultar la base de datos)
+        self.idempotency_cache = idempotency_cache
+        self.idempotency_ttl = idempotency_ttl
+        # Respuestas de GET /emails/{id}; se invalidan en cada escritura de un email
+        self.email_cache = email_cache
+        # Archivos de los adjuntos (los emails guardan solo su hash)
+        self.attachment_store = attachment_store
+        # Despierta al worker cuando vence un envío programado (None: sin worker)
+        self.scheduled_dispatcher = scheduled_dispatcher
     
-    async def send_email(self, email_data: EmailCreate) -> EmailResponse:
+    async def send_email(
+        self,
+        email_data: EmailCreate,
+        idempotency_key: Optional[str] = None,
+        attachments: Sequence[Attachment] = ()
+    ) -> EmailResponse:
         """
         Envía un email y guarda el registro en la base de datos
         
+        En modo outbox solo se guarda el registro como PENDING y el envío
+        lo realiza el pool de workers en segundo plano. Con un send_at futuro
+        (en cualquier modo) el email queda PENDING y el worker lo envía a esa hora.
+        
+        Con `idempotency_key`, un reintento con la misma clave (hasta que
+        vence) retorna el email original sin crear otro registro ni enviarlo
+        de nuevo.
+        
         Args:
             email_data: Datos del email a enviar
+            idempotency_key: Valor del header Idempotency-Key
+            attachments: Adjuntos ya guardados con store_attachments
             
         Returns:
             EmailResponse: Respuesta con el estado del email
+            
+        Raises:
+            IdempotencyKeyReused: Si la clave ya se usó con otro contenido
+            SchedulingUnavailable: Si tiene send_at futuro y no hay worker
+        """
+        if idempotency_key is None:
+            return await self._send(email_data, attachments=attachments)
+        
+        started = time.perf_counter()
+        fingerprint = request_hash(email_data, attachments)
+        replay = await self._replay(idempotency_key, fingerprint)
+        if replay is not None:
+            SEND_SECONDS.labels("replayed").observe(time.perf_counter() - started)
+            return replay
+        
+        idempotency = IdempotencyRecord(
+            key=idempotency_key,
+            request_hash=fingerprint,
+            expires_at=datetime.utcnow() + timedelta(seconds=self.idempotency_ttl)
+        )
+        response = await self._send(email_data, idempotency, attachments)
+        
+        if response is None:
+            # Otra petición con la misma clave creó el email mientras tanto
+            response = await self._replay(idempotency_key, fingerprint)
+            if response is None:
+                raise IdempotencyKeyReused("Idempotency-Key in use by another request")
+            SEND_SECONDS.labels("replayed").observe(time.perf_counter() - started)
+            return response
+        
+        if self.idempotency_cache is not None:
+            self.idempotency_cache.put(idempotency_key, (fingerprint, response))
+        return response
+    
+    async def _replay(self, idempotency_key: str, fingerprint: str) -> Optional[EmailResponse]:
+        """
+        Respuesta de una petición anterior con la misma Idempotency-Key
+        (primero en memoria, después en la base de datos)
+        
+        Raises:
+            IdempotencyKeyReused: Si la clave se usó con otro contenido
+        """
+        if self.idempotency_cache is not None:
+            cached = self.idempotency_cache.get(idempotency_key)
+            if cached is not None:
+                stored_fingerprint, response = cached
+                if stored_fingerprint != fingerprint:
+                    raise IdempotencyKeyReused("Idempotency-Key already used with a different request")
+                return response
+        
+        record = await self.repository.get_idempotency_key(idempotency_key)
+        if record is None:
+            return None
+        if record.request_hash != fingerprint:
+            raise IdempotencyKeyReused("Idempotency-Key already used with a different request")
+        
+        response = await self.get_email(record.email_id)
+        if response is not None and self.idempotency_cache is not None:
+            ttl = (record.expires_at - datetime.utcnow()).total_seconds()
+            self.idempotency_cache.put(idempotency_key, (fingerprint, response), ttl=ttl)
+        
+        return response
+    
+    async def store_attachments(self, files: Iterable[Tuple[str, str, AsyncIterable[bytes]]]) -> List[Attachment]:
         """
+        Guarda en disco los adjuntos de un email, leyéndolos por partes
+        
+        Args:
+            files: (nombre, tipo MIME, contenido por partes) de cada adjunto
+            
+        Raises:
+            AttachmentTooLarge: Si entre todos superan el máximo permitido
+        """
+        return await self.attachment_store.save_many(files)
+    
+    async def _send(
+        self,
+        email_data: EmailCreate,
+        idempotency: Optional[IdempotencyRecord] = None,
+        attachments: Sequence[Attachment] = ()
+    ) -> Optional[EmailResponse]:
+        """Renderiza, guarda y envía (o encola) un email; None si su Idempotency-Key ya estaba tomada"""
+        started = time.perf_counter()
+        send_at = self._scheduled_send_at(email_data)
+        
         # 1. Preparar el contenido del email
-        html_body = await self._prepare_email_content(email_data)
+        with _RENDER_SECONDS.time():
+            html_body = await self._prepare_email_content(email_data)
         body = email_data.body or "Por favor, visualiza este email en un cliente compatible con HTML."
         
         # 2. Crear registro en la base de datos
-        email_record = await self.repository.create(
-            EmailCreate(
+        with _PERSIST_SECONDS.time():
+            email_record = await self.repository.create(
+                EmailCreate(
+                    recipient=email_data.recipient,
+                    subject=email_data.subject,
+                    body=body,
+                    html_body=html_body,
+                    priority=email_data.priority,
+                    send_at=send_at
+                ),
+                idempotency,
+                attachments,
+                # Sin outbox se envía ahora: se crea reservado, así un resultado
+                # que no llegó a guardarse lo recupera el outbox de reintentos
+                claim=self.outbox is None
+            )
+        
+        if email_record is None:
+            return None
+        
+        # 3. Un envío programado queda PENDING hasta su send_at (en cualquier modo)
+        if send_at is not None:
+            self.scheduled_dispatcher.schedule(send_at)
+            SEND_SECONDS.labels("scheduled").observe(time.perf_counter() - started)
+            return EmailResponse.model_validate(email_record)
+        
+        # 4. En modo outbox, delegar el envío al worker
+        if self.outbox is not None:
+            self.outbox.notify()
+            SEND_SECONDS.labels("queued").observe(time.perf_counter() - started)
+            return EmailResponse.model_validate(email_record)
+        
+        # 5. Intentar enviar el email
+        await self.deliver(email_record)
+        
+        SEND_SECONDS.labels(email_record.status.value).observe(time.perf_counter() - started)
+        return EmailResponse.model_validate(email_record)
+    
+    async def deliver(self, email_record: Email) -> Email:
+        """
+        Envía un email ya registrado y actualiza su estado
+        
+        Si el sender aplaza el envío (DeliveryDeferred) el email queda en
+        PENDING con su next_attempt_at para que el outbox lo reintente. Si falla
+        por un error transitorio queda en FAILED con el reintento programado
+        según la política de reintentos (o en DEAD si se agotaron).
+        
+        Args:
+            email_record: Registro del email a enviar
+            
+        Returns:
+            Email: El mismo registro con el estado actualizado
+        """
+        try:
+            with _DELIVER_SECONDS.time(), log_context(email_id=email_record.id):
+                status, error_message, next_attempt_at = await self._attempt_send(email_record)
+        except DeliveryDeferred as deferred:
+            await self._defer([email_record], deferred)
+            return email_record
+        
+        DELIVERY_ATTEMPTS.labels(status.value).inc()
+        
+        # Actualizar estado según resultado
+        attempts = (email_record.attempts or 0) + 1
+        now = datetime.utcnow()
+        with _STATUS_UPDATE_SECONDS.time():
+            if self.status_buffer is not None:
+                await self.status_buffer.record(StatusUpdate(
+                    email_id=email_record.id,
+                    status=status,
+                    error_message=error_message,
+                    next_attempt_at=next_attempt_at,
+                    attempts=attempts,
+                    sent_at=now if status == EmailStatus.SENT else None,
+                    updated_at=now
+                ))
+            else:
+                await self.repository.update_status(email_record.id, status, error_message, next_attempt_at)
+        self._invalidate([email_record.id])
+        self._apply_outcome(email_record, status, error_message, next_attempt_at, attempts, now)
+        
+        return email_record
+    
+    async def send_batch(self, batch: EmailBatchCreate, concurrency: int = 20) -> EmailBatchResponse:
+        """
+        Envía un lote de emails
+        
+        Cada item se valida por separado; los inválidos se reportan en la
+        respuesta sin afectar al resto. Los items que usan la misma plantilla se
+        renderizan juntos con un mail-merge (render_many). Los válidos se guardan
+        con un solo INSERT multi-fila y se entregan al outbox o se envían
+        concurrentemente.
+        
+        Args:
+            batch: Lote de emails
+            concurrency: Envíos simultáneos en modo síncrono
+            
+        Returns:
+            EmailBatchResponse: Resultado por item (id, estado o errores)
+        """
+        results: List[EmailBatchItemResult] = []
+        accepted: List[Tuple[int, EmailCreate]] = []
+        valid: List[Tuple[int, EmailCreate]] = []
+        merges: Dict[str, List[Tuple[int, EmailCreate]]] = defaultdict(list)
+        
+        # 1. Validar cada item y agrupar los que se renderizan con plantilla
+        for index, item in enumerate(batch.expand()):
+            try:
+                email_data = EmailCreate.model_validate(item)
+            except ValidationError as e:
+                results.append(EmailBatchItemResult(index=index, errors=self._format_errors(e)))
+                continue
+            
+            try:
+                self._scheduled_send_at(email_data)
+            except SchedulingUnavailable as e:
+                results.append(EmailBatchItemResult(index=index, errors=[f"send_at: {e}"]))
+                continue
+            
+            if not email_data.html_body and email_data.template_name and self.template_engine:
+                merges[email_data.template_name].append((index, email_data))
+            else:
+                valid.append((index, email_data))
+        
+        # 2. Preparar el HTML: un mail-merge por plantilla
+        html_bodies: Dict[int, str] = {}
+        for index, email_data in valid:
+            html_bodies[index] = await self._prepare_email_content(email_data)
+        
+        for template_name, items in merges.items():
+            rendered = await self._render_merge(template_name, items)
+            for (index, email_data), result in zip(items, rendered):
+                if result.error is not None:
+                    results.append(EmailBatchItemResult(index=index, errors=[f"template: {result.error}"]))
+                    continue
+                html_bodies[index] = result.html
+                valid.append((index, email_data))
+        
+        for index, email_data in sorted(valid, key=lambda pair: pair[0]):
+            accepted.append((index, EmailCreate(
                 recipient=email_data.recipient,
                 subject=email_data.subject,
-                body=body,
-                html_body=html_body
+                body=email_data.body or "Por favor, visualiza este email en un cliente compatible con HTML.",
+                html_body=html_bodies[index],
+                priority=email_data.priority,
+                send_at=self._scheduled_send_at(email_data)
+            )))
+        
+        # 3. Guardar todos los válidos en una sola operación
+        ids = await self.repository.create_many([email_data for _, email_data in accepted], claim=self.outbox is None)
+        records = [
+            Email(
+                id=email_id,
+                recipient=email_data.recipient,
+                subject=email_data.subject,
+                body=email_data.body,
+                html_body=email_data.html_body,
+                status=EmailStatus.PENDING,
+                priority=email_data.priority,
+                send_at=email_data.send_at,
+                next_attempt_at=email_data.send_at,
+                attempts=0
             )
+            for email_id, (_, email_data) in zip(ids, accepted)
+        ]
+        
+        # 4. Programar los que tienen send_at y entregar el resto al outbox o enviarlo ahora
+        for send_at in {record.send_at for record in records if record.send_at is not None}:
+            self.scheduled_dispatcher.schedule(send_at)
+        
+        immediate = [record for record in records if record.send_at is None]
+        if self.outbox is not None:
+            if immediate:
+                self.outbox.notify()
+        else:
+            await self._deliver_many(immediate, concurrency)
+        
+        for (index, _), record in zip(accepted, records):
+            results.append(EmailBatchItemResult(index=index, id=record.id, status=record.status))
+        
+        results.sort(key=lambda result: result.index)
+        
+        return EmailBatchResponse(
+            accepted=len(accepted),
+            rejected=len(results) - len(accepted),
+            results=results
         )
+    
+    async def _render_merge(self, template_name: str, items: List[Tuple[int, EmailCreate]]) -> List[RenderResult]:
+        """
+        Renderiza una plantilla para varios items con render_many
+        
+        El render es trabajo de CPU, así que se ejecuta fuera del event loop.
+        Si la plantilla no existe se usa el body como fallback (igual que en
+        _prepare_email_content).
+        """
+        contexts = [email_data.template_data or {} for _, email_data in items]
         
-        # 3. Intentar enviar el email
         try:
-            success = await self.sender.send(
-                recipient=email_data.recipient,
-                subject=email_data.subject,
-                body=body,
-                html_body=html_body
+            return await asyncio.to_thread(
+                lambda: list(self.template_engine.render_many(template_name, contexts))
             )
+        except FileNotFoundError:
+            return [
+                RenderResult(f"<html><body>{email_data.body or ''}</body></html>")
+                for _, email_data in items
+            ]
+    
+    async def _deliver_many(self, records: List[Email], concurrency: int) -> None:
+        """
+        Envía varios emails concurrentemente y guarda los estados agrupados
+        (un UPDATE por cada combinación de estado, error y segundo de reintento)
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def attempt(record: Email):
+            async with semaphore:
+                try:
+                    with log_context(email_id=record.id):
+                        return await self._attempt_send(record)
+                except DeliveryDeferred as deferred:
+                    return deferred
+        
+        outcomes = await asyncio.gather(*(attempt(record) for record in records))
+        
+        groups: Dict[Tuple[EmailStatus, Optional[str], Optional[datetime]], List[int]] = defaultdict(list)
+        deferrals: Dict[int, List[Email]] = defaultdict(list)
+        deferred_by_delay: Dict[int, DeliveryDeferred] = {}
+        for record, outcome in zip(records, outcomes):
+            if isinstance(outcome, DeliveryDeferred):
+                # Agrupados por segundo de reintento para aplazarlos con pocos UPDATE
+                delay = math.ceil(outcome.retry_after)
+                deferrals[delay].append(record)
+                deferred_by_delay[delay] = outcome
+                continue
             
-            # 4. Actualizar estado según resultado
-            if success:
-                await self.repository.update_status(email_record.id, EmailStatus.SENT)
-                email_record.status = EmailStatus.SENT
-            else:
-                await self.repository.update_status(
-                    email_record.id,
-                    EmailStatus.FAILED,
-                    "Failed to send email"
-                )
-                email_record.status = EmailStatus.FAILED
-                
-        except Exception as e:
-            # Manejar errores de envío
-            await self.repository.update_status(
-                email_record.id,
-                EmailStatus.FAILED,
-                str(e)
+            self._apply_outcome(record, *outcome, attempts=(record.attempts or 0) + 1)
+            groups[outcome].append(record.id)
+        
+        for (status, error_message, next_attempt_at), email_ids in groups.items():
+            DELIVERY_ATTEMPTS.labels(status.value).inc(len(email_ids))
+            await self.repository.mark_status(email_ids, status, error_message, next_attempt_at)
+            self._invalidate(email_ids)
+        
+        for delay, deferred_records in deferrals.items():
+            await self._defer(deferred_records, deferred_by_delay[delay])
+    
+    async def _defer(self, records: List[Email], deferred: DeliveryDeferred) -> None:
+        """Deja los emails en PENDING para reintentarlos después de `retry_after`"""
+        next_attempt_at = datetime.utcnow() + timedelta(seconds=deferred.retry_after)
+        
+        DELIVERY_ATTEMPTS.labels("deferred").inc(len(records))
+        await self.repository.defer([record.id for record in records], next_attempt_at, str(deferred))
+        self._invalidate(record.id for record in records)
+        for record in records:
+            record.status = EmailStatus.PENDING
+            record.error_message = str(deferred)
+            record.next_attempt_at = next_attempt_at
+    
+    def _invalidate(self, email_ids: Iterable[int]) -> None:
+        """Descarta del cache de GET /emails/{id} los emails que se acaban de escribir"""
+        if self.email_cache is not None:
+            self.email_cache.invalidate(email_ids)
+    
+    def _scheduled_send_at(self, email_data: EmailCreate) -> Optional[datetime]:
+        """
+        send_at del email si es futuro (None: se envía ahora)
+        
+        Raises:
+            SchedulingUnavailable: Si no hay worker que lo envíe a su hora
+        """
+        if email_data.send_at is None or email_data.send_at <= datetime.utcnow():
+            return None
+        
+        if self.scheduled_dispatcher is None:
+            raise SchedulingUnavailable("Scheduled sending needs the background delivery worker")
+        
+        return email_data.send_at
+    
+    @staticmethod
+    def _format_errors(error: ValidationError) -> List[str]:
+        """Convierte los errores de Pydantic en mensajes 'campo: error'"""
+        messages = []
+        for err in error.errors():
+            field = ".".join(str(loc) for loc in err["loc"])
+            messages.append(f"{field}: {err['msg']}" if field else err["msg"])
+        return messages
+    
+    async def _attempt_send(self, email_record: Email) -> Tuple[EmailStatus, Optional[str], Optional[datetime]]:
+        """
+        Intenta enviar un email
+        
+        Returns:
+            Tuple[EmailStatus, Optional[str], Optional[datetime]]: Estado
+            resultante, mensaje de error y momento del próximo reintento
+            
+        Raises:
+            DeliveryDeferred: Si el sender aplazó el envío
+        """
+        attachments = email_record.attachments
+        if attachments:
+            try:
+                attachments = self.attachment_store.resolve(attachments)
+            except FileNotFoundError as e:
+                # Reintentar no lo va a traer de vuelta
+                return self._failure(email_record, f"Attachment file not found: {e.filename}", permanent=True)
+        
+        try:
+            success = await self.sender.send(
+                recipient=email_record.recipient,
+                subject=email_record.subject,
+                body=email_record.body,
+                html_body=email_record.html_body,
+                attachments=attachments
             )
-            email_record.status = EmailStatus.FAILED
-            email_record.error_message = str(e)
+        except DeliveryDeferred:
+            raise
+        except EmailDeliveryError as e:
+            return self._failure(email_record, str(e), e.permanent)
+        except Exception as e:
+            # Manejar errores de envío (se consideran transitorios)
+            return self._failure(email_record, str(e), permanent=False)
         
-        return EmailResponse.model_validate(email_record)
+        if success:
+            return EmailStatus.SENT, None, None
+        
+        return self._failure(email_record, "Failed to send email", permanent=False)
+    
+    def _failure(
+        self,
+        email_record: Email,
+        error_message: str,
+        permanent: bool
+    ) -> Tuple[EmailStatus, Optional[str], Optional[datetime]]:
+        """
+        Decide qué hacer con un envío fallido
+        
+        - Error permanente (o sin política de reintentos): FAILED sin reintento
+        - Error transitorio: FAILED con next_attempt_at según el backoff
+        - Error transitorio en el último intento: DEAD (dead-letter)
+        """
+        if permanent or self.retry_policy is None:
+            return EmailStatus.FAILED, error_message, None
+        
+        attempts = (email_record.attempts or 0) + 1
+        delay = self.retry_policy.next_delay(attempts)
+        
+        if delay is None:
+            return EmailStatus.DEAD, f"{error_message} (gave up after {attempts} attempts)", None
+        
+        # Redondeado al segundo para que los reintentos de un lote se agrupen en pocos UPDATE
+        next_attempt_at = (datetime.utcnow() + timedelta(seconds=math.ceil(delay))).replace(microsecond=0)
+        return EmailStatus.FAILED, error_message, next_attempt_at
+    
+    @staticmethod
+    def _apply_outcome(
+        email_record: Email,
+        status: EmailStatus,
+        error_message: Optional[str],
+        next_attempt_at: Optional[datetime],
+        attempts: int,
+        now: Optional[datetime] = None
+    ) -> None:
+        """
+        Refleja en el objeto el resultado guardado por el repositorio
+        
+        `now` es el momento que se guardó (o se dejó en el buffer) como
+        sent_at y updated_at, así la respuesta coincide con lo que se lee después.
+        """
+        now = now or datetime.utcnow()
+        email_record.status = status
+        email_record.error_message = error_message
+        email_record.claimed_at = None
+        email_record.next_attempt_at = next_attempt_at
+        email_record.attempts = attempts
+        email_record.updated_at = now
+        if status == EmailStatus.SENT and email_record.sent_at is None:
+            email_record.sent_at = now
+    
+    async def claim_pending_emails(
+        self,
+        limit: int,
+        lease_seconds: int,
+        retries_only: bool = False,
+        priority: Optional[EmailPriority] = None
+    ) -> List[Email]:
+        """Reserva un lote de emails pendientes (o solo reintentos vencidos) para el outbox, de una prioridad o de todas"""
+        return await self.repository.claim_pending(limit, lease_seconds, retries_only, priority)
+    
+    async def get_send_times(self, after: datetime, until: datetime, limit: int) -> List[datetime]:
+        """Próximos momentos de envío programado (para ScheduledSendDispatcher)"""
+        return await self.repository.get_send_times(after, until, limit)
+    
+    async def release_pending_emails(self, email_ids: List[int]) -> None:
+        """Devuelve al outbox emails reservados que no se enviaron"""
+        await self.repository.release_claims(email_ids)
     
     async def _prepare_email_content(self, email_data: EmailCreate) -> str:
         """
@@ -107,41 +644,213 @@ class EmailService:
         
         return "<html><body></body></html>"
     
-    async def get_email(self, email_id: int) -> Optional[EmailResponse]:
-        """Obtiene un email por su ID"""
-        email = await self.repository.get_by_id(email_id)
+    async def get_email(self, email_id: int, include_body: bool = False) -> Optional[EmailResponse]:
+        """
+        Obtiene un email por su ID
+        
+        Args:
+            email_id: ID del email
+            include_body: Incluir body y html_body (EmailDetailResponse)
+        """
+        entry = await self.get_email_entry(email_id, include_body)
+        return entry.response if entry is not None else None
+    
+    async def get_email_entry(self, email_id: int, include_body: bool = False) -> Optional[CachedEmail]:
+        """
+        Obtiene un email por su ID junto con su ETag
+        
+        Si el email está en el cache no se consulta la base de datos.
+        
+        Args:
+            email_id: ID del email
+            include_body: Incluir body y html_body (EmailDetailResponse)
+        """
+        version = None
+        if self.email_cache is not None:
+            cached = self.email_cache.get(email_id, include_body)
+            if cached is not None:
+                return cached
+            version = self.email_cache.version(email_id)
+        
+        email = await self.repository.get_summary(email_id)
         
         if not email:
-            return None
+            entry = await self._get_archived(email_id, include_body)
+        else:
+            if self.status_buffer is not None:
+                email = self.status_buffer.overlay([email])[0]
+            
+            if include_body:
+                response = (await self._with_bodies([email]))[0]
+            else:
+                response = EmailResponse.model_validate(email)
+            entry = CachedEmail(email_etag(email.id, email.updated_at, include_body), response)
         
-        return EmailResponse.model_validate(email)
+        if entry is not None and self.email_cache is not None:
+            self.email_cache.put(email_id, include_body, entry, version)
+        
+        return entry
     
-    async def get_all_emails(self, page: int = 1, page_size: int = 10) -> EmailList:
+    async def get_all_emails(
+        self,
+        page: int = 1,
+        page_size: int = 10,
+        cursor: Optional[str] = None,
+        exact_total: bool = False,
+        include_body: bool = False
+    ) -> EmailList:
         """
-        Obtiene lista paginada de emails
+        Obtiene lista paginada de emails (más recientes primero)
         
         Args:
-            page: Número de página (inicia en 1)
+            page: Número de página (inicia en 1); se ignora si hay cursor
             page_size: Cantidad de items por página
+            cursor: 'next_cursor' de una respuesta anterior (paginación por cursor)
+            exact_total: Contar el total exacto en lugar de usar una estimación
+            include_body: Incluir body y html_body de cada email (EmailDetailList)
             
         Returns:
             EmailList: Lista paginada de emails
+            
+        Raises:
+            ValueError: Si el cursor no es válido
         """
-        skip = (page - 1) * page_size
+        # Se pide un item extra para saber si existe una página siguiente
+        if cursor is not None:
+            emails = await self.repository.get_page(limit=page_size + 1, after=decode_cursor(cursor))
+            page = None
+        else:
+            skip = (page - 1) * page_size
+            emails = await self.repository.get_all(skip=skip, limit=page_size + 1)
         
-        emails = await self.repository.get_all(skip=skip, limit=page_size)
-        total = await self.repository.count()
+        has_more = len(emails) > page_size
+        emails = emails[:page_size]
+        if self.status_buffer is not None:
+            emails = self.status_buffer.overlay(emails)
+        next_cursor = encode_cursor(emails[-1].created_at, emails[-1].id) if has_more else None
+        
+        total, total_is_estimate = await self._get_total(exact_total)
+        
+        if include_body:
+            return EmailDetailList(
+                emails=await self._with_bodies(emails),
+                total=total,
+                total_is_estimate=total_is_estimate,
+                page=page,
+                page_size=page_size,
+                next_cursor=next_cursor
+            )
         
         return EmailList(
             emails=[EmailResponse.model_validate(email) for email in emails],
             total=total,
+            total_is_estimate=total_is_estimate,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            next_cursor=next_cursor
+        )
+    
+    async def export_emails(
+        self,
+        fmt: str = "ndjson",
+        status: Optional[EmailStatus] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after_id: Optional[int] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[str]:
+        """
+        Exporta el registro de emails (sin cuerpos) por id ascendente
+        
+        No cuenta filas ni pagina: lee un cursor del servidor y emite un
+        fragmento por lote, así que la memoria es constante.
+        
+        Args:
+            fmt: "ndjson" o "csv"
+            status: Solo emails con este estado
+            since: Creados desde esta fecha (inclusive)
+            until: Creados antes de esta fecha
+            after_id: Reanudar después del último id recibido (el CSV no
+                repite el encabezado)
+            batch_size: Filas por lote
+            
+        Yields:
+            str: Líneas NDJSON o filas CSV de un lote
+        """
+        chunk = csv_chunk if fmt == "csv" else ndjson_chunk
+        
+        # Los filtros por estado se resuelven en la base de datos: primero los estados pendientes
+        if self.status_buffer is not None:
+            await self.status_buffer.flush()
+        
+        if fmt == "csv" and after_id is None:
+            yield csv_header()
+        
+        async for emails in self.repository.iter_summaries(batch_size, status, since, until, after_id):
+            yield chunk(emails)
+    
+    async def _get_archived(self, email_id: int, include_body: bool) -> Optional[CachedEmail]:
+        """Busca el email en el archivo de retención (lee un archivo: fuera del event loop)"""
+        if self.archive is None:
+            return None
+        
+        email = await asyncio.to_thread(self.archive.get, email_id)
+        if email is None:
+            return None
+        
+        etag = email_etag(email_id, datetime.fromisoformat(email["updated_at"]), include_body)
+        if include_body:
+            return CachedEmail(etag, EmailDetailResponse(**email))
+        return CachedEmail(etag, EmailResponse(**email))
+    
+    async def _with_bodies(self, emails: List[EmailSummary]) -> List[EmailDetailResponse]:
+        """Agrega los cuerpos a los emails (una consulta para todos los que no estén en cache)"""
+        contents = await self.repository.get_contents(
+            digest for email in emails for digest in (email.body_hash, email.html_body_hash) if digest
         )
+        
+        return [
+            EmailDetailResponse(
+                **email._asdict(),
+                body=contents.get(email.body_hash),
+                html_body=contents.get(email.html_body_hash)
+            )
+            for email in emails
+        ]
+    
+    async def _get_total(self, exact: bool) -> Tuple[int, bool]:
+        """
+        Obtiene el total de emails
+        
+        COUNT(*) recorre toda la tabla, así que por defecto se usa la estimación
+        del planificador (cacheada unos segundos). En tablas pequeñas, o si no hay
+        estimación disponible, se cuenta de forma exacta porque es barato.
+        
+        Returns:
+            Tuple[int, bool]: Total y si es una estimación
+        """
+        if exact:
+            return await self.repository.count(), False
+        
+        cached = _estimated_total.get()
+        if cached is not None:
+            return cached, True
+        
+        estimate = await self.repository.estimate_count()
+        if estimate is None or estimate < EXACT_COUNT_THRESHOLD:
+            return await self.repository.count(), False
+        
+        _estimated_total.set(estimate)
+        return estimate, True
     
     async def update_email(self, email_id: int, email_data: EmailUpdate) -> Optional[EmailResponse]:
         """Actualiza un email"""
+        # Un estado pendiente de escribir no debe pisar después este cambio
+        if self.status_buffer is not None:
+            await self.status_buffer.flush()
+        
         email = await self.repository.update(email_id, email_data)
+        self._invalidate([email_id])
         
         if not email:
             return None
@@ -150,4 +859,9 @@ class EmailService:
     
     async def delete_email(self, email_id: int) -> bool:
         """Elimina un email"""
-        return await self.repository.delete(email_id)
\ No newline at end of file
+        if self.status_buffer is not None:
+            await self.status_buffer.flush()
+        
+        deleted = await self.repository.delete(email_id)
+        self._invalidate([email_id])
+        return deleted
\ No newline at end of file
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import AsyncContextManager, Callable, Deque, Dict, List, Optional, Set, Tuple
+from models.email_model import Email, EmailPriority
+from services.email_services import EmailService
+from utils.logger import log_context, new_correlation_id
+from utils.metrics import LANE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Orden en que los workers compartidos toman los carriles
+LANE_ORDER = (EmailPriority.HIGH, EmailPriority.NORMAL, EmailPriority.LOW)
+
+
+async def wait_event(event: asyncio.Event, timeout: float) -> bool:
+    """
+    Espera a que se active `event` como mucho `timeout` segundos (False si venció)
+
+    No usa asyncio.wait_for: en Python 3.11 pierde un cancel() que llega justo
+    cuando el evento se activa, y el bucle que la llama no se detiene nunca.
+    """
+    waiter = asyncio.ensure_future(event.wait())
+    try:
+        done, _ = await asyncio.wait({waiter}, timeout=timeout)
+    finally:
+        waiter.cancel()
+    return bool(done)
+
+
+class Lane:
+    """
+    Carril del outbox: la cola de los emails reservados de una prioridad
+    (Single Responsibility: guarda los emails de una prioridad y sus estadísticas)
+    """
+
+    def __init__(self, priority: EmailPriority, capacity: int, reserved_workers: int = 0, wait_alpha: float = 0.2):
+        """
+        Args:
+            priority: Prioridad de los emails del carril
+            capacity: Máximo de emails reservados esperando un worker
+            reserved_workers: Workers que solo toman emails de este carril
+            wait_alpha: Peso de cada envío en el promedio móvil de la espera
+        """
+        self.priority = priority
+        self.capacity = capacity
+        self.reserved_workers = reserved_workers
+        self.wait_alpha = wait_alpha
+
+        self.items: Deque[Tuple[Email, datetime]] = deque()
+        self.in_flight = 0
+        self.processed = 0
+        # Promedio móvil exponencial y máximo de los segundos que un email
+        # esperó desde que debía enviarse hasta que un worker lo tomó
+        self.wait: Optional[float] = None
+        self.max_wait = 0.0
+        self._wait_histogram = LANE_WAIT_SECONDS.labels(priority.value)
+
+    @property
+    def room(self) -> int:
+        return self.capacity - len(self.items)
+
+    def put(self, email: Email) -> None:
+        self.items.append((email, email.next_attempt_at or email.created_at or datetime.utcnow()))
+
+    def take(self) -> Email:
+        """Saca el email más antiguo del carril y registra cuánto esperó"""
+        email, due_at = self.items.popleft()
+        self.in_flight += 1
+
+        wait = max(0.0, (datetime.utcnow() - due_at).total_seconds())
+        self._wait_histogram.observe(wait)
+        self.max_wait = max(self.max_wait, wait)
+        if self.wait is None:
+            self.wait = wait
+        else:
+            self.wait += self.wait_alpha * (wait - self.wait)
+
+        return email
+
+    def done(self) -> None:
+        self.in_flight -= 1
+        self.processed += 1
+
+    def drain(self) -> List[Email]:
+        """Vacía el carril y retorna los emails que no se enviaron"""
+        emails = [email for email, _ in self.items]
+        self.items.clear()
+        return emails
+
+    def snapshot(self) -> dict:
+        oldest = 0.0
+        if self.items:
+            oldest = max(0.0, (datetime.utcnow() - self.items[0][1]).total_seconds())
+
+        return {
+            "priority": self.priority.value,
+            "reserved_workers": self.reserved_workers,
+            "queued": len(self.items),
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "oldest_wait_seconds": round(oldest, 3),
+            "wait_seconds": None if self.wait is None else round(self.wait, 3),
+            "max_wait_seconds": round(self.max_wait, 3)
+        }
+
+
+class OutboxWorker:
+    """
+    Pool de workers asyncio que drena los emails PENDING de la base de datos
+    (Single Responsibility: solo coordina el envío en segundo plano)
+
+    Un dispatcher reserva lotes de emails pendientes y los pone en colas
+    acotadas; N workers toman emails de las colas y los envían. Las colas
+    acotadas hacen de backpressure: no se reservan más emails de los que se
+    pueden enviar.
+
+    Hay una cola (carril) por prioridad y cada una se reserva por separado,
+    así una campaña de cientos de miles de emails LOW nunca ocupa el lugar de
+    un email HIGH. Los workers compartidos toman siempre el carril de mayor
+    prioridad con emails; los reservados de un carril (`reserved_workers`)
+    solo toman emails de ese carril, así que aunque los compartidos estén
+    ocupados con envíos lentos de la campaña, un email HIGH espera como
+    máximo una consulta del dispatcher y el envío de otro email HIGH.
+
+    En modo síncrono se usa con `retries_only` para enviar solo los emails
+    aplazados por el scheduler de entrega y los reintentos de emails fallidos.
+    """
+
+    def __init__(
+        self,
+        service_scope: Callable[[], AsyncContextManager[EmailService]],
+        concurrency: int = 8,
+        batch_size: int = 100,
+        poll_interval: float = 5.0,
+        lease_seconds: int = 300,
+        retries_only: bool = False,
+        reserved_workers: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            service_scope: Factory de un context manager que entrega un EmailService
+                con su propia sesión de base de datos
+            concurrency: Cantidad de envíos simultáneos de los workers compartidos
+            batch_size: Máximo de emails reservados por consulta (y por carril)
+            poll_interval: Segundos entre consultas cuando no hay notificaciones
+            lease_seconds: Tiempo tras el cual un email reservado y no enviado
+                vuelve a estar disponible
+            retries_only: Reservar solo emails aplazados o con reintento vencido
+                (los nuevos se envían dentro de la petición)
+            reserved_workers: Workers adicionales por prioridad que solo envían
+                emails de esa prioridad, ej: {"high": 2}
+        """
+        self.service_scope = service_scope
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.retries_only = retries_only
+
+        reserved = {EmailPriority(priority): count for priority, count in (reserved_workers or {}).items()}
+        self.lanes: Dict[EmailPriority, Lane] = {
+            priority: Lane(priority, batch_size, reserved.get(priority, 0))
+            for priority in LANE_ORDER
+        }
+
+        self._ready: Optional[asyncio.Condition] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # Carriles en los que pueden quedar emails pendientes en la base de datos
+        self._pending: Set[EmailPriority] = set(LANE_ORDER)
+        self._tasks: List[asyncio.Task] = []
+
+    def notify(self) -> None:
+        """Despierta al dispatcher porque hay emails nuevos"""
+        self._pending.update(LANE_ORDER)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """Inicia el dispatcher y el pool de workers"""
+        self._ready = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+
+        self._tasks = [asyncio.create_task(self._dispatch(), name="outbox-dispatcher")]
+        self._tasks += [
+            asyncio.create_task(self._work(LANE_ORDER), name=f"outbox-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        for lane in self.lanes.values():
+            self._tasks += [
+                asyncio.create_task(self._work((lane.priority,)), name=f"outbox-worker-{lane.priority.value}-{i}")
+                for i in range(lane.reserved_workers)
+            ]
+
+    async def stop(self) -> None:
+        """Detiene los workers y libera los emails reservados que no se enviaron"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        unsent_ids = [email.id for lane in self.lanes.values() for email in lane.drain()]
+
+        if unsent_ids:
+            async with self.service_scope() as service:
+                await service.release_pending_emails(unsent_ids)
+
+    def stats(self) -> List[dict]:
+        """Estado de cada carril: emails en cola y en curso, y cuánto esperan"""
+        return [lane.snapshot() for lane in self.lanes.values()]
+
+    async def _dispatch(self) -> None:
+        """Reserva lotes de emails pendientes de cada carril y los encola para los workers"""
+        while True:
+            self._wakeup.clear()
+
+            # Primero el carril de mayor prioridad: un email HIGH nuevo espera
+            # como máximo la consulta de la campaña que estuviera en curso
+            for lane in self.lanes.values():
+                if lane.priority not in self._pending or lane.room <= 0:
+                    continue
+
+                limit = min(self.batch_size, lane.room)
+                claimed = await self._claim_batch(lane.priority, limit)
+                # Si el lote no vino lleno no quedan más pendientes de esta prioridad
+                if len(claimed) < limit:
+                    self._pending.discard(lane.priority)
+
+                if claimed:
+                    for email in claimed:
+                        lane.put(email)
+                    async with self._ready:
+                        self._ready.notify_all()
+
+            # Quedan pendientes en algún carril con lugar: seguir reservando
+            if any(self.lanes[priority].room > 0 for priority in self._pending):
+                continue
+
+            if not await wait_event(self._wakeup, self.poll_interval):
+                self._pending.update(LANE_ORDER)
+
+    async def _claim_batch(self, priority: EmailPriority, limit: int) -> List[Email]:
+        """Reserva hasta `limit` emails de una prioridad"""
+        try:
+            async with self.service_scope() as service:
+                return await service.claim_pending_emails(limit, self.lease_seconds, self.retries_only, priority)
+        except Exception:
+            logger.exception("Error al reservar emails del outbox", extra={"priority": priority.value})
+            return []
+
+    def _next_lane(self, priorities: Tuple[EmailPriority, ...]) -> Optional[Lane]:
+        for priority in priorities:
+            if self.lanes[priority].items:
+                return self.lanes[priority]
+        return None
+
+    async def _work(self, priorities: Tuple[EmailPriority, ...]) -> None:
+        """Envía uno por uno los emails de los carriles `priorities` (en ese orden)"""
+        while True:
+            async with self._ready:
+                await self._ready.wait_for(lambda: self._next_lane(priorities) is not None)
+                lane = self._next_lane(priorities)
+                email = lane.take()
+
+            # Con el carril a la mitad el dispatcher vuelve a reservar (sin
+            # una consulta por cada lugar que se libera)
+            if len(lane.items) <= lane.capacity // 2 and lane.priority in self._pending:
+                self._wakeup.set()
+
+            # Cada envío del outbox tiene su propio correlation id
+            with log_context(correlation_id=new_correlation_id(), email_id=email.id):
+                try:
+                    async with self.service_scope() as service:
+                        await service.deliver(email)
+                except Exception:
+                    logger.exception("Error en outbox al enviar email")
+                finally:
+                    lane.done()
@@ -0,0 +1,264 @@
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+from sqlalchemy import and_, column, delete, exists, func, select, table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from models.email_model import Email, EmailAttachment, EmailContent, EmailStatus, IdempotencyKey
+from config.database.partitioning import (
+    DEFAULT_PARTITION,
+    LOCK_TIMEOUT,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions
+)
+from utils.attachment_store import AttachmentStore
+from utils.content_store import body_hashes, cached_contents, decompress_contents
+from utils.email_archive import EmailArchive
+
+emails = Email.__table__
+contents = EmailContent.__table__
+idempotency_keys = IdempotencyKey.__table__
+attachments = EmailAttachment.__table__
+
+
+def _expired(source, cutoff: datetime):
+    """
+    Emails que se pueden archivar: creados antes de `cutoff` y sin envío
+    pendiente (ni PENDING ni con un reintento o aplazamiento programado)
+    """
+    return and_(
+        source.c.created_at < cutoff,
+        source.c.status != EmailStatus.PENDING,
+        source.c.next_attempt_at.is_(None)
+    )
+
+
+def _partition_table(name: str):
+    """Una partición con las mismas columnas (y tipos) que emails"""
+    return table(name, *(column(c.name, c.type) for c in emails.c))
+
+
+class RetentionJob:
+    """
+    Job de retención: mueve los emails antiguos de la base de datos al archivo
+    (Single Responsibility: decide qué archivar y lo borra una vez archivado)
+
+    Cada lote es una transacción corta: lee hasta `batch_size` emails
+    (FOR UPDATE SKIP LOCKED, para no esperar a los workers), los escribe en
+    el archivo y los borra. Si el proceso se interrumpe entre la escritura y
+    el commit, el lote se vuelve a archivar en la siguiente ejecución: el
+    archivo puede repetir un email, nunca perderlo.
+
+    Con emails particionado por mes, las particiones que quedaron enteras
+    antes del corte se archivan y se eliminan con DROP TABLE. También borra
+    las Idempotency-Key vencidas y los archivos adjuntos que ya no usa
+    ningún email.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        archive: EmailArchive,
+        batch_size: int = 1000,
+        months_ahead: int = 3,
+        attachment_store: Optional[AttachmentStore] = None
+    ):
+        self.engine = engine
+        self.archive = archive
+        self.batch_size = batch_size
+        self.months_ahead = months_ahead
+        self.attachment_store = attachment_store
+        self.is_postgres = engine.dialect.name == "postgresql"
+
+    def count_expired(self, cutoff: datetime) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(emails).where(_expired(emails, cutoff))).scalar_one()
+
+    def run(self, cutoff: datetime) -> Dict[str, Any]:
+        """
+        Archiva y borra todos los emails que vencieron antes de `cutoff`
+
+        Returns:
+            Dict: Emails archivados (total y por mes), particiones creadas y
+            eliminadas, contenidos, claves de idempotencia y archivos adjuntos
+            borrados y lotes
+        """
+        report = {
+            "archived": 0,
+            "by_month": Counter(),
+            "batches": 0,
+            "contents_deleted": 0,
+            "keys_deleted": 0,
+            "attachments_deleted": 0,
+            "partitions_created": [],
+            "partitions_dropped": []
+        }
+
+        if self.is_postgres:
+            report["partitions_created"] = ensure_partitions(self.engine, self.months_ahead)
+            for partition in self._expired_partitions(cutoff):
+                if self._archive_partition(partition, cutoff, report):
+                    report["partitions_dropped"].append(partition)
+
+        while self._archive_batch(cutoff, report):
+            pass
+
+        while self._delete_expired_keys(datetime.utcnow(), report):
+            pass
+
+        if self.attachment_store is not None:
+            report["attachments_deleted"] = self.attachment_store.sweep(
+                self._referenced_attachments, batch_size=self.batch_size
+            )
+
+        report["by_month"] = dict(sorted(report["by_month"].items()))
+        return report
+
+    def _archive_batch(self, cutoff: datetime, report: Dict[str, Any]) -> bool:
+        """Archiva y borra un lote de emails vencidos (False si no quedaba ninguno)"""
+        with self.engine.begin() as conn:
+            rows = conn.execute(
+                select(emails)
+                .where(_expired(emails, cutoff))
+                .order_by(emails.c.created_at, emails.c.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                return False
+
+            self._write(conn, rows, report)
+            email_ids = [row.id for row in rows]
+            conn.execute(delete(emails).where(emails.c.id.in_(email_ids)))
+            conn.execute(delete(attachments).where(attachments.c.email_id.in_(email_ids)))
+
+        self._delete_orphan_contents(body_hashes(rows), report)
+        return True
+
+    def _delete_expired_keys(self, now: datetime, report: Dict[str, Any]) -> bool:
+        """Borra un lote de Idempotency-Key vencidas (False si no quedaba ninguna)"""
+        with self.engine.begin() as conn:
+            expired = (
+                select(idempotency_keys.c.key)
+                .where(idempotency_keys.c.expires_at <= now)
+                .limit(self.batch_size)
+                .scalar_subquery()
+            )
+            deleted = conn.execute(delete(idempotency_keys).where(idempotency_keys.c.key.in_(expired))).rowcount
+        report["keys_deleted"] += deleted
+        return deleted > 0
+
+    def _referenced_attachments(self, hashes: List[str]) -> Set[str]:
+        """Hashes de `hashes` que todavía tiene algún adjunto en email_attachments"""
+        with self.engine.connect() as conn:
+            return set(conn.execute(
+                select(attachments.c.hash).where(attachments.c.hash.in_(hashes)).distinct()
+            ).scalars())
+
+    def _expired_partitions(self, cutoff: datetime) -> List[str]:
+        """Particiones cuyo rango completo quedó antes de `cutoff`"""
+        with self.engine.connect() as conn:
+            if not is_partitioned(conn):
+                return []
+            return [
+                partition.name
+                for partition in list_partitions(conn)
+                if partition.name != DEFAULT_PARTITION and partition.upper is not None and partition.upper <= cutoff
+            ]
+
+    def _archive_partition(self, name: str, cutoff: datetime, report: Dict[str, Any]) -> bool:
+        """
+        Archiva una partición vencida completa y la elimina
+
+        Returns:
+            bool: False si todavía tiene envíos pendientes (queda para el
+            camino por lotes y para la próxima ejecución)
+        """
+        partition = _partition_table(name)
+
+        with self.engine.connect() as conn:
+            total = conn.execute(select(func.count()).select_from(partition)).scalar_one()
+            archivable = conn.execute(
+                select(func.count()).select_from(partition).where(_expired(partition, cutoff))
+            ).scalar_one()
+        if archivable < total:
+            return False
+
+        # Por rangos de id: cada lote es una consulta corta y sin bloqueos
+        hashes: List[str] = []
+        email_ids: List[int] = []
+        last_id = 0
+        archived = 0
+        while True:
+            with self.engine.connect() as conn:
+                rows = conn.execute(
+                    select(partition)
+                    .where(partition.c.id > last_id)
+                    .order_by(partition.c.id)
+                    .limit(self.batch_size)
+                ).all()
+                if not rows:
+                    break
+                self._write(conn, rows, report)
+            hashes.extend(body_hashes(rows))
+            email_ids.extend(row.id for row in rows)
+            archived += len(rows)
+            last_id = rows[-1].id
+
+        with self.engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            conn.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+            # Nadie debería escribir en un mes vencido; si cambió, se deja para la próxima
+            if conn.execute(select(func.count()).select_from(partition)).scalar_one() != archived:
+                return False
+            conn.execute(text(f"DROP TABLE {name}"))
+
+        for start in range(0, len(email_ids), self.batch_size):
+            with self.engine.begin() as conn:
+                conn.execute(delete(attachments).where(
+                    attachments.c.email_id.in_(email_ids[start:start + self.batch_size])
+                ))
+        for start in range(0, len(hashes), self.batch_size):
+            self._delete_orphan_contents(hashes[start:start + self.batch_size], report)
+        return True
+
+    def _write(self, conn: Connection, rows: List, report: Dict[str, Any]) -> None:
+        """Escribe los emails en el archivo, con sus cuerpos en texto"""
+        texts, missing = cached_contents(body_hashes(rows))
+        if missing:
+            texts.update(decompress_contents(
+                conn.execute(select(contents.c.hash, contents.c.data).where(contents.c.hash.in_(missing))).all()
+            ))
+
+        records = []
+        for row in rows:
+            record = row._asdict()
+            record["body"] = texts.get(row.body_hash) if row.body_hash else None
+            record["html_body"] = texts.get(row.html_body_hash) if row.html_body_hash else None
+            records.append(record)
+
+        written = self.archive.write(records)
+        report["archived"] += len(records)
+        report["by_month"].update(written)
+        report["batches"] += 1
+
+    def _delete_orphan_contents(self, hashes: Iterable[Optional[str]], report: Dict[str, Any]) -> None:
+        """Borra de email_contents los cuerpos de `hashes` que ya no usa ningún email"""
+        candidates = list(set(hashes))
+        if not candidates:
+            return
+
+        try:
+            with self.engine.begin() as conn:
+                # Dos NOT EXISTS (uno por índice) en lugar de un OR
+                result = conn.execute(
+                    delete(contents)
+                    .where(contents.c.hash.in_(candidates))
+                    .where(~exists().where(emails.c.body_hash == contents.c.hash))
+                    .where(~exists().where(emails.c.html_body_hash == contents.c.hash))
+                )
+                report["contents_deleted"] += result.rowcount
+        except IntegrityError:
+            # Un email nuevo tomó uno de estos cuerpos mientras tanto: se conservan
+            pass
@@ -0,0 +1,135 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import AsyncContextManager, Callable, List, Optional, Set
+from services.email_services import EmailService
+from services.outbox_worker import OutboxWorker, wait_event
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledSendDispatcher:
+    """
+    Despierta al outbox en el momento exacto de cada envío programado
+    (Single Responsibility: solo sabe cuándo vencen los emails programados)
+
+    Un email programado se guarda con next_attempt_at = send_at, así que el
+    outbox no lo reserva antes de tiempo. Este dispatcher carga en un min-heap
+    los send_at distintos de los próximos `window` segundos (una consulta por
+    ventana sobre ix_emails_send_at, no una por tick), duerme hasta el más
+    cercano y llama a notify() del outbox, que reserva los emails vencidos
+    en ese momento con su consulta de siempre.
+
+    La memoria depende de la cantidad de momentos distintos de la ventana,
+    no de la cantidad de emails: una campaña a las 9:00 es un solo timer. Si
+    la ventana tiene más de `max_timers` momentos se carga hasta ahí y el
+    resto en la siguiente consulta.
+
+    No guarda estado propio: al reiniciar, los emails que vencieron mientras
+    el proceso estaba detenido los reserva la primera consulta del outbox y
+    los futuros se vuelven a cargar desde la base. Con varios procesos cada
+    uno despierta a su outbox; la consulta periódica del outbox
+    (OUTBOX_POLL_INTERVAL) cubre los emails programados por otro proceso
+    dentro de una ventana ya cargada.
+    """
+
+    def __init__(
+        self,
+        service_scope: Callable[[], AsyncContextManager[EmailService]],
+        worker: OutboxWorker,
+        window: float = 300.0,
+        max_timers: int = 10000
+    ):
+        """
+        Args:
+            service_scope: Factory de un context manager que entrega un EmailService
+                con su propia sesión de base de datos
+            worker: Outbox que envía los emails cuando vencen
+            window: Segundos hacia adelante que se cargan en cada consulta
+            max_timers: Máximo de momentos distintos cargados por consulta
+        """
+        self.service_scope = service_scope
+        self.worker = worker
+        self.window = window
+        self.max_timers = max_timers
+
+        self._timers: List[datetime] = []
+        self._loaded: Set[datetime] = set()
+        # Todos los send_at hasta este momento están en el heap (o ya vencieron)
+        self._horizon: Optional[datetime] = None
+        # Fin de la ventana que se está consultando (None si no hay consulta en curso)
+        self._loading_until: Optional[datetime] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, send_at: datetime) -> None:
+        """
+        Agrega el send_at de un email recién programado
+
+        Los que caen después de la ventana cargada se leen de la base
+        cuando llegue su ventana. Mientras se consulta la siguiente ventana se
+        aceptan hasta su fin: el email pudo guardarse después de la consulta.
+        """
+        if self._horizon is None or send_at > (self._loading_until or self._horizon) or send_at in self._loaded:
+            return
+
+        self._push(send_at)
+        if self._timers[0] == send_at and self._changed is not None:
+            self._changed.set()
+
+    async def start(self) -> None:
+        """Inicia el dispatcher (su primera vuelta carga la ventana actual)"""
+        self._changed = asyncio.Event()
+        self._horizon = datetime.utcnow()
+        self._task = asyncio.create_task(self._run(), name="scheduled-dispatcher")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._changed.clear()
+            now = datetime.utcnow()
+
+            if self._horizon <= now:
+                await self._load(now)
+
+            due = 0
+            while self._timers and self._timers[0] <= now:
+                self._loaded.discard(heapq.heappop(self._timers))
+                due += 1
+            if due:
+                self.worker.notify()
+
+            wake_at = min(self._timers[0], self._horizon) if self._timers else self._horizon
+            await wait_event(self._changed, max(0.0, (wake_at - datetime.utcnow()).total_seconds()))
+
+    async def _load(self, now: datetime) -> None:
+        """Carga los send_at de la siguiente ventana y mueve el horizonte"""
+        until = now + timedelta(seconds=self.window)
+        self._loading_until = until
+        try:
+            async with self.service_scope() as service:
+                send_times = await service.get_send_times(self._horizon, until, self.max_timers)
+        except Exception:
+            logger.exception("Error al cargar los envíos programados")
+            # Mientras tanto la consulta periódica del outbox envía los que vencen
+            await asyncio.sleep(self.worker.poll_interval)
+            return
+        finally:
+            self._loading_until = None
+
+        for send_at in send_times:
+            if send_at not in self._loaded:
+                self._push(send_at)
+
+        # Ventana incompleta: la próxima consulta sigue desde el último cargado
+        self._horizon = send_times[-1] if len(send_times) >= self.max_timers else until
+
+    def _push(self, send_at: datetime) -> None:
+        heapq.heappush(self._timers, send_at)
+        self._loaded.add(send_at)
@@ -0,0 +1,44 @@
+"""
+Configuración común de las pruebas
+
+La configuración de la app se lee de variables de entorno al importar
+config.config, así que se fija aquí antes de importar cualquier módulo de
+la app: una base SQLite temporal, el MockEmailSender y directorios
+temporales para el archivo y los adjuntos.
+"""
+
+import os
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="email_api_tests_")
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(TEST_DIR, 'emails.db')}",
+    DB_ASYNC="false",
+    ENVIRONMENT="development",
+    SCHEMA_CHECK="full",
+    ARCHIVE_DIR=os.path.join(TEST_DIR, "archive"),
+    ATTACHMENTS_DIR=os.path.join(TEST_DIR, "attachments"),
+    LOG_LEVEL="WARNING"
+)
+
+import pytest
+from sqlalchemy import delete
+from config.database.connection import SessionLocal, engine, init_db
+from models.email_model import Base
+
+init_db("full")
+
+
+@pytest.fixture
+def db():
+    """Sesión sobre la base de pruebas; las tablas se vacían al terminar"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                if table.name != "schema_version":
+                    conn.execute(delete(table))
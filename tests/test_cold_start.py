@@ -0,0 +1,27 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Solo se importan si main crea el worker o hay varios relays configurados
+LAZY_MODULES = ("services.outbox_worker", "services.scheduled_dispatcher", "utils.relay_sender")
+
+
+def test_import_main_does_not_load_background_modules(tmp_path):
+    code = (
+        "import json, sys, main; "
+        f"print(json.dumps([name for name in {LAZY_MODULES!r} if name in sys.modules]))"
+    )
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'emails.db'}",
+        "SMTP_RELAYS": "",
+        "LOG_LEVEL": "WARNING"
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+
+    assert json.loads(output.strip().splitlines()[-1]) == []
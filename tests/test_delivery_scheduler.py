@@ -0,0 +1,267 @@
+"""
+DeliveryScheduler: token bucket, límite de concurrencia y aplazamiento de
+los envíos que superan los límites de su dominio o del relay
+"""
+
+import asyncio
+import time
+import pytest
+from datetime import datetime, timedelta
+from interfaces.email_interfaces import DeliveryDeferred
+from models.email_model import Email, EmailStatus
+from repositories.email_repository import EmailRepository
+from schemas.email_schema import EmailCreate
+from services.email_services import EmailService
+from utils.delivery_scheduler import ConcurrencyLimit, DeliveryScheduler, RateLimit, TokenBucket
+from utils.smtp_email_sender import MockEmailSender
+
+UNLIMITED = RateLimit(rate=0, burst=1, max_concurrency=0)
+
+
+class BlockingSender(MockEmailSender):
+    """Sender cuyos envíos terminan cuando el test lo indica"""
+
+    def __init__(self):
+        self.started = 0
+        self.release = asyncio.Event()
+
+    async def send(self, *args, **kwargs) -> bool:
+        self.started += 1
+        await self.release.wait()
+        return True
+
+
+def test_token_bucket_allows_a_burst_then_paces_sends():
+    bucket = TokenBucket(rate=10, burst=3)
+
+    for _ in range(3):
+        assert bucket.wait_time() == 0
+        bucket.consume()
+
+    # Sin tokens: el próximo llega en 1/rate segundos, y cada reserva suma otro
+    assert bucket.wait_time() == pytest.approx(0.1, abs=0.01)
+    bucket.consume()
+    assert bucket.wait_time() == pytest.approx(0.2, abs=0.01)
+
+    time.sleep(0.1)
+    assert -1 < bucket.available() < 1
+
+
+def test_token_bucket_refund_never_exceeds_the_burst():
+    bucket = TokenBucket(rate=1, burst=2)
+
+    bucket.consume()
+    bucket.refund()
+    bucket.refund()
+
+    assert bucket.available() == 2
+    assert bucket.is_full()
+
+
+def test_token_bucket_without_rate_never_waits():
+    bucket = TokenBucket(rate=0, burst=1)
+
+    for _ in range(100):
+        bucket.consume()
+
+    assert bucket.wait_time() == 0
+    assert bucket.is_full()
+
+
+def test_concurrency_limit_times_out_when_full():
+    async def run():
+        limit = ConcurrencyLimit(2)
+        assert await limit.acquire()
+        assert await limit.acquire()
+        assert not await limit.acquire(timeout=0.05)
+        return limit
+
+    limit = asyncio.run(run())
+
+    assert limit.active == 2
+    assert not limit._waiters
+
+
+def test_concurrency_limit_serves_waiters_in_order():
+    async def run():
+        limit = ConcurrencyLimit(1)
+        await limit.acquire()
+        order = []
+
+        async def wait(name):
+            await limit.acquire()
+            order.append(name)
+
+        waiters = [asyncio.create_task(wait(name)) for name in ("a", "b", "c")]
+        await asyncio.sleep(0)
+        for _ in waiters:
+            limit.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+        return order
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def run():
+        limit = ConcurrencyLimit(1)
+        await limit.acquire()
+
+        # Con timeout, como lo usa el scheduler
+        waiter = asyncio.create_task(limit.acquire(timeout=5))
+        await asyncio.sleep(0)
+        # El lugar se asigna y el envío se cancela antes de enterarse
+        limit.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limit.active == 0
+
+        # Cancelado mientras espera en la cola
+        await limit.acquire()
+        queued = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        limit.release()
+        return limit
+
+    limit = asyncio.run(run())
+
+    assert limit.active == 0
+    assert not limit._waiters
+
+
+def test_resize_wakes_waiters_and_zero_removes_the_limit():
+    async def run():
+        limit = ConcurrencyLimit(1)
+        await limit.acquire()
+        waiters = [asyncio.create_task(limit.acquire()) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        limit.resize(2)
+        woken = limit.active - 1
+
+        limit.resize(0)
+        await asyncio.gather(*waiters)
+        return limit, woken
+
+    limit, woken = asyncio.run(run())
+
+    assert woken == 1
+    assert limit.active == 4
+
+
+def test_send_beyond_max_wait_is_deferred():
+    scheduler = DeliveryScheduler(
+        MockEmailSender(),
+        default_limits=RateLimit(rate=1, burst=1, max_concurrency=0),
+        relay_limits=UNLIMITED,
+        max_wait=0.1
+    )
+
+    async def run():
+        await scheduler.send("a@example.com", "Hola", "Hola")
+        with pytest.raises(DeliveryDeferred) as deferred:
+            await scheduler.send("b@example.com", "Hola", "Hola")
+        # Otro dominio tiene su propio bucket
+        await scheduler.send("c@example.org", "Hola", "Hola")
+        return deferred.value
+
+    deferred = asyncio.run(run())
+
+    assert deferred.retry_after == pytest.approx(1, abs=0.05)
+    queues = scheduler.queue_depths()["domains"]
+    assert (queues["example.com"]["sent"], queues["example.com"]["deferred"]) == (1, 1)
+    assert queues["example.org"]["sent"] == 1
+
+
+def test_deferred_email_stays_pending_without_using_an_attempt(db):
+    scheduler = DeliveryScheduler(
+        MockEmailSender(),
+        default_limits=RateLimit(rate=1, burst=1, max_concurrency=0),
+        relay_limits=UNLIMITED,
+        max_wait=0.1
+    )
+    service = EmailService(EmailRepository(db), scheduler)
+
+    async def run():
+        first = await service.send_email(EmailCreate(recipient="a@example.com", subject="Hola", body="Hola"))
+        second = await service.send_email(EmailCreate(recipient="b@example.com", subject="Hola", body="Hola"))
+        return first.id, second.id
+
+    first_id, second_id = asyncio.run(run())
+
+    db.expire_all()
+    assert db.get(Email, first_id).status == EmailStatus.SENT
+    deferred = db.get(Email, second_id)
+    assert deferred.status == EmailStatus.PENDING
+    assert deferred.attempts == 0
+    assert deferred.claimed_at is None
+    assert datetime.utcnow() < deferred.next_attempt_at <= datetime.utcnow() + timedelta(seconds=1.1)
+
+
+def test_send_that_cannot_get_a_slot_refunds_its_tokens():
+    sender = BlockingSender()
+    scheduler = DeliveryScheduler(
+        sender,
+        default_limits=RateLimit(rate=1, burst=2, max_concurrency=1),
+        relay_limits=RateLimit(rate=1, burst=2, max_concurrency=0),
+        max_wait=0.05
+    )
+
+    async def run():
+        first = asyncio.create_task(scheduler.send("a@example.com", "Hola", "Hola"))
+        await asyncio.sleep(0)
+        with pytest.raises(DeliveryDeferred):
+            await scheduler.send("b@example.com", "Hola", "Hola")
+        tokens = scheduler.queue_depths()
+        sender.release.set()
+        await first
+        return tokens
+
+    queues = asyncio.run(run())
+
+    # Solo el envío en curso gastó su token en el dominio y en el relay
+    domain = queues["domains"]["example.com"]
+    relay = queues["relay"]["default"]
+    assert domain["tokens"] == pytest.approx(1, abs=0.1)
+    assert relay["tokens"] == pytest.approx(1, abs=0.1)
+    assert (domain["in_flight"], domain["waiting"], domain["deferred"]) == (1, 0, 1)
+    assert relay["in_flight"] == 1
+    assert sender.started == 1
+
+
+def test_send_cancelled_while_waiting_releases_everything():
+    sender = BlockingSender()
+    scheduler = DeliveryScheduler(
+        sender,
+        default_limits=RateLimit(rate=0, burst=1, max_concurrency=1),
+        relay_limits=RateLimit(rate=1, burst=2, max_concurrency=0),
+        max_wait=5
+    )
+
+    async def run():
+        first = asyncio.create_task(scheduler.send("a@example.com", "Hola", "Hola"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(scheduler.send("b@example.com", "Hola", "Hola"))
+        await asyncio.sleep(0.05)
+        second.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        queues = scheduler.queue_depths()
+        sender.release.set()
+        await first
+        return queues, scheduler.queue_depths()
+
+    during, after = asyncio.run(run())
+
+    relay = during["relay"]["default"]
+    assert relay["tokens"] == pytest.approx(1, abs=0.1)
+    assert during["domains"]["example.com"]["waiting"] == 0
+    assert during["domains"]["example.com"]["deferred"] == 0
+    assert after["domains"]["example.com"]["in_flight"] == 0
+    assert after["relay"]["default"]["in_flight"] == 0
+    assert sender.started == 1
@@ -0,0 +1,94 @@
+"""
+Idempotency-Key en EmailService.send_email: dos peticiones con la misma
+clave crean un solo email aunque lleguen a la vez
+"""
+
+import asyncio
+import pytest
+from sqlalchemy import func, select
+from config.database.connection import SessionLocal
+from interfaces.email_interfaces import IdempotencyKeyReused
+from models.email_model import Email, EmailStatus
+from repositories.email_repository import EmailRepository
+from schemas.email_schema import EmailCreate
+from services.email_services import EmailService
+from utils.smtp_email_sender import MockEmailSender
+
+
+class CountingSender(MockEmailSender):
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, *args, **kwargs) -> bool:
+        self.sent += 1
+        return True
+
+
+class RacingRepository(EmailRepository):
+    """
+    Repositorio que espera a que todas las peticiones hayan buscado la clave
+    antes de seguir: todas la encuentran libre e intentan crear el email
+    """
+
+    def __init__(self, db, barrier: asyncio.Barrier):
+        super().__init__(db)
+        self.barrier = barrier
+        self.waited = False
+
+    async def get_idempotency_key(self, key):
+        record = await super().get_idempotency_key(key)
+        if not self.waited:
+            self.waited = True
+            await self.barrier.wait()
+        return record
+
+
+def email(body: str = "Hola") -> EmailCreate:
+    return EmailCreate(recipient="usuario@example.com", subject="Bienvenido", body=body)
+
+
+def count_emails(db) -> int:
+    return db.execute(select(func.count()).select_from(Email)).scalar_one()
+
+
+def test_concurrent_requests_with_same_key_create_one_email(db):
+    sender = CountingSender()
+
+    async def run(requests: int):
+        barrier = asyncio.Barrier(requests)
+        sessions = [SessionLocal() for _ in range(requests)]
+        try:
+            services = [EmailService(RacingRepository(session, barrier), sender) for session in sessions]
+            return await asyncio.gather(*(service.send_email(email(), "pedido-42") for service in services))
+        finally:
+            for session in sessions:
+                session.close()
+
+    responses = asyncio.run(run(3))
+
+    assert len({response.id for response in responses}) == 1
+    assert all(response.status == EmailStatus.SENT for response in responses)
+    assert count_emails(db) == 1
+    assert sender.sent == 1
+
+
+def test_retry_with_same_key_replays_the_original_response(db):
+    sender = CountingSender()
+    service = EmailService(EmailRepository(db), sender)
+
+    first = asyncio.run(service.send_email(email(), "pedido-43"))
+    second = asyncio.run(service.send_email(email(), "pedido-43"))
+
+    assert second.id == first.id
+    assert count_emails(db) == 1
+    assert sender.sent == 1
+
+
+def test_same_key_with_a_different_request_is_rejected(db):
+    service = EmailService(EmailRepository(db), CountingSender())
+
+    asyncio.run(service.send_email(email("Hola"), "pedido-44"))
+    with pytest.raises(IdempotencyKeyReused):
+        asyncio.run(service.send_email(email("Chau"), "pedido-44"))
+
+    assert count_emails(db) == 1
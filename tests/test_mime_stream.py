@@ -0,0 +1,207 @@
+"""
+Adjuntos en streaming: StreamingMessage produce los mismos bytes que
+smtplib.send_message, y AttachmentStore acota el tamaño y no deja archivos
+temporales
+"""
+
+import asyncio
+import base64
+import io
+import os
+import random
+import smtplib
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from controllers.emails_controller import EmailController
+from interfaces.email_interfaces import Attachment, AttachmentTooLarge
+from repositories.email_repository import EmailRepository
+from services.email_services import EmailService
+from utils import mime_stream
+from utils.attachment_store import AttachmentStore
+from utils.mime_stream import ENCODE_CHUNK_SIZE, StreamingMessage
+from utils.smtp_email_sender import MockEmailSender
+
+
+class CapturingSMTP(smtplib.SMTP):
+    """smtplib.SMTP sin conexión: guarda lo que enviaría en el comando DATA"""
+
+    def __init__(self):
+        super().__init__()
+        self.data_sent = b""
+        self._replies = [(354, b"Go ahead"), (250, b"OK")]
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, sender, options=()):
+        return 250, b"OK"
+
+    def rcpt(self, recipient, options=()):
+        return 250, b"OK"
+
+    def putcmd(self, cmd, args=""):
+        pass
+
+    def getreply(self):
+        return self._replies.pop(0)
+
+    def send(self, data):
+        self.data_sent += data
+
+
+def ascii_alternative(body, html_body=None):
+    """Cuerpos en 7bit (en utf-8 van en base64): así los puntos al inicio de línea llegan al DATA"""
+    part = MIMEMultipart("alternative")
+    part.attach(MIMEText(body, "plain", "us-ascii"))
+    if html_body:
+        part.attach(MIMEText(html_body, "html", "us-ascii"))
+    return part
+
+
+def smtplib_data(subject, body, html_body, attachments) -> bytes:
+    """DATA que envía smtplib.send_message con los adjuntos codificados en memoria"""
+    message = MIMEMultipart("mixed")
+    message["From"] = "app@example.com"
+    message["To"] = "usuario@example.com"
+    message["Subject"] = subject
+    message.attach(ascii_alternative(body, html_body))
+    for attachment in attachments:
+        part = MIMEBase(*attachment.content_type.split("/"))
+        part.add_header("Content-Disposition", "attachment", filename=attachment.filename)
+        with open(attachment.path, "rb") as file:
+            part.set_payload(file.read())
+        encoders.encode_base64(part)
+        message.attach(part)
+
+    server = CapturingSMTP()
+    server.send_message(message)
+    return server.data_sent
+
+
+def write_attachment(tmp_path, name, data: bytes, content_type="application/octet-stream") -> Attachment:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return Attachment(name, content_type, len(data), "-", str(path))
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def test_streamed_message_matches_smtplib_send_message(tmp_path, monkeypatch):
+    monkeypatch.setattr(mime_stream, "alternative_part", ascii_alternative)
+    attachments = [
+        # Más de una parte de codificación, y un tamaño que no es múltiplo de 57
+        write_attachment(tmp_path, "datos.bin", os.urandom(ENCODE_CHUNK_SIZE * 2 + 1000)),
+        write_attachment(tmp_path, "notas.txt", b".oculto\n.\nfin", "text/plain"),
+    ]
+    # Líneas que empiezan con punto antes, entre y después de los adjuntos
+    body = ".primera\nmedio\n.\n..doble"
+    html_body = "<p>hola</p>\n.fin"
+
+    random.seed(7)
+    streamed = b"".join(StreamingMessage(
+        "app@example.com", "usuario@example.com", "Factura", body, html_body, attachments
+    ).chunks())
+    random.seed(7)
+    expected = smtplib_data("Factura", body, html_body, attachments)
+
+    assert streamed + b".\r\n" == expected
+    assert b"\r\n..primera\r\n" in streamed
+    assert b"\r\n.\r\n" not in streamed
+
+
+def test_async_chunks_match_the_blocking_ones(tmp_path):
+    attachments = [write_attachment(tmp_path, "grande.bin", os.urandom(mime_stream.INLINE_ENCODE_LIMIT + 10))]
+    message = StreamingMessage("app@example.com", "usuario@example.com", "Hola", "Hola", None, attachments)
+
+    async def collect():
+        with ThreadPoolExecutor(1) as executor:
+            return [chunk async for chunk in message.achunks(executor)]
+
+    assert b"".join(asyncio.run(collect())) == b"".join(message.chunks())
+
+
+def test_attachment_content_is_decoded_back_intact(tmp_path):
+    data = os.urandom(ENCODE_CHUNK_SIZE + 5)
+    message = StreamingMessage(
+        "app@example.com", "usuario@example.com", "Hola", "Hola", None,
+        [write_attachment(tmp_path, "datos.bin", data)]
+    )
+
+    encoded = b"".join(mime_stream.encode_file(str(tmp_path / "datos.bin")))
+
+    assert base64.b64decode(encoded) == data
+    assert all(len(line) <= 76 for line in encoded.split(b"\r\n"))
+    assert encoded in b"".join(message.chunks())
+
+
+def test_store_rejects_attachments_over_the_limit_and_leaves_no_files(tmp_path):
+    store = AttachmentStore(str(tmp_path), max_bytes=100)
+
+    async def save():
+        return await store.save_many([
+            ("a.bin", "application/octet-stream", chunks(b"a" * 60)),
+            ("b.bin", "application/octet-stream", chunks(b"b" * 30, b"b" * 30)),
+        ])
+
+    with pytest.raises(AttachmentTooLarge):
+        asyncio.run(save())
+
+    # El primero (dentro del límite) quedó guardado con su hash; ningún temporal
+    files = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert not any(name.startswith(".upload-") for name in files)
+    assert len(files) == 1
+
+
+def test_interrupted_upload_removes_its_temp_file(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+
+    async def broken_upload():
+        yield b"parte"
+        raise ConnectionResetError("Client disconnected")
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(store.save("a.bin", "application/octet-stream", broken_upload(), store.max_bytes))
+
+    assert [name for _, _, names in os.walk(tmp_path) for name in names] == []
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+
+    async def save():
+        return await store.save_many([
+            ("a.txt", "text/plain", chunks(b"hola")),
+            ("../../b.txt", "text/plain; charset=x\r\nX: y", chunks(b"ho", b"la")),
+        ])
+
+    first, second = asyncio.run(save())
+
+    assert first.hash == second.hash
+    assert (second.filename, second.content_type) == ("b.txt", "text/plain")
+    assert [name for _, _, names in os.walk(tmp_path) for name in names] == [first.hash]
+
+
+def test_upload_over_the_limit_is_a_413(db, tmp_path):
+    store = AttachmentStore(str(tmp_path), max_bytes=10)
+    controller = EmailController(EmailService(EmailRepository(db), MockEmailSender(), attachment_store=store))
+    upload = UploadFile(
+        file=io.BytesIO(b"x" * 11),
+        filename="grande.bin",
+        headers=Headers({"content-type": "application/octet-stream"})
+    )
+    fields = {"recipient": "usuario@example.com", "subject": "Hola", "body": "Hola"}
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(controller.send_email_with_attachments(fields, [upload]))
+
+    assert error.value.status_code == 413
+    assert [name for _, _, names in os.walk(tmp_path) for name in names] == []
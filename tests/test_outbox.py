@@ -0,0 +1,110 @@
+"""
+Outbox: reserva de emails pendientes con lease (claim_pending) y el pool
+de workers que los envía
+
+SQLite ignora FOR UPDATE SKIP LOCKED; lo que se prueba aquí es la reserva
+con claimed_at, que es lo que evita que dos consultas tomen el mismo email.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from config.database.connection import SessionLocal
+from models.email_model import Email, EmailStatus
+from repositories.email_repository import EmailRepository
+from schemas.email_schema import EmailCreate
+from services.email_services import EmailService
+from services.outbox_worker import OutboxWorker
+from utils.smtp_email_sender import MockEmailSender
+
+
+def create_emails(db, count: int, **fields) -> list:
+    emails = [
+        EmailCreate(recipient=f"usuario{index}@example.com", subject="Bienvenido", body="Hola", **fields)
+        for index in range(count)
+    ]
+    return asyncio.run(EmailRepository(db).create_many(emails))
+
+
+def claim(limit: int = 10, lease_seconds: int = 300, retries_only: bool = False) -> list:
+    """Reserva con su propia sesión, como otro worker u otro proceso"""
+    session = SessionLocal()
+    try:
+        claimed = asyncio.run(EmailRepository(session).claim_pending(limit, lease_seconds, retries_only))
+        return [email.id for email in claimed]
+    finally:
+        session.close()
+
+
+def test_claimed_emails_are_not_claimed_again(db):
+    ids = create_emails(db, 5)
+
+    first = claim(limit=3)
+    second = claim(limit=3)
+
+    assert first == ids[:3]
+    assert second == ids[3:]
+    assert claim() == []
+
+
+def test_expired_lease_makes_emails_available_again(db):
+    ids = create_emails(db, 2)
+    assert claim() == ids
+
+    # El proceso que los reservó murió hace más de un lease
+    db.execute(update(Email).values(claimed_at=datetime.utcnow() - timedelta(seconds=600)))
+    db.commit()
+
+    assert claim(lease_seconds=300) == ids
+
+
+def test_released_claims_are_claimed_again(db):
+    ids = create_emails(db, 3)
+    assert claim() == ids
+
+    asyncio.run(EmailRepository(db).release_claims(ids[:2]))
+
+    assert claim() == ids[:2]
+
+
+def test_only_due_retries_are_claimed(db):
+    ids = create_emails(db, 3)
+    now = datetime.utcnow()
+    db.execute(update(Email).where(Email.id == ids[0]).values(status=EmailStatus.FAILED, next_attempt_at=now - timedelta(seconds=1)))
+    db.execute(update(Email).where(Email.id == ids[1]).values(status=EmailStatus.FAILED, next_attempt_at=now + timedelta(hours=1)))
+    db.commit()
+
+    assert claim(retries_only=True) == [ids[0]]
+    assert claim() == [ids[2]]
+
+
+def test_worker_sends_every_pending_email_once(db):
+    ids = create_emails(db, 12)
+    sender = MockEmailSender()
+
+    @asynccontextmanager
+    async def service_scope():
+        session = SessionLocal()
+        try:
+            yield EmailService(EmailRepository(session), sender)
+        finally:
+            session.close()
+
+    async def run():
+        worker = OutboxWorker(service_scope, concurrency=3, batch_size=4, poll_interval=0.05)
+        await worker.start()
+        worker.notify()
+        for _ in range(100):
+            if sum(lane["processed"] for lane in worker.stats()) == len(ids):
+                break
+            await asyncio.sleep(0.05)
+        await worker.stop()
+
+    asyncio.run(run())
+
+    db.expire_all()
+    emails = db.query(Email).order_by(Email.id).all()
+    assert [email.id for email in emails] == ids
+    assert all(email.status == EmailStatus.SENT for email in emails)
+    assert all(email.attempts == 1 and email.claimed_at is None for email in emails)
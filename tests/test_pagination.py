@@ -0,0 +1,88 @@
+"""
+Paginación por cursor de GET /emails: el cursor (created_at, id) recorre
+todos los emails una sola vez aunque compartan created_at
+"""
+
+import asyncio
+import base64
+import pytest
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import update
+from controllers.emails_controller import EmailController
+from models.email_model import Email
+from repositories.email_repository import EmailRepository
+from schemas.email_schema import EmailCreate
+from services.email_services import EmailService
+from utils.pagination import decode_cursor, encode_cursor
+from utils.smtp_email_sender import MockEmailSender
+
+
+def create_emails(db, count: int) -> list:
+    emails = [
+        EmailCreate(recipient=f"usuario{index}@example.com", subject="Bienvenido", body="Hola")
+        for index in range(count)
+    ]
+    return asyncio.run(EmailRepository(db).create_many(emails))
+
+
+def walk(db, page_size: int) -> list:
+    """Recorre todas las páginas siguiendo next_cursor"""
+    service = EmailService(EmailRepository(db), MockEmailSender())
+    pages = [asyncio.run(service.get_all_emails(page_size=page_size))]
+    while pages[-1].next_cursor is not None:
+        pages.append(asyncio.run(service.get_all_emails(page_size=page_size, cursor=pages[-1].next_cursor)))
+    return pages
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 9, 30, 15, 123456)
+
+    cursor = encode_cursor(created_at, 42)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+def test_cursor_walks_every_email_once_newest_first(db):
+    ids = create_emails(db, 7)
+    base = datetime.utcnow() - timedelta(hours=1)
+    for offset, email_id in enumerate(ids):
+        db.execute(update(Email).where(Email.id == email_id).values(created_at=base + timedelta(minutes=offset)))
+    db.commit()
+
+    pages = walk(db, page_size=3)
+
+    assert [len(page.emails) for page in pages] == [3, 3, 1]
+    assert [email.id for page in pages for email in page.emails] == ids[::-1]
+    assert all(page.page is None for page in pages[1:])
+
+
+def test_emails_created_at_the_same_instant_are_not_skipped_or_repeated(db):
+    ids = create_emails(db, 7)
+    same_instant = datetime.utcnow() - timedelta(minutes=5)
+    db.execute(update(Email).where(Email.id.in_(ids[1:6])).values(created_at=same_instant))
+    db.execute(update(Email).where(Email.id == ids[0]).values(created_at=same_instant - timedelta(seconds=1)))
+    db.execute(update(Email).where(Email.id == ids[6]).values(created_at=same_instant + timedelta(seconds=1)))
+    db.commit()
+
+    pages = walk(db, page_size=2)
+
+    # Los empates se ordenan por id descendente
+    walked = [email.id for page in pages for email in page.emails]
+    assert walked == [ids[6], ids[5], ids[4], ids[3], ids[2], ids[1], ids[0]]
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-un-cursor",
+    base64.urlsafe_b64encode(b'"solo texto"').decode("ascii"),
+    base64.urlsafe_b64encode(b'["no es fecha", 1]').decode("ascii"),
+])
+def test_invalid_cursor_is_a_400(db, cursor):
+    controller = EmailController(EmailService(EmailRepository(db), MockEmailSender()))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(controller.get_emails(cursor=cursor))
+
+    assert error.value.status_code == 400
+    assert error.value.detail == "Invalid cursor"
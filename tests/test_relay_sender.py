@@ -0,0 +1,177 @@
+"""
+MultiRelaySender: circuito de cada relay, failover ante errores
+transitorios y límites de envío propios de cada relay
+"""
+
+import asyncio
+import time
+import pytest
+from interfaces.email_interfaces import DeliveryDeferred, EmailDeliveryError
+from utils.delivery_scheduler import DeliveryScheduler, LimitState, RateLimit
+from utils.relay_sender import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, MultiRelaySender, Relay
+from utils.smtp_email_sender import MockEmailSender
+
+
+class FakeRelaySender(MockEmailSender):
+    """Sender de un relay: registra los envíos y falla con `error` si lo tiene"""
+
+    def __init__(self, error: EmailDeliveryError = None):
+        self.error = error
+        self.sent = []
+
+    async def send(self, recipient, *args, **kwargs) -> bool:
+        if self.error is not None:
+            raise self.error
+        self.sent.append(recipient)
+        return True
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_requests):
+        breaker.record(False)
+
+
+def test_breaker_opens_at_the_error_threshold():
+    breaker = CircuitBreaker(error_threshold=0.5, window=10, min_requests=4)
+
+    for success in (True, False, True):
+        breaker.record(success)
+    assert breaker.state == CLOSED
+
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allows()
+
+
+def test_breaker_lets_a_single_probe_through_after_open_seconds():
+    breaker = CircuitBreaker(min_requests=2, open_seconds=0.05)
+    open_breaker(breaker)
+    assert breaker.retry_after() > 0
+
+    time.sleep(0.06)
+    assert breaker.allows()
+    breaker.acquire()
+    assert breaker.state == HALF_OPEN
+    # Mientras la prueba está en curso no pasa ningún otro envío
+    assert not breaker.allows()
+
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.allows()
+
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker = CircuitBreaker(min_requests=2, open_seconds=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    breaker.acquire()
+    breaker.record(False)
+
+    assert breaker.state == OPEN
+    assert breaker.retry_after() > 0
+
+
+def test_cancelled_probe_lets_another_one_through():
+    breaker = CircuitBreaker(min_requests=2, open_seconds=0)
+    open_breaker(breaker)
+
+    breaker.acquire()
+    assert not breaker.allows()
+    breaker.release()
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allows()
+
+
+def test_transient_error_fails_over_to_another_relay():
+    broken = FakeRelaySender(EmailDeliveryError("Connection refused"))
+    healthy = FakeRelaySender()
+    sender = MultiRelaySender([Relay("a", broken), Relay("b", healthy, weight=0)])
+
+    assert asyncio.run(sender.send("usuario@example.com", "Hola", "Hola"))
+
+    assert healthy.sent == ["usuario@example.com"]
+    stats = {relay["name"]: relay for relay in sender.stats()}
+    assert (stats["a"]["failed"], stats["b"]["sent"]) == (1, 1)
+
+
+def test_permanent_error_is_not_retried_on_another_relay():
+    rejecting = FakeRelaySender(EmailDeliveryError("No such user", permanent=True, code=550))
+    other = FakeRelaySender()
+    sender = MultiRelaySender([Relay("a", rejecting), Relay("b", other, weight=0)])
+
+    with pytest.raises(EmailDeliveryError) as error:
+        asyncio.run(sender.send("usuario@example.com", "Hola", "Hola"))
+
+    assert error.value.permanent
+    assert other.sent == []
+    # Un rechazo del destinatario no cuenta como error del relay
+    relay = sender.relays[0]
+    assert (relay.rejected, relay.failed, relay.breaker.error_rate) == (1, 0, 0)
+
+
+def test_last_transient_error_is_raised_when_every_relay_fails():
+    sender = MultiRelaySender([
+        Relay("a", FakeRelaySender(EmailDeliveryError("Timeout"))),
+        Relay("b", FakeRelaySender(EmailDeliveryError("Timeout")))
+    ])
+
+    with pytest.raises(EmailDeliveryError) as error:
+        asyncio.run(sender.send("usuario@example.com", "Hola", "Hola"))
+
+    assert not error.value.permanent
+    assert [relay.failed for relay in sender.relays] == [1, 1]
+
+
+def test_send_is_deferred_while_every_breaker_is_open():
+    relays = [Relay(name, FakeRelaySender(), breaker=CircuitBreaker(min_requests=1, open_seconds=30)) for name in "ab"]
+    for relay in relays:
+        open_breaker(relay.breaker)
+    sender = MultiRelaySender(relays)
+
+    with pytest.raises(DeliveryDeferred) as deferred:
+        asyncio.run(sender.send("usuario@example.com", "Hola", "Hola"))
+
+    assert 29 < deferred.value.retry_after <= 30
+
+
+def test_relay_over_its_limit_passes_the_send_to_another_relay():
+    limited = Relay("a", FakeRelaySender(), limits=LimitState(RateLimit(rate=1, burst=1, max_concurrency=0)))
+    backup = Relay("b", FakeRelaySender(), weight=0, limits=LimitState(RateLimit(rate=1, burst=1, max_concurrency=0)))
+    sender = MultiRelaySender([limited, backup], max_wait=0.1)
+
+    async def run():
+        for index in range(2):
+            await sender.send(f"usuario{index}@example.com", "Hola", "Hola")
+        with pytest.raises(DeliveryDeferred) as deferred:
+            await sender.send("usuario2@example.com", "Hola", "Hola")
+        return deferred.value
+
+    deferred = asyncio.run(run())
+
+    assert limited.sender.sent == ["usuario0@example.com"]
+    assert backup.sender.sent == ["usuario1@example.com"]
+    assert deferred.retry_after == pytest.approx(1, abs=0.05)
+    assert (limited.limits.sent, limited.limits.deferred) == (1, 2)
+
+
+def test_scheduler_reports_the_queue_of_each_relay():
+    relays = [
+        Relay(name, FakeRelaySender(), weight=weight, limits=LimitState(RateLimit(rate=0, burst=1, max_concurrency=5)))
+        for name, weight in (("a", 1), ("b", 0))
+    ]
+    scheduler = DeliveryScheduler(
+        MultiRelaySender(relays),
+        default_limits=RateLimit(rate=0, burst=1, max_concurrency=0),
+        relay_limits=RateLimit(rate=0, burst=1, max_concurrency=5),
+        relays={relay.name: relay.limits for relay in relays}
+    )
+
+    asyncio.run(scheduler.send("usuario@example.com", "Hola", "Hola"))
+    scheduler.set_relay_limits(RateLimit(rate=2, burst=4, max_concurrency=1))
+
+    queues = scheduler.queue_depths()["relay"]
+    assert set(queues) == {"a", "b"}
+    assert (queues["a"]["sent"], queues["b"]["sent"]) == (1, 0)
+    assert all(queue["limits"]["max_concurrency"] == 1 for queue in queues.values())
@@ -0,0 +1,91 @@
+"""
+RetentionJob: archiva y borra los emails antiguos junto con los contenidos,
+adjuntos y claves de idempotencia que dejan de usarse
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from config.database.connection import engine
+from interfaces.email_interfaces import IdempotencyRecord
+from models.email_model import Email, EmailAttachment, EmailContent, EmailStatus, IdempotencyKey
+from repositories.email_repository import EmailRepository
+from schemas.email_schema import EmailCreate
+from services.retention_job import RetentionJob
+from utils.attachment_store import AttachmentStore
+from utils.content_store import content_hash
+from utils.email_archive import EmailArchive
+
+
+async def chunks(data: bytes):
+    yield data
+
+
+def create_email(db, store: AttachmentStore, body: str, attachment: bytes = None, idempotency: IdempotencyRecord = None) -> int:
+    async def create():
+        attachments = []
+        if attachment is not None:
+            attachments = await store.save_many([("factura.pdf", "application/pdf", chunks(attachment))])
+        email = EmailCreate(recipient="usuario@example.com", subject="Factura", body=body, html_body=f"<p>{body}</p>")
+        return (await EmailRepository(db).create(email, idempotency, attachments)).id
+
+    return asyncio.run(create())
+
+
+def age(db, email_id: int, days: int, status: EmailStatus = EmailStatus.SENT) -> None:
+    db.execute(
+        update(Email)
+        .where(Email.id == email_id)
+        .values(created_at=datetime.utcnow() - timedelta(days=days), status=status, next_attempt_at=None)
+    )
+    db.commit()
+
+
+def age_files(directory: str) -> None:
+    """Saca a los archivos de adjuntos del período de gracia de sweep"""
+    old = time.time() - 2 * 3600
+    for root, _, names in os.walk(directory):
+        for name in names:
+            os.utime(os.path.join(root, name), (old, old))
+
+
+def test_archives_old_emails_and_deletes_what_they_no_longer_use(db, tmp_path):
+    store = AttachmentStore(str(tmp_path / "attachments"))
+    archive = EmailArchive(str(tmp_path / "archive"))
+    expired_key = IdempotencyRecord(key="pedido-1", request_hash="x", expires_at=datetime.utcnow() - timedelta(days=1))
+
+    old = create_email(db, store, "solo del viejo", attachment=b"viejo", idempotency=expired_key)
+    old_shared = create_email(db, store, "compartido", attachment=b"compartido")
+    old_pending = create_email(db, store, "pendiente")
+    recent = create_email(db, store, "compartido", attachment=b"compartido")
+    age(db, old, days=400)
+    age(db, old_shared, days=400)
+    age(db, old_pending, days=400, status=EmailStatus.PENDING)
+    age_files(store.directory)
+
+    job = RetentionJob(engine, archive, batch_size=1, attachment_store=store)
+    report = job.run(datetime.utcnow() - timedelta(days=180))
+
+    assert report["archived"] == 2
+    assert report["keys_deleted"] == 1
+    assert report["attachments_deleted"] == 1
+
+    db.expire_all()
+    assert sorted(db.scalars(select(Email.id))) == [old_pending, recent]
+    assert set(db.scalars(select(EmailAttachment.email_id))) == {recent}
+    assert db.scalar(select(IdempotencyKey.key)) is None
+
+    contents = set(db.scalars(select(EmailContent.hash)))
+    assert content_hash("solo del viejo") not in contents
+    assert content_hash("<p>solo del viejo</p>") not in contents
+    assert content_hash("compartido") in contents
+
+    attachment_files = [name for _, _, names in os.walk(store.directory) for name in names]
+    assert attachment_files == [db.scalar(select(EmailAttachment.hash))]
+
+    archived = archive.get(old)
+    assert archived["status"] == EmailStatus.SENT.value
+    assert archived["body"] == "solo del viejo"
+    assert archive.get(recent) is None
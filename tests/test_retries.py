@@ -0,0 +1,131 @@
+"""
+Reintentos de envíos fallidos: backoff de RetryPolicy, clasificación de
+errores SMTP y el paso a DEAD cuando se agotan los intentos
+"""
+
+import asyncio
+import smtplib
+import pytest
+from datetime import datetime, timedelta
+from config.database.connection import SessionLocal
+from interfaces.email_interfaces import EmailDeliveryError
+from models.email_model import Email, EmailStatus
+from repositories.email_repository import EmailRepository
+from schemas.email_schema import EmailCreate
+from services.email_services import EmailService
+from utils.async_smtp_client import SMTPResponseError
+from utils.retry_policy import RetryPolicy
+from utils.smtp_email_sender import MockEmailSender
+from utils.smtp_errors import classify_smtp_error
+
+
+class FailingSender(MockEmailSender):
+    """Sender cuyo relay rechaza todos los envíos con `error`"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    async def send(self, *args, **kwargs) -> bool:
+        raise classify_smtp_error(self.error)
+
+
+def test_backoff_doubles_between_half_and_full_delay_up_to_the_cap():
+    policy = RetryPolicy(max_attempts=10, base_delay=30, max_delay=200)
+
+    for _ in range(200):
+        assert 15 <= policy.next_delay(1) <= 30
+        assert 30 <= policy.next_delay(2) <= 60
+        assert 60 <= policy.next_delay(3) <= 120
+        assert 100 <= policy.next_delay(5) <= 200
+        assert 100 <= policy.next_delay(9) <= 200
+
+
+def test_backoff_gives_up_after_max_attempts():
+    policy = RetryPolicy(max_attempts=3)
+
+    assert policy.next_delay(2) is not None
+    assert policy.next_delay(3) is None
+    assert policy.next_delay(4) is None
+
+
+@pytest.mark.parametrize("error, permanent", [
+    (smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"No such user")}), True),
+    (smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"Mailbox busy")}), False),
+    (smtplib.SMTPSenderRefused(553, b"Sender rejected", "app@example.com"), True),
+    (smtplib.SMTPDataError(554, b"Spam"), True),
+    (smtplib.SMTPDataError(451, b"Try later"), False),
+    (smtplib.SMTPResponseException(554, b"TLS not available"), False),
+    (smtplib.SMTPAuthenticationError(535, b"Bad credentials"), False),
+    (smtplib.SMTPServerDisconnected("Connection lost"), False),
+    (ConnectionRefusedError("Connection refused"), False),
+    (SMTPResponseError(550, "No such user", "RCPT TO"), True),
+    (SMTPResponseError(554, "Spam", "DATA END"), True),
+    (SMTPResponseError(421, "Busy", "MAIL FROM"), False),
+    (SMTPResponseError(554, "TLS not available", "STARTTLS"), False),
+])
+def test_only_5xx_rejections_of_the_message_are_permanent(error, permanent):
+    classified = classify_smtp_error(error)
+
+    assert isinstance(classified, EmailDeliveryError)
+    assert classified.permanent is permanent
+
+
+def test_same_failure_is_classified_alike_by_both_transports():
+    sync_error = classify_smtp_error(smtplib.SMTPResponseException(530, b"Must issue STARTTLS"))
+    async_error = classify_smtp_error(SMTPResponseError(530, "Must issue STARTTLS", "STARTTLS"))
+
+    assert (sync_error.permanent, sync_error.code) == (async_error.permanent, async_error.code) == (False, 530)
+
+
+def send(db, error: Exception, policy: RetryPolicy) -> Email:
+    service = EmailService(EmailRepository(db), FailingSender(error), retry_policy=policy)
+    email = EmailCreate(recipient="usuario@example.com", subject="Bienvenido", body="Hola")
+    response = asyncio.run(service.send_email(email))
+    db.expire_all()
+    return db.get(Email, response.id)
+
+
+def retry_due(email_id: int, error: Exception, policy: RetryPolicy) -> None:
+    """El worker de reintentos toma el email (como si su next_attempt_at ya hubiera llegado) y lo envía"""
+    session = SessionLocal()
+    try:
+        session.query(Email).filter(Email.id == email_id).update({Email.next_attempt_at: datetime.utcnow()})
+        session.commit()
+        service = EmailService(EmailRepository(session), FailingSender(error), retry_policy=policy)
+        claimed = asyncio.run(service.claim_pending_emails(10, lease_seconds=300, retries_only=True))
+        assert [email.id for email in claimed] == [email_id]
+        asyncio.run(service.deliver(claimed[0]))
+    finally:
+        session.close()
+
+
+def test_permanent_failure_is_not_retried(db):
+    email = send(db, smtplib.SMTPRecipientsRefused({"usuario@example.com": (550, b"No such user")}), RetryPolicy())
+
+    assert email.status == EmailStatus.FAILED
+    assert email.next_attempt_at is None
+    assert email.attempts == 1
+
+
+def test_transient_failure_is_retried_until_it_goes_dead(db):
+    error = smtplib.SMTPDataError(451, b"Try later")
+    policy = RetryPolicy(max_attempts=3, base_delay=30)
+
+    email = send(db, error, policy)
+    assert email.status == EmailStatus.FAILED
+    assert email.attempts == 1
+    assert datetime.utcnow() + timedelta(seconds=14) <= email.next_attempt_at <= datetime.utcnow() + timedelta(seconds=31)
+
+    retry_due(email.id, error, policy)
+    db.expire_all()
+    email = db.get(Email, email.id)
+    assert email.status == EmailStatus.FAILED
+    assert email.attempts == 2
+
+    retry_due(email.id, error, policy)
+    db.expire_all()
+    email = db.get(Email, email.id)
+    assert email.status == EmailStatus.DEAD
+    assert email.attempts == 3
+    assert email.next_attempt_at is None
+    assert "gave up after 3 attempts" in email.error_message
@@ -0,0 +1,119 @@
+"""
+ScheduledSendDispatcher: despierta al outbox cuando vence cada send_at,
+tanto los cargados de la base como los que se programan después
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from config.database.connection import SessionLocal
+from repositories.email_repository import EmailRepository
+from schemas.email_schema import EmailCreate
+from services.email_services import EmailService
+from services.scheduled_dispatcher import ScheduledSendDispatcher
+from utils.smtp_email_sender import MockEmailSender
+
+
+class FakeWorker:
+    """Outbox que solo registra cuándo lo despertaron"""
+
+    poll_interval = 0.05
+
+    def __init__(self):
+        self.notified = []
+
+    def notify(self) -> None:
+        self.notified.append(datetime.utcnow())
+
+
+@asynccontextmanager
+async def service_scope():
+    session = SessionLocal()
+    try:
+        yield EmailService(EmailRepository(session), MockEmailSender())
+    finally:
+        session.close()
+
+
+def schedule_email(db, send_at: datetime) -> None:
+    email = EmailCreate(recipient="usuario@example.com", subject="Recordatorio", body="Hola", send_at=send_at)
+    asyncio.run(EmailRepository(db).create(email))
+
+
+def test_notifies_the_worker_when_a_stored_send_at_is_due(db):
+    send_at = datetime.utcnow() + timedelta(seconds=0.3)
+    schedule_email(db, send_at)
+    worker = FakeWorker()
+
+    async def run():
+        dispatcher = ScheduledSendDispatcher(service_scope, worker, window=60)
+        await dispatcher.start()
+        await asyncio.sleep(0.1)
+        notified_early = list(worker.notified)
+        await asyncio.sleep(0.5)
+        await dispatcher.stop()
+        return notified_early
+
+    assert asyncio.run(run()) == []
+    assert len(worker.notified) == 1
+    assert send_at <= worker.notified[0] < send_at + timedelta(seconds=0.2)
+
+
+def test_notifies_the_worker_for_a_send_at_scheduled_inside_the_window(db):
+    worker = FakeWorker()
+
+    async def run():
+        dispatcher = ScheduledSendDispatcher(service_scope, worker, window=60)
+        await dispatcher.start()
+        await asyncio.sleep(0.05)
+        send_at = datetime.utcnow() + timedelta(seconds=0.2)
+        dispatcher.schedule(send_at)
+        # El mismo momento dos veces es un solo timer
+        dispatcher.schedule(send_at)
+        await asyncio.sleep(0.4)
+        await dispatcher.stop()
+        return send_at
+
+    send_at = asyncio.run(run())
+
+    assert len(worker.notified) == 1
+    assert worker.notified[0] >= send_at
+
+
+def test_send_at_scheduled_while_the_window_is_loading_is_not_lost(db):
+    worker = FakeWorker()
+    loading = asyncio.Event()
+    release = asyncio.Event()
+
+    class SlowService:
+        """La consulta de la ventana termina después de que se programa el email"""
+
+        def __init__(self, service: EmailService):
+            self.service = service
+
+        async def get_send_times(self, after, until, limit):
+            send_times = await self.service.get_send_times(after, until, limit)
+            loading.set()
+            await release.wait()
+            return send_times
+
+    @asynccontextmanager
+    async def slow_service_scope():
+        async with service_scope() as service:
+            yield SlowService(service)
+
+    async def run():
+        dispatcher = ScheduledSendDispatcher(slow_service_scope, worker, window=60)
+        await dispatcher.start()
+        await loading.wait()
+        send_at = datetime.utcnow() + timedelta(seconds=0.2)
+        dispatcher.schedule(send_at)
+        release.set()
+        await asyncio.sleep(0.4)
+        await dispatcher.stop()
+        return send_at
+
+    send_at = asyncio.run(run())
+
+    assert len(worker.notified) == 1
+    assert worker.notified[0] >= send_at
@@ -0,0 +1,85 @@
+"""
+Write-behind de estados (StatusWriteBuffer): las lecturas ven el resultado
+antes de escribirse, al detenerse se escribe todo y un resultado perdido
+se recupera con la reserva del email
+"""
+
+import asyncio
+from config.database.connection import SessionLocal
+from dependencies import repository_scope
+from models.email_model import Email, EmailStatus
+from repositories.email_repository import EmailRepository
+from schemas.email_schema import EmailCreate
+from services.email_services import EmailService
+from utils.smtp_email_sender import MockEmailSender
+from utils.status_buffer import StatusWriteBuffer
+
+
+def email(index: int = 0) -> EmailCreate:
+    return EmailCreate(recipient=f"usuario{index}@example.com", subject="Bienvenido", body="Hola")
+
+
+async def send(buffer: StatusWriteBuffer, index: int = 0):
+    """Envía un email con su propio EmailService y sesión, como una petición"""
+    session = SessionLocal()
+    try:
+        service = EmailService(EmailRepository(session), MockEmailSender(), status_buffer=buffer)
+        return await service.send_email(email(index))
+    finally:
+        session.close()
+
+
+def stored(db, email_id: int) -> Email:
+    db.expire_all()
+    return db.get(Email, email_id)
+
+
+def test_reads_see_buffered_statuses_and_stop_writes_them(db):
+    async def run():
+        buffer = StatusWriteBuffer(repository_scope, flush_interval=60)
+        await buffer.start()
+        responses = [await send(buffer, index) for index in range(3)]
+        before_flush = [stored(db, response.id).status for response in responses]
+        reader = EmailService(EmailRepository(db), MockEmailSender(), status_buffer=buffer)
+        buffered = await reader.get_email_entry(responses[0].id)
+
+        await buffer.stop()
+        written = await reader.get_email_entry(responses[0].id)
+        return responses, before_flush, buffered, written
+
+    responses, before_flush, buffered, written = asyncio.run(run())
+
+    assert before_flush == [EmailStatus.PENDING] * 3
+    assert buffered.response.status == EmailStatus.SENT
+    assert buffered.response.sent_at == responses[0].sent_at
+    # El ETag no cambia cuando el estado pasa del buffer a la base
+    assert written.etag == buffered.etag
+    for response in responses:
+        row = stored(db, response.id)
+        assert row.status == EmailStatus.SENT
+        assert row.attempts == 1
+        assert row.claimed_at is None
+        assert row.sent_at == response.sent_at
+
+
+def test_status_lost_in_a_crash_is_retried_after_the_lease(db):
+    async def run():
+        buffer = StatusWriteBuffer(repository_scope, flush_interval=60)
+        await buffer.start()
+        response = await send(buffer)
+
+        # El proceso muere: el flusher no llega a escribir el resultado
+        buffer._task.cancel()
+        await asyncio.gather(buffer._task, return_exceptions=True)
+
+        await asyncio.sleep(0.01)
+        retry_service = EmailService(EmailRepository(db), MockEmailSender())
+        within_lease = await retry_service.claim_pending_emails(10, lease_seconds=300, retries_only=True)
+        after_lease = await retry_service.claim_pending_emails(10, lease_seconds=0, retries_only=True)
+        return response, within_lease, after_lease
+
+    response, within_lease, after_lease = asyncio.run(run())
+
+    assert response.status == EmailStatus.SENT
+    assert within_lease == []
+    assert [claimed.id for claimed in after_lease] == [response.id]
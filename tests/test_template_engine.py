@@ -0,0 +1,22 @@
+"""
+Mail-merge en procesos de render: una recarga de plantillas (SIGHUP) en
+medio de un lote no lo interrumpe
+"""
+
+from utils.template_engine import Jinja2TemplateEngine
+
+
+def test_clear_cache_during_a_parallel_merge_finishes_the_batch(tmp_path):
+    (tmp_path / "saludo.html").write_text("Hola {{ nombre }}")
+    engine = Jinja2TemplateEngine(str(tmp_path), render_workers=2, parallel_threshold=10, chunk_size=5)
+
+    try:
+        results = engine.render_many("saludo.html", ({"nombre": index} for index in range(100)))
+        first = next(results)
+        engine.clear_cache()
+        rendered = [first] + list(results)
+    finally:
+        engine.close()
+
+    assert [result.html for result in rendered] == [f"Hola {index}" for index in range(100)]
+    assert all(result.error is None for result in rendered)
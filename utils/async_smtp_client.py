@@ -0,0 +1,251 @@
+import asyncio
+import base64
+import re
+import ssl
+from typing import AsyncIterable, Dict, List, Optional, Tuple
+
+
+class SMTPResponseError(Exception):
+    """El servidor SMTP respondió con un código inesperado"""
+
+    def __init__(self, code: int, message: str, command: str = ""):
+        self.code = code
+        self.message = message
+        self.command = command
+        super().__init__(f"{command} -> {code} {message}".strip(" ->"))
+
+
+class AsyncSMTPClient:
+    """
+    Cliente SMTP asíncrono sobre asyncio streams
+    (Single Responsibility: solo habla el protocolo SMTP)
+
+    Soporta SSL implícito, STARTTLS, AUTH PLAIN/LOGIN y la extensión
+    PIPELINING (MAIL FROM, RCPT TO y DATA en un solo viaje de red).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        use_ssl: bool = False,
+        timeout: float = 30.0,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        local_hostname: str = "localhost"
+    ):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._ssl_context = ssl_context
+        self.local_hostname = local_hostname
+
+        self.extensions: Dict[str, str] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        # Cargar los certificados del sistema es costoso: solo si se usa TLS
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    @property
+    def supports_pipelining(self) -> bool:
+        return "pipelining" in self.extensions
+
+    async def connect(self) -> None:
+        """Abre la conexión y lee el saludo del servidor"""
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=self.ssl_context if self.use_ssl else None,
+                server_hostname=self.host if self.use_ssl else None
+            ),
+            timeout=self.timeout
+        )
+        await self._expect("CONNECT", 220)
+
+    async def ehlo(self) -> None:
+        """Envía EHLO y guarda las extensiones anunciadas por el servidor"""
+        await self._write(f"EHLO {self.local_hostname}\r\n")
+        _, lines = await self._expect_lines("EHLO", 250)
+
+        self.extensions = {}
+        for line in lines[1:]:
+            name, _, params = line.partition(" ")
+            self.extensions[name.lower()] = params
+
+    async def starttls(self) -> None:
+        """Actualiza la conexión a TLS (hay que repetir EHLO después)"""
+        if "starttls" not in self.extensions:
+            raise SMTPResponseError(0, "STARTTLS not supported by server", "STARTTLS")
+
+        await self._write("STARTTLS\r\n")
+        await self._expect("STARTTLS", 220)
+        await self._writer.start_tls(self.ssl_context, server_hostname=self.host)
+
+    async def login(self, user: str, password: str) -> None:
+        """Autentica con AUTH PLAIN o, si no está disponible, AUTH LOGIN"""
+        mechanisms = self.extensions.get("auth", "").upper().split()
+
+        if "PLAIN" in mechanisms or not mechanisms:
+            token = base64.b64encode(f"\0{user}\0{password}".encode("utf-8")).decode("ascii")
+            await self._write(f"AUTH PLAIN {token}\r\n")
+            await self._expect("AUTH", 235)
+        elif "LOGIN" in mechanisms:
+            await self._write("AUTH LOGIN\r\n")
+            await self._expect("AUTH", 334)
+            await self._write(base64.b64encode(user.encode("utf-8")).decode("ascii") + "\r\n")
+            await self._expect("AUTH", 334)
+            await self._write(base64.b64encode(password.encode("utf-8")).decode("ascii") + "\r\n")
+            await self._expect("AUTH", 235)
+        else:
+            raise SMTPResponseError(0, f"No supported AUTH mechanism in {mechanisms}", "AUTH")
+
+    async def send_message(self, sender: str, recipients: List[str], data: bytes) -> None:
+        """Envía un mensaje ya serializado (RFC 5322)"""
+        await self._begin_data(sender, recipients)
+        await self.send_data(data)
+
+    async def send_message_stream(self, sender: str, recipients: List[str], chunks: AsyncIterable[bytes]) -> None:
+        """
+        Envía un mensaje que se genera mientras se escribe
+
+        Las partes tienen que venir con líneas CRLF y dot-stuffing, y la
+        última terminar en CRLF (como las de StreamingMessage). Cada parte
+        espera a que el socket la acepte antes de pedir la siguiente.
+        """
+        await self._begin_data(sender, recipients)
+        async for chunk in chunks:
+            self._writer.write(chunk)
+            await self._writer.drain()
+        self._writer.write(b".\r\n")
+        await self._writer.drain()
+        await self._expect("DATA END", 250)
+
+    async def _begin_data(self, sender: str, recipients: List[str]) -> None:
+        """
+        Envía el sobre (MAIL FROM, RCPT TO) y DATA
+
+        Con PIPELINING los comandos del sobre y DATA se escriben juntos y las
+        respuestas se leen después, ahorrando un viaje de red por comando.
+        """
+        envelope = [f"MAIL FROM:<{sender}>\r\n"] + [f"RCPT TO:<{r}>\r\n" for r in recipients]
+
+        if self.supports_pipelining:
+            await self._write("".join(envelope) + "DATA\r\n")
+            replies = [await self._read_reply() for _ in range(len(envelope) + 1)]
+        else:
+            replies = []
+            for command in envelope:
+                await self._write(command)
+                replies.append(await self._read_reply())
+                if replies[0][0] != 250:
+                    break
+            if replies[0][0] == 250 and any(code in (250, 251) for code, _ in replies[1:]):
+                await self._write("DATA\r\n")
+                replies.append(await self._read_reply())
+
+        mail_reply = replies[0]
+        rcpt_replies = replies[1:len(envelope)]
+        data_reply = replies[len(envelope)] if len(replies) > len(envelope) else None
+
+        if data_reply is not None and data_reply[0] == 354 and (
+            mail_reply[0] != 250 or not any(code in (250, 251) for code, _ in rcpt_replies)
+        ):
+            # El servidor aceptó DATA aunque el sobre falló: cerrar el mensaje vacío
+            await self._write(".\r\n")
+            await self._read_reply()
+
+        if mail_reply[0] != 250:
+            raise SMTPResponseError(*mail_reply, "MAIL FROM")
+        for code, message in rcpt_replies:
+            if code not in (250, 251):
+                raise SMTPResponseError(code, message, "RCPT TO")
+        if data_reply is None or data_reply[0] != 354:
+            raise SMTPResponseError(*(data_reply or (0, "DATA not sent")), "DATA")
+
+    async def send_data(self, data: bytes) -> None:
+        """Escribe el contenido del mensaje (con dot-stuffing) y lo termina con '.'"""
+        terminator = b".\r\n" if data.endswith(b"\r\n") else b"\r\n.\r\n"
+        self._writer.write(dot_stuff(data) + terminator)
+        await self._writer.drain()
+        await self._expect("DATA END", 250)
+
+    async def noop(self) -> int:
+        await self._write("NOOP\r\n")
+        code, _ = await self._read_reply()
+        return code
+
+    async def rset(self) -> None:
+        await self._write("RSET\r\n")
+        await self._expect("RSET", 250)
+
+    async def quit(self) -> None:
+        """Envía QUIT y cierra la conexión ignorando errores"""
+        try:
+            await self._write("QUIT\r\n")
+            await self._read_reply()
+        except Exception:
+            pass
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+            self._writer = None
+            self._reader = None
+
+    async def _write(self, command: str) -> None:
+        if self._writer is None:
+            raise ConnectionError("SMTP connection is closed")
+        self._writer.write(command.encode("utf-8"))
+        await self._writer.drain()
+
+    async def _read_reply(self) -> Tuple[int, str]:
+        code, lines = await self._read_reply_lines()
+        return code, "\n".join(lines)
+
+    async def _read_reply_lines(self) -> Tuple[int, List[str]]:
+        """Lee una respuesta (posiblemente multilínea: '250-...' hasta '250 ...')"""
+        if self._reader is None:
+            raise ConnectionError("SMTP connection is closed")
+
+        lines = []
+        while True:
+            raw = await asyncio.wait_for(self._reader.readline(), timeout=self.timeout)
+            if not raw:
+                raise ConnectionError("SMTP server closed the connection")
+
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            code = int(line[:3])
+            lines.append(line[4:])
+
+            if line[3:4] != "-":
+                return code, lines
+
+    async def _expect(self, command: str, expected: int) -> str:
+        _, lines = await self._expect_lines(command, expected)
+        return "\n".join(lines)
+
+    async def _expect_lines(self, command: str, expected: int) -> Tuple[int, List[str]]:
+        code, lines = await self._read_reply_lines()
+        if code != expected:
+            raise SMTPResponseError(code, "\n".join(lines), command)
+        return code, lines
+
+
+_LEADING_DOT = re.compile(rb"(?m)^\.")
+
+
+def dot_stuff(data: bytes) -> bytes:
+    """Duplica los puntos al inicio de línea (RFC 5321, sección 4.5.2)"""
+    return _LEADING_DOT.sub(b"..", data)
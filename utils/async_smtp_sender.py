@@ -0,0 +1,201 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence, Union
+from dotenv import load_dotenv
+from interfaces.email_interfaces import Attachment, IEmailSender
+from utils.async_smtp_client import AsyncSMTPClient
+from utils.mime_stream import StreamingMessage
+from utils.smtp_email_sender import build_message
+from utils.smtp_pool import AsyncSMTPConnectionPool
+from utils.smtp_errors import classify_smtp_error
+from utils.metrics import SMTP_PHASE_SECONDS, SMTP_SENDS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Mismas series que SMTPEmailSender (la fase 'queue' no aplica: no hay executor)
+_CONNECT_SECONDS = SMTP_PHASE_SECONDS.labels("connect")
+_LOGIN_SECONDS = SMTP_PHASE_SECONDS.labels("login")
+_SEND_SECONDS = SMTP_PHASE_SECONDS.labels("send")
+_SENDS_SUCCESS = SMTP_SENDS.labels("success")
+
+
+class AsyncSMTPEmailSender(IEmailSender):
+    """
+    Implementación de envío de emails con un cliente SMTP asíncrono
+    (Liskov Substitution: reemplaza a SMTPEmailSender sin bloquear el event loop)
+
+    Todas las esperas de red ceden el control al event loop, por lo que cientos
+    de envíos concurrentes pueden compartir un mismo worker de uvicorn.
+
+    Los adjuntos grandes se leen y codifican en base64 en un pool chico de
+    hilos (SMTP_ENCODE_WORKERS), de a una parte por vez mientras se escriben.
+    """
+
+    def __init__(
+        self,
+        smtp_host: str = None,
+        smtp_port: int = None,
+        smtp_user: str = None,
+        smtp_password: str = None,
+        use_tls: bool = True,
+        use_ssl: bool = False,
+        timeout: float = 30.0,
+        pool_size: int = None,
+        pool_idle_timeout: float = None,
+        pool_max_messages: int = None,
+        pool_health_check_interval: float = None,
+        encode_workers: int = None
+    ):
+        self.smtp_host = smtp_host or os.getenv("SMTP_HOST", "smtp.gmail.com")
+        self.smtp_port = smtp_port or int(os.getenv("SMTP_PORT", "587"))
+        self.smtp_user = smtp_user or os.getenv("SMTP_USER")
+        self.smtp_password = smtp_password or os.getenv("SMTP_PASSWORD")
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._ssl_context = None
+
+        if pool_size is None:
+            pool_size = int(os.getenv("SMTP_POOL_SIZE", "5"))
+
+        if pool_idle_timeout is None:
+            pool_idle_timeout = float(os.getenv("SMTP_POOL_IDLE_TIMEOUT", "60"))
+        if pool_max_messages is None:
+            pool_max_messages = int(os.getenv("SMTP_POOL_MAX_MESSAGES", "100"))
+        if pool_health_check_interval is None:
+            pool_health_check_interval = float(os.getenv("SMTP_POOL_HEALTH_CHECK", "5"))
+
+        # pool_size = 0 desactiva el pool (una conexión por mensaje)
+        self.pool = None
+        if pool_size > 0:
+            self.pool = AsyncSMTPConnectionPool(
+                self._connect,
+                size=pool_size,
+                idle_timeout=pool_idle_timeout,
+                max_messages=pool_max_messages,
+                health_check_interval=pool_health_check_interval
+            )
+
+        if encode_workers is None:
+            encode_workers = int(os.getenv("SMTP_ENCODE_WORKERS", "2"))
+        self.encoder = ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix="smtp-encode")
+
+    async def send(
+        self,
+        recipient: str,
+        subject: str,
+        body: str,
+        html_body: Optional[str] = None,
+        attachments: Sequence[Attachment] = ()
+    ) -> bool:
+        """
+        Envía un email usando SMTP asíncrono
+
+        Args:
+            attachments: Adjuntos (se leen del disco durante el envío)
+
+        Returns:
+            bool: True si se envió correctamente
+
+        Raises:
+            EmailDeliveryError: Si el envío falló (permanente si el servidor respondió 5xx)
+        """
+        try:
+            if attachments:
+                data = StreamingMessage(self.smtp_user, recipient, subject, body, html_body, attachments)
+            else:
+                message = build_message(self.smtp_user, recipient, subject, body, html_body)
+                # Misma serialización que smtplib.send_message (compat32 con CRLF)
+                data = message.as_bytes(policy=message.policy.clone(linesep="\r\n"))
+            sender = self.smtp_user or ""
+
+            if self.pool is None:
+                client = await self._connect()
+                try:
+                    with _SEND_SECONDS.time():
+                        await self._transmit(client, sender, recipient, data)
+                finally:
+                    await client.quit()
+            else:
+                await self._send_pooled(sender, recipient, data)
+
+            _SENDS_SUCCESS.inc()
+            logger.info("Email enviado", extra={"recipient": recipient, "sampled": True})
+            return True
+
+        except Exception as e:
+            error = classify_smtp_error(e)
+            SMTP_SENDS.labels("permanent" if error.permanent else "transient").inc()
+            logger.warning(
+                "Error al enviar email",
+                extra={"recipient": recipient, "error": str(e), "permanent": error.permanent}
+            )
+            raise error from e
+
+    async def close(self) -> None:
+        """Cierra las conexiones abiertas del pool"""
+        if self.pool is not None:
+            await self.pool.close()
+        self.encoder.shutdown(wait=False)
+
+    async def _send_pooled(self, sender: str, recipient: str, data: Union[bytes, StreamingMessage]) -> None:
+        """
+        Envía por una conexión del pool. Si el servidor cerró la conexión
+        reutilizada, reintenta una vez con una conexión nueva.
+        """
+        try:
+            async with self.pool.connection() as client:
+                with _SEND_SECONDS.time():
+                    await self._transmit(client, sender, recipient, data)
+        except ConnectionError:
+            async with self.pool.connection(fresh=True) as client:
+                with _SEND_SECONDS.time():
+                    await self._transmit(client, sender, recipient, data)
+
+    async def _transmit(
+        self,
+        client: AsyncSMTPClient,
+        sender: str,
+        recipient: str,
+        data: Union[bytes, StreamingMessage]
+    ) -> None:
+        if isinstance(data, StreamingMessage):
+            # Un recorrido nuevo en cada intento: el anterior pudo quedar a medias
+            await client.send_message_stream(sender, [recipient], data.achunks(self.encoder))
+        else:
+            await client.send_message(sender, [recipient], data)
+
+    async def _connect(self) -> AsyncSMTPClient:
+        """Abre una conexión SMTP autenticada"""
+        client = AsyncSMTPClient(
+            self.smtp_host,
+            self.smtp_port,
+            use_ssl=self.use_ssl,
+            timeout=self.timeout,
+            ssl_context=self._ssl_context
+        )
+
+        try:
+            with _CONNECT_SECONDS.time():
+                await client.connect()
+                await client.ehlo()
+
+                if self.use_tls and not self.use_ssl:
+                    await client.starttls()
+                    await client.ehlo()
+
+            if self.smtp_user:
+                with _LOGIN_SECONDS.time():
+                    await client.login(self.smtp_user, self.smtp_password)
+
+            # Reutilizar el contexto SSL (y sus certificados) en las próximas conexiones
+            if self.use_ssl or self.use_tls:
+                self._ssl_context = client.ssl_context
+        except BaseException:
+            await client.close()
+            raise
+
+        return client
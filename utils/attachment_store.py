@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterable, Callable, Iterable, List, Sequence, Set, Tuple
+from sqlalchemy import select
+from models.email_model import EmailAttachment
+from interfaces.email_interfaces import Attachment, AttachmentTooLarge
+
+# Un tipo MIME simple ("tipo/subtipo"): lo demás (parámetros, saltos de línea) se descarta
+_CONTENT_TYPE = re.compile(r"^[\w.+-]+/[\w.+-]+$")
+
+# Prefijo de los archivos que se están subiendo (todavía sin hash)
+_UPLOAD_PREFIX = ".upload-"
+
+
+def _safe_filename(filename: str) -> str:
+    """Nombre del adjunto sin directorios ni caracteres de control"""
+    name = os.path.basename((filename or "").replace("\\", "/"))
+    name = "".join(ch for ch in name if ch.isprintable())
+    return name[:255] or "attachment"
+
+
+def _content_type(content_type: str, filename: str) -> str:
+    if content_type and _CONTENT_TYPE.match(content_type):
+        return content_type.lower()
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def _write_chunk(file, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    file.write(chunk)
+
+
+class AttachmentStore:
+    """
+    Archivos adjuntos en disco, direccionados por contenido
+    (Single Responsibility: guarda, ubica y limpia los archivos de los adjuntos)
+
+    Cada archivo se guarda una sola vez con su SHA-256 como nombre (en
+    subdirectorios por los dos primeros caracteres), aunque se adjunte a
+    muchos emails. La subida se escribe de a partes en un archivo temporal
+    del mismo directorio y se renombra al terminar, así que nunca hay un
+    archivo a medias con nombre de hash.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 25 * 1024 * 1024):
+        """
+        Args:
+            directory: Directorio de los archivos (ATTACHMENTS_DIR)
+            max_bytes: Tamaño máximo de todos los adjuntos de un email
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    async def save_many(self, files: Iterable[Tuple[str, str, AsyncIterable[bytes]]]) -> List[Attachment]:
+        """
+        Guarda los adjuntos de un email
+
+        Args:
+            files: (nombre, tipo MIME, contenido por partes) de cada adjunto
+
+        Raises:
+            AttachmentTooLarge: Si entre todos superan `max_bytes`
+        """
+        attachments = []
+        remaining = self.max_bytes
+        for filename, content_type, chunks in files:
+            attachment = await self.save(filename, content_type, chunks, remaining)
+            remaining -= attachment.size
+            attachments.append(attachment)
+        return attachments
+
+    async def save(
+        self,
+        filename: str,
+        content_type: str,
+        chunks: AsyncIterable[bytes],
+        limit: int
+    ) -> Attachment:
+        """
+        Guarda un adjunto leyendo su contenido por partes (la escritura y el
+        hash corren fuera del event loop)
+
+        Raises:
+            AttachmentTooLarge: Si el contenido supera `limit` bytes
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=_UPLOAD_PREFIX)
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with os.fdopen(fd, "wb") as file:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > limit:
+                        raise AttachmentTooLarge(f"Attachments exceed {self.max_bytes} bytes")
+                    await asyncio.to_thread(_write_chunk, file, digest, chunk)
+                file.flush()
+                # El outbox puede enviarlo mucho después: que sobreviva a un corte
+                await asyncio.to_thread(os.fsync, file.fileno())
+
+            path = self.path(digest.hexdigest())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Si ya existía es el mismo contenido; reemplazarlo renueva su mtime (ver sweep)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        safe_name = _safe_filename(filename)
+        return Attachment(
+            filename=safe_name,
+            content_type=_content_type(content_type, safe_name),
+            size=size,
+            hash=digest.hexdigest()
+        )
+
+    def resolve(self, attachments: Iterable[Attachment]) -> List[Attachment]:
+        """
+        Completa la ruta de cada adjunto
+
+        Raises:
+            FileNotFoundError: Si falta el archivo de alguno
+        """
+        resolved = []
+        for attachment in attachments:
+            path = self.path(attachment.hash)
+            if not os.path.exists(path):
+                raise FileNotFoundError(2, "Attachment file not found", path)
+            resolved.append(attachment._replace(path=path))
+        return resolved
+
+    def sweep(
+        self,
+        referenced: Callable[[List[str]], Set[str]],
+        grace: float = 3600.0,
+        batch_size: int = 1000
+    ) -> int:
+        """
+        Borra los archivos que ya no usa ningún email
+
+        Solo considera archivos sin modificar hace más de `grace` segundos:
+        uno recién subido puede no tener todavía su fila en email_attachments.
+
+        Args:
+            referenced: Recibe hashes y retorna los que siguen en uso
+            grace: Antigüedad mínima (segundos) de un archivo para borrarlo
+            batch_size: Hashes por consulta a `referenced`
+
+        Returns:
+            int: Archivos borrados
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+
+        cutoff = time.time() - grace
+        deleted = 0
+        candidates: List[Tuple[str, str]] = []
+
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+
+                # Subidas interrumpidas
+                if name.startswith(_UPLOAD_PREFIX):
+                    deleted += self._unlink(path)
+                    continue
+
+                candidates.append((name, path))
+                if len(candidates) >= batch_size:
+                    deleted += self._delete_unreferenced(candidates, referenced)
+                    candidates = []
+
+        if candidates:
+            deleted += self._delete_unreferenced(candidates, referenced)
+        return deleted
+
+    def _delete_unreferenced(self, candidates: List[Tuple[str, str]], referenced: Callable[[List[str]], Set[str]]) -> int:
+        in_use = referenced([digest for digest, _ in candidates])
+        return sum(self._unlink(path) for digest, path in candidates if digest not in in_use)
+
+    @staticmethod
+    def _unlink(path: str) -> int:
+        try:
+            os.unlink(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+
+def attachment_rows(email_id: int, attachments: Sequence[Attachment]) -> List[dict]:
+    """Filas de email_attachments de los adjuntos de un email"""
+    now = datetime.utcnow()
+    return [
+        {
+            "email_id": email_id,
+            "filename": attachment.filename,
+            "content_type": attachment.content_type,
+            "size": attachment.size,
+            "hash": attachment.hash,
+            "created_at": now
+        }
+        for attachment in attachments
+    ]
+
+
+def attachments_query(email_ids: List[int]):
+    """SELECT de los adjuntos de varios emails (email_id y los campos de Attachment)"""
+    return (
+        select(
+            EmailAttachment.email_id,
+            EmailAttachment.filename,
+            EmailAttachment.content_type,
+            EmailAttachment.size,
+            EmailAttachment.hash
+        )
+        .where(EmailAttachment.email_id.in_(email_ids))
+        .order_by(EmailAttachment.id)
+    )
+
+
+def attach_attachments(emails: Sequence, rows: Iterable[tuple]) -> None:
+    """Asigna a cada email sus adjuntos (filas de attachments_query), en el orden en que se subieron"""
+    by_email = defaultdict(list)
+    for email_id, *fields in rows:
+        by_email[email_id].append(Attachment(*fields))
+
+    for email in emails:
+        email.attachments = tuple(by_email.get(email.id, ()))
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy.dialects import postgresql, sqlite
+from models.email_model import Email, EmailContent
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 (hex) del texto en UTF-8: la clave de email_contents"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress(text: str, level: int = 6) -> bytes:
+    return zlib.compress(text.encode("utf-8"), level)
+
+
+def decompress(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+class ContentCache:
+    """
+    Cuerpos ya descomprimidos, por hash, en orden de uso (LRU)
+
+    El contenido de un hash nunca cambia, así que no hace falta invalidarlo.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            text = self._entries.get(digest)
+            if text is not None:
+                self._entries.move_to_end(digest)
+            return text
+
+    def put(self, digest: str, text: str) -> None:
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return
+            self._entries[digest] = text
+            self._bytes += len(text)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+CONTENT_CACHE = ContentCache()
+
+
+def content_rows(texts: Iterable[Optional[str]]) -> Tuple[List[Optional[str]], List[dict]]:
+    """
+    Prepara los cuerpos de uno o varios emails para guardarlos
+
+    Los textos también se agregan a CONTENT_CACHE: el envío los va a leer
+    en breve.
+
+    Returns:
+        Tuple: (hash de cada texto en el mismo orden, o None si el texto es
+        None; filas de email_contents sin repetir)
+    """
+    hashes: List[Optional[str]] = []
+    rows: Dict[str, dict] = {}
+
+    for text in texts:
+        if text is None:
+            hashes.append(None)
+            continue
+
+        digest = content_hash(text)
+        hashes.append(digest)
+        if digest not in rows:
+            rows[digest] = {"hash": digest, "data": compress(text), "size": len(text.encode("utf-8"))}
+            CONTENT_CACHE.put(digest, text)
+
+    return hashes, list(rows.values())
+
+
+def insert_contents(dialect_name: str):
+    """
+    INSERT en email_contents que ignora los hashes ya guardados
+
+    Varias transacciones pueden guardar el mismo cuerpo a la vez: ON CONFLICT
+    DO NOTHING evita el error de clave duplicada sin consultar antes.
+    """
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    return dialect.insert(EmailContent).on_conflict_do_nothing(index_elements=["hash"])
+
+
+def cached_contents(hashes: Iterable[Optional[str]]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Busca cuerpos en CONTENT_CACHE
+
+    Returns:
+        Tuple: (cuerpos encontrados por hash, hashes que hay que consultar en email_contents)
+    """
+    found: Dict[str, str] = {}
+    missing: List[str] = []
+
+    for digest in set(hashes):
+        if digest is None:
+            continue
+        text = CONTENT_CACHE.get(digest)
+        if text is None:
+            missing.append(digest)
+        else:
+            found[digest] = text
+
+    return found, missing
+
+
+def decompress_contents(loaded: Iterable[Tuple[str, bytes]]) -> Dict[str, str]:
+    """Descomprime filas (hash, data) de email_contents y las agrega a CONTENT_CACHE"""
+    texts = {}
+    for digest, data in loaded:
+        texts[digest] = decompress(data)
+        CONTENT_CACHE.put(digest, texts[digest])
+    return texts
+
+
+def body_hashes(emails: Iterable) -> List[str]:
+    """Hashes de body y html_body de emails (o de sus proyecciones)"""
+    return [
+        digest
+        for email in emails
+        for digest in (email.body_hash, email.html_body_hash)
+        if digest is not None
+    ]
+
+
+def attach_contents(emails: Sequence[Email], texts: Dict[str, str]) -> None:
+    """Completa body y html_body de `emails` con los cuerpos de `texts` (por hash)"""
+    for email in emails:
+        email.body = texts.get(email.body_hash) if email.body_hash else None
+        email.html_body = texts.get(email.html_body_hash) if email.html_body_hash else None
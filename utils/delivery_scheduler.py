@@ -0,0 +1,366 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, NamedTuple, Optional, Sequence
+from interfaces.email_interfaces import Attachment, IEmailSender, DeliveryDeferred
+
+
+class RateLimit(NamedTuple):
+    """
+    Límites de envío de un dominio o relay
+
+    rate: envíos por segundo (0 = sin límite)
+    burst: envíos que se permiten de golpe antes de aplicar `rate`
+    max_concurrency: envíos simultáneos (0 = sin límite)
+    """
+    rate: float
+    burst: int
+    max_concurrency: int
+
+
+class TokenBucket:
+    """
+    Token bucket: se recargan `rate` tokens por segundo hasta `burst`
+
+    Los tokens pueden quedar en negativo: cada envío reserva el siguiente
+    hueco disponible y espera hasta que llegue su turno.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def configure(self, rate: float, burst: int) -> None:
+        self._refill()
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = min(self.tokens, self.burst)
+
+    def wait_time(self) -> float:
+        """Segundos hasta que haya un token para el próximo envío"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def consume(self) -> None:
+        if self.rate > 0:
+            self.tokens -= 1
+
+    def refund(self) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    def available(self) -> float:
+        """Tokens disponibles ahora (negativo si hay envíos reservados a futuro)"""
+        self._refill()
+        return self.tokens
+
+    def is_full(self) -> bool:
+        return self.rate <= 0 or self.available() >= self.burst
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class ConcurrencyLimit:
+    """
+    Semáforo asyncio cuyo límite se puede cambiar en caliente (0 = sin límite)
+    Los envíos en espera se atienden en orden de llegada.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def locked(self) -> bool:
+        return self.limit > 0 and self.active >= self.limit
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Toma un lugar; retorna False si no hubo lugar antes de `timeout` segundos"""
+        if not self.locked() and not self._waiters:
+            self.active += 1
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # asyncio.wait y no wait_for: en Python 3.11 wait_for se traga la
+            # cancelación si el lugar se asignó en el mismo instante
+            await asyncio.wait((waiter,), timeout=timeout)
+            return waiter.done()
+        except asyncio.CancelledError:
+            # Si el lugar ya había sido asignado, devolverlo
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake()
+
+    def resize(self, limit: int) -> None:
+        self.limit = limit
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and not self.locked():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+
+class LimitState:
+    """Estado de los límites de un dominio o relay"""
+
+    def __init__(self, limits: RateLimit, overridden: bool = False):
+        self.limits = limits
+        self.overridden = overridden
+        self.bucket = TokenBucket(limits.rate, limits.burst)
+        self.slots = ConcurrencyLimit(limits.max_concurrency)
+        self.waiting = 0
+        self.sent = 0
+        self.deferred = 0
+
+    def configure(self, limits: RateLimit) -> None:
+        self.limits = limits
+        self.bucket.configure(limits.rate, limits.burst)
+        self.slots.resize(limits.max_concurrency)
+
+    def is_idle(self) -> bool:
+        return self.waiting == 0 and self.slots.active == 0 and self.bucket.is_full()
+
+    def snapshot(self) -> dict:
+        return {
+            "waiting": self.waiting,
+            "in_flight": self.slots.active,
+            "sent": self.sent,
+            "deferred": self.deferred,
+            "tokens": round(self.bucket.available(), 2) if self.limits.rate > 0 else None,
+            "limits": self.limits._asdict()
+        }
+
+
+def recipient_domain(recipient: str) -> str:
+    return recipient.rsplit("@", 1)[-1].strip().lower()
+
+
+async def acquire_turn(states: Sequence[LimitState], max_wait: float, target: str) -> None:
+    """
+    Espera el turno de un envío en todos los `states` (token y lugar en cada uno)
+
+    Raises:
+        DeliveryDeferred: Si el turno queda a más de `max_wait` segundos; se
+            cuenta como aplazado en el primero de `states`
+    """
+    delay = max(state.bucket.wait_time() for state in states)
+    if delay > max_wait:
+        states[0].deferred += 1
+        raise DeliveryDeferred(delay, f"Rate limit reached for {target}")
+
+    for state in states:
+        state.bucket.consume()
+        state.waiting += 1
+
+    acquired = []
+    try:
+        deadline = time.monotonic() + max_wait
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # Siempre en el mismo orden (dominio, relay) para no bloquearse entre envíos
+        for state in states:
+            if not await state.slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise DeliveryDeferred(max_wait, f"Too many concurrent deliveries to {target}")
+            acquired.append(state)
+    except BaseException as e:
+        for state in acquired:
+            state.slots.release()
+        for state in states:
+            state.bucket.refund()
+        if isinstance(e, DeliveryDeferred):
+            states[0].deferred += 1
+        raise
+    finally:
+        for state in states:
+            state.waiting -= 1
+
+
+def release_turn(states: Sequence[LimitState]) -> None:
+    """Libera los lugares tomados con acquire_turn cuando el envío termina"""
+    for state in states:
+        state.slots.release()
+
+
+class DeliveryScheduler(IEmailSender):
+    """
+    Controla el ritmo de envío delante de otro IEmailSender
+    (Open/Closed: agrega límites sin modificar los senders existentes)
+
+    Cada dominio destinatario y el relay tienen un token bucket (envíos por
+    segundo con ráfagas) y un límite de envíos simultáneos. Un envío espera
+    su turno hasta `max_wait` segundos; si el turno queda más lejos, se lanza
+    DeliveryDeferred para que el email se reintente más tarde en lugar de
+    marcarlo como fallido.
+
+    Con varios relays (`relays`) el sender es quien elige el relay, así que
+    cada relay aplica sus propios límites al recibir el envío: aquí solo se
+    espera el turno del dominio y se informan los de los relays.
+
+    Los límites se pueden cambiar en caliente con set_domain_limits,
+    set_default_limits y set_relay_limits.
+    """
+
+    def __init__(
+        self,
+        sender: IEmailSender,
+        default_limits: RateLimit,
+        relay_limits: RateLimit,
+        domain_limits: Optional[Dict[str, RateLimit]] = None,
+        relay: str = "default",
+        max_wait: float = 5.0,
+        max_domains: int = 10000,
+        relays: Optional[Dict[str, LimitState]] = None
+    ):
+        """
+        Args:
+            sender: Sender que realiza el envío
+            default_limits: Límites de los dominios sin configuración propia
+            relay_limits: Límites de cada relay (todos los dominios juntos)
+            domain_limits: Límites por dominio (ej: {"gmail.com": RateLimit(5, 10, 3)})
+            relay: Nombre del relay (solo informativo)
+            max_wait: Segundos máximos que un envío espera su turno antes de aplazarse
+            max_domains: Dominios sin configuración propia que se mantienen en memoria
+            relays: Límites de cada relay cuando `sender` reparte entre varios
+                y los aplica él (vacío: el único relay es `relay`)
+        """
+        self.sender = sender
+        self.default_limits = default_limits
+        self.relay_limits = relay_limits
+        self.relay = relay
+        self.max_wait = max_wait
+        self.max_domains = max_domains
+
+        if relays:
+            self._relay_state = None
+            self._relays = dict(relays)
+        else:
+            self._relay_state = LimitState(relay_limits, overridden=True)
+            self._relays = {relay: self._relay_state}
+        self._domains: Dict[str, LimitState] = {
+            domain.lower(): LimitState(limits, overridden=True)
+            for domain, limits in (domain_limits or {}).items()
+        }
+
+    async def send(
+        self,
+        recipient: str,
+        subject: str,
+        body: str,
+        html_body: Optional[str] = None,
+        attachments: Sequence[Attachment] = ()
+    ) -> bool:
+        """
+        Envía el email cuando los límites del dominio y del relay lo permiten
+
+        Raises:
+            DeliveryDeferred: Si el envío tendría que esperar más de `max_wait`
+                (o el sender lo aplazó porque ningún relay lo puede recibir)
+        """
+        domain = recipient_domain(recipient)
+        states = (self._domain_state(domain),)
+        if self._relay_state is not None:
+            states += (self._relay_state,)
+
+        await acquire_turn(states, self.max_wait, domain)
+        try:
+            result = await self.sender.send(recipient, subject, body, html_body, attachments)
+        except DeliveryDeferred:
+            # No llegó al dominio: su turno queda para otro envío
+            for state in states:
+                state.bucket.refund()
+            raise
+        finally:
+            release_turn(states)
+
+        for state in states:
+            state.sent += 1
+        return result
+
+    async def close(self) -> None:
+        await self.sender.close()
+
+    def _domain_state(self, domain: str) -> LimitState:
+        state = self._domains.get(domain)
+        if state is None:
+            if len(self._domains) >= self.max_domains:
+                self._prune()
+            state = self._domains[domain] = LimitState(self.default_limits)
+        return state
+
+    def _prune(self) -> None:
+        """Descarta los dominios sin configuración propia que no tienen actividad"""
+        for domain in [d for d, state in self._domains.items() if not state.overridden and state.is_idle()]:
+            del self._domains[domain]
+
+    # ============================================
+    # CONFIGURACIÓN EN CALIENTE Y ESTADÍSTICAS
+    # ============================================
+
+    def set_domain_limits(self, domain: str, limits: RateLimit) -> None:
+        """Configura los límites de un dominio"""
+        state = self._domain_state(domain.lower())
+        state.overridden = True
+        state.configure(limits)
+
+    def reset_domain_limits(self, domain: str) -> None:
+        """Vuelve a aplicar los límites por defecto a un dominio"""
+        state = self._domains.get(domain.lower())
+        if state is not None:
+            state.overridden = False
+            state.configure(self.default_limits)
+
+    def set_default_limits(self, limits: RateLimit) -> None:
+        """Cambia los límites por defecto (y los de los dominios sin configuración propia)"""
+        self.default_limits = limits
+        for state in self._domains.values():
+            if not state.overridden:
+                state.configure(limits)
+
+    def set_relay_limits(self, limits: RateLimit) -> None:
+        """Cambia los límites de cada relay"""
+        self.relay_limits = limits
+        for state in self._relays.values():
+            state.configure(limits)
+
+    def limits(self) -> dict:
+        """Límites vigentes: por defecto, del relay y de los dominios configurados"""
+        return {
+            "default": self.default_limits._asdict(),
+            "relay": self.relay_limits._asdict(),
+            "domains": {
+                domain: state.limits._asdict()
+                for domain, state in self._domains.items()
+                if state.overridden
+            }
+        }
+
+    def queue_depths(self) -> dict:
+        """Envíos en espera, en curso, enviados y aplazados por dominio y por relay"""
+        return {
+            "relay": {name: state.snapshot() for name, state in self._relays.items()},
+            "domains": {
+                domain: state.snapshot()
+                for domain, state in sorted(self._domains.items(), key=lambda item: -item[1].waiting)
+            }
+        }
@@ -0,0 +1,189 @@
+import gzip
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+
+class _Member(NamedTuple):
+    """Un lote escrito en un archivo: un miembro gzip independiente"""
+    min_id: int
+    max_id: int
+    path: Path
+    offset: int
+    length: int
+
+
+def _value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+class EmailArchive:
+    """
+    Archivo de emails fuera de la base de datos: NDJSON comprimido con gzip,
+    un archivo por mes de created_at (ej: emails-2024-05.ndjson.gz)
+    (Single Responsibility: escribe y lee archivos, no decide qué archivar)
+
+    Cada lote se agrega como un miembro gzip separado (un .gz con varios
+    miembros se lee como uno solo con gzip/zcat). Junto a cada archivo, un
+    índice (.index) guarda por lote el rango de ids, el offset y el largo, así
+    que leer un email por id descomprime solo su lote.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._members: List[_Member] = []
+        self._index_versions: Dict[Path, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def write(self, emails: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Agrega emails al archivo del mes de su created_at
+
+        Los datos quedan en disco (fsync) al retornar: recién entonces se
+        pueden borrar de la base de datos.
+
+        Args:
+            emails: Filas con todas las columnas (y body/html_body en texto)
+
+        Returns:
+            Dict: Emails escritos por partición ("2024-05": 1000, ...)
+        """
+        by_month: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for email in emails:
+            by_month[email["created_at"].strftime("%Y-%m")].append(email)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._exclusive():
+            for month, rows in by_month.items():
+                self._append(month, rows)
+
+        return {month: len(rows) for month, rows in by_month.items()}
+
+    def get(self, email_id: int) -> Optional[Dict[str, Any]]:
+        """Busca un email archivado por id (None si no está)"""
+        self._refresh()
+
+        with self._lock:
+            # Lotes cuyo rango puede contener el id (casi siempre uno)
+            candidates = [m for m in self._members if m.min_id <= email_id <= m.max_id]
+
+        for member in candidates:
+            for email in self._read_member(member):
+                if email["id"] == email_id:
+                    return email
+
+        return None
+
+    def partitions(self) -> List[str]:
+        """Meses archivados ("2024-05", ...)"""
+        return sorted(path.name[len("emails-"):-len(".index")] for path in self.directory.glob("emails-*.index"))
+
+    def _append(self, month: str, rows: List[Dict[str, Any]]) -> None:
+        data_path = self.directory / f"emails-{month}.ndjson.gz"
+        index_path = self.directory / f"emails-{month}.index"
+
+        lines = "".join(
+            json.dumps({key: _value(value) for key, value in row.items()}, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+        member = gzip.compress(lines.encode("utf-8"))
+
+        with open(data_path, "ab") as f:
+            # Descartar lo que un proceso interrumpido escribió sin llegar a indexarlo
+            offset = self._indexed_size(index_path)
+            if f.tell() > offset:
+                f.truncate(offset)
+            f.write(member)
+            f.flush()
+            os.fsync(f.fileno())
+
+        ids = [row["id"] for row in rows]
+        entry = {"min_id": min(ids), "max_id": max(ids), "offset": offset, "length": len(member), "rows": len(rows)}
+        with open(index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _indexed_size(self, index_path: Path) -> int:
+        """Bytes del archivo de datos cubiertos por el índice (fin del último lote)"""
+        if not index_path.exists():
+            return 0
+        size = 0
+        with open(index_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    size = max(size, entry["offset"] + entry["length"])
+        return size
+
+    def _read_member(self, member: _Member) -> Iterator[Dict[str, Any]]:
+        with open(member.path, "rb") as f:
+            f.seek(member.offset)
+            data = gzip.decompress(f.read(member.length))
+        for line in data.decode("utf-8").splitlines():
+            yield json.loads(line)
+
+    def _refresh(self) -> None:
+        """Vuelve a leer los índices que cambiaron (otro proceso pudo archivar más)"""
+        if not self.directory.exists():
+            return
+
+        # El tamaño cambia en cada lote aunque el mtime tenga poca resolución
+        versions = {}
+        for path in self.directory.glob("emails-*.index"):
+            stat = path.stat()
+            versions[path] = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if versions == self._index_versions:
+                return
+
+        members: List[_Member] = []
+        for index_path in versions:
+            data_path = index_path.with_name(index_path.name[:-len(".index")] + ".ndjson.gz")
+            with open(index_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    members.append(_Member(entry["min_id"], entry["max_id"], data_path, entry["offset"], entry["length"]))
+
+        members.sort(key=lambda m: (m.min_id, m.max_id))
+        with self._lock:
+            self._members = members
+            self._index_versions = versions
+
+    def _exclusive(self):
+        return _FileLock(self.directory / ".lock")
+
+
+class _FileLock:
+    """Bloqueo exclusivo entre procesos (flock) para que dos jobs no escriban el mismo archivo"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self) -> "_FileLock":
+        self._file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
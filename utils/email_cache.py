@@ -0,0 +1,67 @@
+import itertools
+from datetime import datetime
+from typing import Any, Iterable, NamedTuple, Optional
+from utils.ttl_cache import TTLCache
+
+
+class CachedEmail(NamedTuple):
+    """Respuesta de GET /emails/{id} con su ETag"""
+    etag: str
+    response: Any
+
+
+def email_etag(email_id: int, updated_at: datetime, include_body: bool = False) -> str:
+    """ETag de un email: cambia con cada escritura (updated_at) y según incluya los cuerpos"""
+    version = updated_at.strftime("%Y%m%d%H%M%S%f")
+    return f'"{email_id}-{version}{"-body" if include_body else ""}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Si el header If-None-Match incluye `etag` (comparación débil, como pide RFC 9110)"""
+    if not if_none_match:
+        return False
+
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+class EmailCache:
+    """
+    Cache en proceso de las respuestas de GET /emails/{id}
+    (Single Responsibility: guarda respuestas y las descarta cuando el email cambia)
+
+    El servicio invalida un email cada vez que lo escribe (estado de envío,
+    reintento, actualización o borrado). Para que una lectura que empezó
+    antes de esa escritura no guarde el valor viejo, `put` recibe la versión
+    leída con `version` antes de consultar la base de datos y no guarda nada
+    si cambió mientras tanto.
+
+    Las escrituras de otros procesos no invalidan este cache: `ttl` acota
+    cuánto puede tardar en verse un cambio hecho en otra réplica.
+    """
+
+    def __init__(self, max_items: int = 10000, ttl: float = 10.0):
+        self._entries = TTLCache(max_items=max_items, ttl=ttl)
+        # Número de la última invalidación de cada email
+        self._versions = TTLCache(max_items=max_items, ttl=ttl)
+        self._counter = itertools.count(1)
+
+    def get(self, email_id: int, include_body: bool) -> Optional[CachedEmail]:
+        return self._entries.get((email_id, include_body))
+
+    def version(self, email_id: int) -> Optional[int]:
+        return self._versions.get(email_id)
+
+    def put(self, email_id: int, include_body: bool, entry: CachedEmail, version: Optional[int]) -> None:
+        """Guarda `entry` si el email no se invalidó desde que se leyó `version`"""
+        if self._versions.get(email_id) == version:
+            self._entries.put((email_id, include_body), entry)
+
+    def invalidate(self, email_ids: Iterable[int]) -> None:
+        for email_id in email_ids:
+            self._versions.put(email_id, next(self._counter))
+            self._entries.pop((email_id, False))
+            self._entries.pop((email_id, True))
+
+    def clear(self) -> None:
+        self._entries.clear()
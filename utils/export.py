@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List
+from interfaces.email_interfaces import EmailSummary
+
+# Columnas exportadas, en orden (las de CSV y las claves de cada línea NDJSON)
+EXPORT_FIELDS = (
+    "id",
+    "recipient",
+    "subject",
+    "status",
+    "priority",
+    "attempts",
+    "error_message",
+    "created_at",
+    "sent_at",
+    "next_attempt_at",
+    "send_at"
+)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+
+def _value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def export_row(email: EmailSummary) -> Dict[str, Any]:
+    return {field: _value(getattr(email, field)) for field in EXPORT_FIELDS}
+
+
+def ndjson_chunk(emails: List[EmailSummary]) -> str:
+    """Un objeto JSON por línea"""
+    return "".join(json.dumps(export_row(email), ensure_ascii=False) + "\n" for email in emails)
+
+
+def csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+
+def csv_chunk(emails: List[EmailSummary]) -> str:
+    """Filas CSV (los valores nulos quedan vacíos)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for email in emails:
+        row = export_row(email)
+        writer.writerow(["" if row[field] is None else row[field] for field in EXPORT_FIELDS])
+    return buffer.getvalue()
@@ -0,0 +1,57 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Sequence
+from pydantic import BaseModel
+from sqlalchemy.dialects import postgresql, sqlite
+from models.email_model import IdempotencyKey
+from interfaces.email_interfaces import Attachment, IdempotencyRecord
+
+# Campos agregados después de que existieran claves guardadas: con su valor
+# por defecto no cuentan, así esas claves siguen coincidiendo
+_LATER_FIELDS = {"priority": "normal", "send_at": None}
+
+
+def request_hash(request: BaseModel, attachments: Sequence[Attachment] = ()) -> str:
+    """
+    SHA-256 del contenido de una petición (independiente del orden de las claves)
+
+    Los adjuntos cuentan por nombre y hash de su contenido.
+    """
+    data = request.model_dump(mode="json")
+    for field, default in _LATER_FIELDS.items():
+        if field in data and data[field] == default:
+            del data[field]
+    if attachments:
+        data["attachments"] = [[attachment.filename, attachment.hash] for attachment in attachments]
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def insert_idempotency_key(dialect_name: str, record: IdempotencyRecord, email_id: int):
+    """
+    INSERT de una Idempotency-Key que solo reemplaza a una clave vencida
+
+    Si la clave la tiene otra petición no afecta ninguna fila (rowcount 0).
+    Con una transacción concurrente que insertó la misma clave, PostgreSQL
+    espera a que termine antes de decidir.
+    """
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    now = datetime.utcnow()
+    statement = dialect.insert(IdempotencyKey).values(
+        key=record.key,
+        request_hash=record.request_hash,
+        email_id=email_id,
+        created_at=now,
+        expires_at=record.expires_at
+    )
+    return statement.on_conflict_do_update(
+        index_elements=["key"],
+        set_={
+            "request_hash": statement.excluded.request_hash,
+            "email_id": statement.excluded.email_id,
+            "created_at": statement.excluded.created_at,
+            "expires_at": statement.excluded.expires_at
+        },
+        where=IdempotencyKey.expires_at <= now
+    )
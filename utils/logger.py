@@ -0,0 +1,195 @@
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional
+from utils.metrics import REGISTRY
+
+
+# Campos de contexto (correlation_id, email_id, ...) del request o mensaje actual
+_log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+# Atributos propios de LogRecord: el resto son campos pasados con `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sampled"}
+
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    "log_records_dropped",
+    "Registros de log descartados porque la cola estaba llena"
+)
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """
+    Agrega campos a todos los logs emitidos dentro del bloque
+
+    Ej: with log_context(email_id=email.id): ...
+    """
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copia el contexto actual al registro (en el hilo que loguea, no en el del listener)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar solo una fracción de los eventos marcados como muestreables
+
+    Pensado para eventos de éxito de alto volumen:
+    logger.info("Email enviado", extra={"sampled": True})
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los campos de contexto y de `extra`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo: los campos extra van al final como clave=valor"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(f"{key}={value}" for key, value in _extra_fields(record).items())
+        if not fields:
+            return line
+        # La traza de una excepción (si hay) queda después de los campos
+        head, _, trace = line.partition("\n")
+        return f"{head} {fields}" + (f"\n{trace}" if trace else "")
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler que nunca bloquea al que loguea
+
+    Si la cola está llena el registro se descarta (y se cuenta en
+    log_records_dropped) en lugar de esperar a que el listener escriba.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels().inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Como QueueHandler.prepare, pero la traza queda en exc_text en lugar
+        # de concatenarse al mensaje (el formatter del listener la ubica)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _LogListener(QueueListener):
+    """QueueListener que, al detenerse, espera lugar en la cola para el aviso de fin"""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+def setup_logging(
+    level: str = "INFO",
+    fmt: str = "json",
+    sample_rate: float = 1.0,
+    queue_size: int = 10000
+) -> QueueListener:
+    """
+    Configura el logger raíz para escribir a stdout desde un hilo en segundo plano
+
+    Los registros se filtran (nivel, muestreo) y se les agrega el contexto en el
+    hilo que loguea; el formateo y la escritura ocurren en el hilo del listener.
+
+    Args:
+        level: Nivel mínimo (DEBUG, INFO, WARNING, ...)
+        fmt: "json" (una línea JSON por registro) o "text"
+        sample_rate: Fracción de los eventos muestreables que se registran (0 a 1)
+        queue_size: Registros en espera antes de empezar a descartar
+
+    Returns:
+        QueueListener: Listener iniciado; detenerlo con shutdown_logging al apagar
+    """
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    handler = _NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(SamplingFilter(sample_rate))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in [h for h in root.handlers if isinstance(h, _NonBlockingQueueHandler)]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    listener = _LogListener(handler.queue, output)
+    listener.start()
+    return listener
+
+
+def shutdown_logging(listener: Optional[QueueListener]) -> None:
+    """Escribe los registros pendientes y detiene el listener"""
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, _NonBlockingQueueHandler)]:
+        root.removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {
+        key: value
+        for key, value in record.__dict__.items()
+        if key not in _RECORD_ATTRIBUTES and not key.startswith("_") and value is not None
+    }
@@ -0,0 +1,266 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, List, Sequence, Tuple
+
+
+# Segundos: de 1 ms (render, INSERT) a 30 s (timeout SMTP)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _CounterChild:
+    """Valor de un contador para una combinación de labels"""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    """
+    Histograma para una combinación de labels
+
+    Guarda el conteo de cada bucket (no acumulado) para que observe() solo
+    incremente una posición; los acumulados se calculan al exponerlo.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager que observa los segundos transcurridos dentro del bloque"""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, histogram: _HistogramChild):
+        self._histogram = histogram
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """
+        Retorna la serie de una combinación de labels (se crea la primera vez)
+
+        En el camino crítico conviene guardar la serie en una variable en lugar
+        de llamar a labels() en cada observación.
+        """
+        child = self._children.get(values)
+        if child is not None:
+            return child
+
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+
+        with self._lock:
+            return self._children.setdefault(tuple(str(value) for value in values), self._new_child())
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._expose_child(values, child))
+        return lines
+
+    def _expose_child(self, values: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monotónico (ej: envíos por resultado)"""
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def _expose_child(self, values: Tuple[str, ...], child: _CounterChild) -> List[str]:
+        return [f"{self.name}_total{self._label_text(values)} {_number(child.value)}"]
+
+
+class Histogram(_Metric):
+    """Histograma de latencias con buckets fijos"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def _expose_child(self, values: Tuple[str, ...], child: _HistogramChild) -> List[str]:
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_number(bound)}"'
+            lines.append(f"{self.name}_bucket{self._label_text(values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Métricas del proceso en formato de texto de Prometheus
+    (Single Responsibility: registra y expone métricas, no decide qué medir)
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def expose(self) -> str:
+        """Texto para el endpoint /metrics (text/plain; version=0.0.4)"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+def timed(histogram: _HistogramChild):
+    """Decorador para métodos async: observa su duración (también si lanzan una excepción)"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+# ============================================
+# MÉTRICAS DEL PIPELINE DE ENVÍO
+# ============================================
+
+REGISTRY = MetricsRegistry()
+
+SEND_PHASE_SECONDS = REGISTRY.histogram(
+    "email_send_phase_seconds",
+    "Latencia de cada fase de POST /emails/send",
+    ["phase"]
+)
+SEND_SECONDS = REGISTRY.histogram(
+    "email_send_seconds",
+    "Latencia total de EmailService.send_email por resultado",
+    ["outcome"]
+)
+DELIVERY_ATTEMPTS = REGISTRY.counter(
+    "email_delivery_attempts",
+    "Intentos de entrega por estado resultante",
+    ["status"]
+)
+REPOSITORY_SECONDS = REGISTRY.histogram(
+    "email_repository_seconds",
+    "Latencia de las operaciones del repositorio de emails",
+    ["operation"]
+)
+SMTP_PHASE_SECONDS = REGISTRY.histogram(
+    "email_smtp_phase_seconds",
+    "Latencia de cada fase del envío SMTP (queue, connect, login, send)",
+    ["phase"]
+)
+SMTP_SENDS = REGISTRY.counter(
+    "email_smtp_sends",
+    "Envíos SMTP por resultado (success, transient, permanent)",
+    ["outcome"]
+)
+LANE_WAIT_SECONDS = REGISTRY.histogram(
+    "email_lane_wait_seconds",
+    "Espera de un email en el outbox, desde que debía enviarse hasta que un worker lo toma, por prioridad",
+    ["priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+)
+SMTP_RELAY_SENDS = REGISTRY.counter(
+    "email_smtp_relay_sends",
+    "Envíos por relay SMTP y resultado (success, transient, permanent)",
+    ["relay", "outcome"]
+)
+SMTP_RELAY_CIRCUIT_OPENS = REGISTRY.counter(
+    "email_smtp_relay_circuit_opens",
+    "Veces que se abrió el circuito de cada relay SMTP",
+    ["relay"]
+)
@@ -0,0 +1,144 @@
+import asyncio
+import base64
+import uuid
+from concurrent.futures import Executor
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import AsyncIterator, Iterator, List, Optional, Sequence
+from interfaces.email_interfaces import Attachment
+from utils.async_smtp_client import dot_stuff
+
+# Bytes de un adjunto que se leen y codifican por vez: múltiplo de 57, así
+# cada parte son líneas base64 completas de 76 caracteres
+ENCODE_CHUNK_SIZE = 57 * 16 * 1024
+
+# Los adjuntos más chicos se codifican en el event loop: no vale la pena el salto a otro hilo
+INLINE_ENCODE_LIMIT = 256 * 1024
+
+
+def alternative_part(body: str, html_body: Optional[str] = None) -> MIMEMultipart:
+    """Parte multipart/alternative con el texto plano y el HTML"""
+    part = MIMEMultipart("alternative")
+
+    # Agregar cuerpo en texto plano
+    part.attach(MIMEText(body, "plain", "utf-8"))
+
+    # Agregar cuerpo HTML si existe
+    if html_body:
+        part.attach(MIMEText(html_body, "html", "utf-8"))
+
+    return part
+
+
+def encode_file(path: str) -> Iterator[bytes]:
+    """
+    Contenido de un archivo en base64 (líneas de 76 caracteres con CRLF,
+    igual que email.encoders.encode_base64), de a ENCODE_CHUNK_SIZE bytes leídos
+    """
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(ENCODE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield base64.encodebytes(chunk).replace(b"\n", b"\r\n")
+
+
+def _attachment_part(attachment: Attachment, payload: str) -> MIMEBase:
+    maintype, _, subtype = attachment.content_type.partition("/")
+    part = MIMEBase(maintype, subtype)
+    # Nombres no ASCII con RFC 2231
+    filename = attachment.filename if attachment.filename.isascii() else ("utf-8", "", attachment.filename)
+    part.add_header("Content-Disposition", "attachment", filename=filename)
+    part["Content-Transfer-Encoding"] = "base64"
+    part.set_payload(payload)
+    return part
+
+
+class StreamingMessage:
+    """
+    Mensaje MIME con adjuntos que se codifica a medida que se envía
+    (Single Responsibility: serializa el mensaje por partes)
+
+    Los encabezados y los cuerpos se arman con el paquete email (son
+    pequeños); en el lugar de cada adjunto queda una marca que se reemplaza
+    al enviar por su contenido, leído del disco y codificado en base64 de a
+    ENCODE_CHUNK_SIZE bytes. La memoria de un envío no depende del tamaño
+    de los adjuntos.
+
+    Las partes ya están listas para el comando DATA (líneas CRLF y
+    dot-stuffing) y la última termina en CRLF.
+    """
+
+    def __init__(
+        self,
+        sender: str,
+        recipient: str,
+        subject: str,
+        body: str,
+        html_body: Optional[str],
+        attachments: Sequence[Attachment]
+    ):
+        self.sender = sender
+        self.recipient = recipient
+        self.attachments = list(attachments)
+
+        message = MIMEMultipart("mixed")
+        message["From"] = sender
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.attach(alternative_part(body, html_body))
+
+        marker = uuid.uuid4().hex
+        placeholders = []
+        for index, attachment in enumerate(self.attachments):
+            placeholder = f"{marker}-{index}"
+            message.attach(_attachment_part(attachment, placeholder))
+            placeholders.append(placeholder.encode("ascii"))
+
+        # Misma serialización que smtplib.send_message (compat32 con CRLF)
+        data = message.as_bytes(policy=message.policy.clone(linesep="\r\n"))
+        if not data.endswith(b"\r\n"):
+            data += b"\r\n"
+
+        self._pieces: List[bytes] = []
+        for placeholder in placeholders:
+            piece, data = data.split(placeholder, 1)
+            self._pieces.append(dot_stuff(piece))
+        self._pieces.append(dot_stuff(data))
+
+    def chunks(self) -> Iterator[bytes]:
+        """Partes del mensaje (bloqueante: lee y codifica en el hilo que lo recorre)"""
+        for piece, attachment in zip(self._pieces, self.attachments):
+            yield piece
+            yield from encode_file(attachment.path)
+        yield self._pieces[-1]
+
+    async def achunks(self, executor: Optional[Executor] = None) -> AsyncIterator[bytes]:
+        """
+        Partes del mensaje para un envío asíncrono
+
+        Con `executor`, los adjuntos grandes se leen y codifican en ese pool
+        de hilos para no detener el event loop (de a una parte: la siguiente
+        se pide cuando la anterior ya se escribió).
+        """
+        loop = asyncio.get_running_loop()
+
+        for piece, attachment in zip(self._pieces, self.attachments):
+            yield piece
+
+            encoded = encode_file(attachment.path)
+            offload = executor is not None and attachment.size > INLINE_ENCODE_LIMIT
+            try:
+                while True:
+                    if offload:
+                        chunk = await loop.run_in_executor(executor, next, encoded, None)
+                    else:
+                        chunk = next(encoded, None)
+                    if chunk is None:
+                        break
+                    yield chunk
+            finally:
+                encoded.close()
+
+        yield self._pieces[-1]
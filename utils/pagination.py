@@ -0,0 +1,50 @@
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(created_at: datetime, email_id: int) -> str:
+    """Codifica la posición (created_at, id) como un cursor opaco"""
+    raw = json.dumps([created_at.isoformat(), email_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decodifica un cursor generado por encode_cursor
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, email_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(email_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class TotalCountCache:
+    """
+    Guarda en memoria un total de filas durante `ttl` segundos
+    (evita consultar el total en cada página)
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._value: Optional[int] = None
+        self._expires_at = 0.0
+
+    def get(self) -> Optional[int]:
+        if self._value is not None and time.monotonic() < self._expires_at:
+            return self._value
+        return None
+
+    def set(self, value: int) -> None:
+        self._value = value
+        self._expires_at = time.monotonic() + self.ttl
+
+    def clear(self) -> None:
+        self._value = None
@@ -0,0 +1,313 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Deque, List, Optional, Sequence, Set
+from interfaces.email_interfaces import Attachment, DeliveryDeferred, EmailDeliveryError, IEmailSender
+from utils.delivery_scheduler import LimitState, acquire_turn, release_turn
+from utils.metrics import SMTP_RELAY_CIRCUIT_OPENS, SMTP_RELAY_SENDS
+
+logger = logging.getLogger(__name__)
+
+# Estados del circuito de un relay
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuito de un relay SMTP
+    (Single Responsibility: decide si un relay puede recibir envíos)
+
+    Guarda el resultado de los últimos `window` envíos. Con al menos
+    `min_requests` resultados y una tasa de error de `error_threshold` o más
+    el circuito se abre y el relay no recibe envíos durante `open_seconds`.
+    Después queda medio abierto: pasa un solo envío de prueba, que lo cierra
+    si funciona o lo vuelve a abrir si falla.
+    """
+
+    def __init__(
+        self,
+        error_threshold: float = 0.5,
+        window: int = 20,
+        min_requests: int = 5,
+        open_seconds: float = 30.0
+    ):
+        self.error_threshold = error_threshold
+        self.min_requests = min_requests
+        self.open_seconds = open_seconds
+
+        self.state = CLOSED
+        self._results: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def error_rate(self) -> float:
+        """Fracción de errores entre los últimos envíos"""
+        if not self._results:
+            return 0.0
+        return self._results.count(False) / len(self._results)
+
+    def allows(self) -> bool:
+        """True si el relay puede recibir un envío ahora"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return self.retry_after() == 0
+        return not self._probing
+
+    def acquire(self) -> None:
+        """Registra que el relay recibe un envío (si no está cerrado, es el de prueba)"""
+        if self.state == OPEN:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            self._probing = True
+
+    def release(self) -> None:
+        """El envío asignado terminó sin resultado (por ejemplo, se canceló)"""
+        self._probing = False
+
+    def record(self, success: bool) -> None:
+        """Registra el resultado de un envío y abre o cierra el circuito"""
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if success:
+                self.state = CLOSED
+            else:
+                self._open()
+            return
+
+        # Resultado de un envío que empezó antes de abrirse el circuito
+        if self.state == OPEN:
+            return
+
+        self._results.append(success)
+        if len(self._results) >= self.min_requests and self.error_rate >= self.error_threshold:
+            self._open()
+
+    def retry_after(self) -> float:
+        """Segundos hasta que un circuito abierto deje pasar el envío de prueba"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._results.clear()
+
+
+class Relay:
+    """Un relay SMTP del balanceo: su sender, su peso, su circuito, sus límites y sus estadísticas"""
+
+    def __init__(
+        self,
+        name: str,
+        sender: IEmailSender,
+        weight: float = 1.0,
+        breaker: Optional[CircuitBreaker] = None,
+        latency_alpha: float = 0.2,
+        limits: Optional[LimitState] = None
+    ):
+        """
+        Args:
+            name: Nombre del relay (logs, métricas y GET /delivery/relays)
+            sender: Sender que envía por este relay
+            weight: Parte del tráfico que recibe (0: solo si los demás no están disponibles)
+            breaker: Circuito del relay
+            latency_alpha: Peso de cada envío en el promedio móvil de la latencia
+            limits: Límites de envío del relay (DELIVERY_RELAY_*; vacío = sin límite)
+        """
+        self.name = name
+        self.sender = sender
+        self.weight = weight
+        self.breaker = breaker or CircuitBreaker()
+        self.latency_alpha = latency_alpha
+        self.limits = limits
+
+        # Promedio móvil exponencial de los segundos por envío exitoso
+        self.latency: Optional[float] = None
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def observe_latency(self, seconds: float) -> None:
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += self.latency_alpha * (seconds - self.latency)
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "weight": self.weight,
+            "state": self.breaker.state,
+            "error_rate": round(self.breaker.error_rate, 3),
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "retry_after": round(self.breaker.retry_after(), 1)
+        }
+
+
+class MultiRelaySender(IEmailSender):
+    """
+    Reparte los envíos entre varios relays SMTP
+    (Open/Closed: compone senders existentes sin modificarlos)
+
+    Cada envío va a un relay elegido al azar en proporción a su peso,
+    corregido por su latencia: un relay que tarda el doble que el más
+    rápido recibe la mitad de su parte. Los relays con el circuito abierto
+    no reciben envíos hasta que pasa su envío de prueba.
+
+    Si un relay falla con un error transitorio (conexión, timeout, 4xx) el
+    email se intenta en otro relay dentro del mismo envío. Los rechazos
+    permanentes (5xx del destinatario o del contenido) no dependen del relay:
+    se propagan sin probar otro y no cuentan como error del relay. Si ningún
+    relay puede recibir envíos se lanza DeliveryDeferred para reintentar
+    cuando alguno acepte el envío de prueba.
+
+    Los relays con límites de envío esperan su turno hasta `max_wait`
+    segundos; si el turno queda más lejos, el envío pasa a otro relay.
+
+    Igual que con los reintentos, un relay que no confirmó el DATA pudo
+    haber entregado el mensaje: pasar a otro relay puede duplicarlo.
+    """
+
+    def __init__(self, relays: Sequence[Relay], max_wait: float = 5.0):
+        if not relays:
+            raise ValueError("MultiRelaySender needs at least one relay")
+        self.relays: List[Relay] = list(relays)
+        self.max_wait = max_wait
+
+    async def send(
+        self,
+        recipient: str,
+        subject: str,
+        body: str,
+        html_body: Optional[str] = None,
+        attachments: Sequence[Attachment] = ()
+    ) -> bool:
+        """
+        Envía el email por uno de los relays (por otro si el elegido falla)
+
+        Raises:
+            DeliveryDeferred: Si todos los relays tienen el circuito abierto
+                o el turno de sus límites queda a más de `max_wait`
+            EmailDeliveryError: Si el email fue rechazado (permanente) o
+                fallaron todos los relays disponibles (transitorio)
+        """
+        tried: Set[int] = set()
+        error: Optional[EmailDeliveryError] = None
+        deferred: Optional[DeliveryDeferred] = None
+
+        while True:
+            relay = self._choose(tried)
+            if relay is None:
+                break
+            tried.add(id(relay))
+
+            relay.breaker.acquire()
+            turn = (relay.limits,) if relay.limits is not None else ()
+            try:
+                if turn:
+                    await acquire_turn(turn, self.max_wait, f"relay {relay.name}")
+            except BaseException as e:
+                relay.breaker.release()
+                if not isinstance(e, DeliveryDeferred):
+                    raise
+                if deferred is None or e.retry_after < deferred.retry_after:
+                    deferred = e
+                continue
+
+            relay.in_flight += 1
+            started = time.perf_counter()
+            try:
+                result = await relay.sender.send(recipient, subject, body, html_body, attachments)
+            except EmailDeliveryError as e:
+                if e.permanent:
+                    self._record(relay, "permanent")
+                    raise
+                self._record(relay, "transient")
+                error = e
+                logger.warning(
+                    "Error en el relay SMTP; se intenta con otro",
+                    extra={"relay": relay.name, "recipient": recipient, "error": str(e)}
+                )
+                continue
+            except BaseException:
+                relay.breaker.release()
+                raise
+            finally:
+                relay.in_flight -= 1
+                release_turn(turn)
+
+            relay.observe_latency(time.perf_counter() - started)
+            self._record(relay, "success")
+            if relay.limits is not None:
+                relay.limits.sent += 1
+            return result
+
+        if error is not None:
+            raise error
+        if deferred is not None:
+            raise deferred
+
+        retry_after = min(relay.breaker.retry_after() for relay in self.relays)
+        raise DeliveryDeferred(max(retry_after, 1.0), "No SMTP relay available")
+
+    async def close(self) -> None:
+        await asyncio.gather(*(relay.sender.close() for relay in self.relays))
+
+    def _choose(self, tried: Set[int]) -> Optional[Relay]:
+        """Elige un relay disponible que todavía no se intentó en este envío"""
+        candidates = [
+            relay for relay in self.relays
+            if id(relay) not in tried and relay.breaker.allows()
+        ]
+        if not candidates:
+            return None
+
+        fastest = min((relay.latency for relay in candidates if relay.latency), default=None)
+        weights = [
+            relay.weight * (fastest / relay.latency if fastest and relay.latency else 1.0)
+            for relay in candidates
+        ]
+
+        # Solo quedan relays de respaldo (peso 0)
+        if not any(weights):
+            return random.choice(candidates)
+        return random.choices(candidates, weights)[0]
+
+    def _record(self, relay: Relay, outcome: str) -> None:
+        """Actualiza las estadísticas y el circuito del relay con el resultado de un envío"""
+        if outcome == "success":
+            relay.sent += 1
+        elif outcome == "permanent":
+            relay.rejected += 1
+        else:
+            relay.failed += 1
+        SMTP_RELAY_SENDS.labels(relay.name, outcome).inc()
+
+        previous = relay.breaker.state
+        relay.breaker.record(outcome != "transient")
+        state = relay.breaker.state
+
+        if state == OPEN and previous != OPEN:
+            SMTP_RELAY_CIRCUIT_OPENS.labels(relay.name).inc()
+            logger.warning(
+                "Circuito abierto: el relay deja de recibir envíos",
+                extra={"relay": relay.name, "seconds": relay.breaker.open_seconds}
+            )
+        elif state == CLOSED and previous == HALF_OPEN:
+            logger.info("Circuito cerrado: el relay vuelve a recibir envíos", extra={"relay": relay.name})
+
+    def stats(self) -> List[dict]:
+        """Estado de cada relay: circuito, tasa de error, latencia y envíos"""
+        return [relay.snapshot() for relay in self.relays]
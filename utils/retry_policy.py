@@ -0,0 +1,40 @@
+import random
+from typing import Optional
+
+
+class RetryPolicy:
+    """
+    Backoff exponencial con jitter para reintentar envíos fallidos
+
+    El intento n espera entre la mitad y el total de base_delay * 2^(n-1)
+    (con tope en max_delay). El jitter evita que todos los emails que
+    fallaron juntos (por ejemplo, durante una caída del relay) se
+    reintenten en el mismo instante.
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 30.0, max_delay: float = 3600.0):
+        """
+        Args:
+            max_attempts: Intentos totales antes de pasar el email a dead-letter
+            base_delay: Segundos de espera (aproximados) tras el primer intento fallido
+            max_delay: Tope de la espera entre intentos
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, attempts: int) -> Optional[float]:
+        """
+        Segundos hasta el próximo intento
+
+        Args:
+            attempts: Intentos realizados hasta ahora (incluido el que falló)
+
+        Returns:
+            Optional[float]: Espera en segundos, o None si se agotaron los intentos
+        """
+        if attempts >= self.max_attempts:
+            return None
+
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
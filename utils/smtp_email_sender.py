@@ -1,18 +1,42 @@
+import asyncio
+import contextvars
+import logging
 import smtplib
-from email.mime.text import MIMEText
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
-from interfaces.email_interfaces import IEmailSender
+from typing import Iterable, Optional, Sequence, Union
+from interfaces.email_interfaces import Attachment, IEmailSender
+from utils.mime_stream import StreamingMessage, alternative_part
+from utils.smtp_pool import SMTPConnectionPool
+from utils.smtp_errors import classify_smtp_error
+from utils.metrics import SMTP_PHASE_SECONDS, SMTP_SENDS
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Series de las fases del envío SMTP
+_QUEUE_SECONDS = SMTP_PHASE_SECONDS.labels("queue")
+_CONNECT_SECONDS = SMTP_PHASE_SECONDS.labels("connect")
+_LOGIN_SECONDS = SMTP_PHASE_SECONDS.labels("login")
+_SEND_SECONDS = SMTP_PHASE_SECONDS.labels("send")
+_SENDS_SUCCESS = SMTP_SENDS.labels("success")
+
 
 class SMTPEmailSender(IEmailSender):
     """
     Implementación de envío de emails usando SMTP
     (Single Responsibility: solo se encarga de enviar emails)
+    
+    Con `pool_size > 0` reutiliza conexiones ya autenticadas entre mensajes
+    en lugar de conectarse y autenticarse para cada email.
+    
+    smtplib es bloqueante, así que cada envío corre en un ThreadPoolExecutor
+    acotado para no detener el event loop. Los mensajes con adjuntos se
+    codifican en ese mismo hilo a medida que se escriben en el socket.
     """
     
     def __init__(
@@ -22,7 +46,12 @@ class SMTPEmailSender(IEmailSender):
         smtp_user: str = None,
         smtp_password: str = None,
         use_tls: bool = True,
-        use_ssl: bool = False
+        use_ssl: bool = False,
+        pool_size: int = None,
+        pool_idle_timeout: float = None,
+        pool_max_messages: int = None,
+        pool_health_check_interval: float = None,
+        executor_workers: int = None
     ):
         self.smtp_host = smtp_host or os.getenv("SMTP_HOST", "smtp.gmail.com")
         self.smtp_port = smtp_port or int(os.getenv("SMTP_PORT", "587"))
@@ -30,13 +59,41 @@ class SMTPEmailSender(IEmailSender):
         self.smtp_password = smtp_password or os.getenv("SMTP_PASSWORD")
         self.use_tls = use_tls
         self.use_ssl = use_ssl
+        
+        if pool_size is None:
+            pool_size = int(os.getenv("SMTP_POOL_SIZE", "5"))
+        
+        if pool_idle_timeout is None:
+            pool_idle_timeout = float(os.getenv("SMTP_POOL_IDLE_TIMEOUT", "60"))
+        if pool_max_messages is None:
+            pool_max_messages = int(os.getenv("SMTP_POOL_MAX_MESSAGES", "100"))
+        if pool_health_check_interval is None:
+            pool_health_check_interval = float(os.getenv("SMTP_POOL_HEALTH_CHECK", "5"))
+        
+        # pool_size = 0 desactiva el pool (una conexión por mensaje)
+        self.pool = None
+        if pool_size > 0:
+            self.pool = SMTPConnectionPool(
+                self._connect,
+                size=pool_size,
+                idle_timeout=pool_idle_timeout,
+                max_messages=pool_max_messages,
+                health_check_interval=pool_health_check_interval
+            )
+        
+        # Los hilos no dependen del pool: sin pool (pool_size = 0) cada
+        # envío abre su conexión en uno de ellos
+        if executor_workers is None:
+            executor_workers = int(os.getenv("SMTP_EXECUTOR_WORKERS", "5"))
+        self.executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="smtp")
     
     async def send(
         self,
         recipient: str,
         subject: str,
         body: str,
-        html_body: Optional[str] = None
+        html_body: Optional[str] = None,
+        attachments: Sequence[Attachment] = ()
     ) -> bool:
         """
         Envía un email usando SMTP
@@ -46,59 +103,160 @@ class SMTPEmailSender(IEmailSender):
             subject: Asunto del email
             body: Cuerpo en texto plano
             html_body: Cuerpo en HTML (opcional)
+            attachments: Adjuntos (se leen del disco durante el envío)
             
         Returns:
-            bool: True si se envió correctamente, False si falló
+            bool: True si se envió correctamente
+            
+        Raises:
+            EmailDeliveryError: Si el envío falló (permanente si el servidor respondió 5xx)
         """
         try:
-            # Crear mensaje
-            message = MIMEMultipart("alternative")
-            message["From"] = self.smtp_user
-            message["To"] = recipient
-            message["Subject"] = subject
+            if attachments:
+                message = StreamingMessage(self.smtp_user, recipient, subject, body, html_body, attachments)
+            else:
+                message = build_message(self.smtp_user, recipient, subject, body, html_body)
             
-            # Agregar cuerpo en texto plano
-            part_text = MIMEText(body, "plain", "utf-8")
-            message.attach(part_text)
+            # El hilo del executor hereda el contexto de logs (correlation id)
+            context = contextvars.copy_context()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.executor, context.run, self._send_blocking, message, time.perf_counter()
+            )
             
-            # Agregar cuerpo HTML si existe
-            if html_body:
-                part_html = MIMEText(html_body, "html", "utf-8")
-                message.attach(part_html)
+            _SENDS_SUCCESS.inc()
+            logger.info("Email enviado", extra={"recipient": recipient, "sampled": True})
+            return True
             
-            # Conectar y enviar
+        except Exception as e:
+            error = classify_smtp_error(e)
+            SMTP_SENDS.labels("permanent" if error.permanent else "transient").inc()
+            logger.warning(
+                "Error al enviar email",
+                extra={"recipient": recipient, "error": str(e), "permanent": error.permanent}
+            )
+            raise error from e
+    
+    async def close(self) -> None:
+        """Cierra las conexiones abiertas del pool"""
+        if self.pool is not None:
+            self.pool.close()
+    
+    def _send_blocking(self, message: Union[MIMEMultipart, StreamingMessage], submitted: float) -> None:
+        """
+        Envía el mensaje con smtplib (se ejecuta en un hilo del executor)
+        
+        `submitted` es el perf_counter() al encolar el envío: la diferencia es
+        el tiempo que esperó un hilo libre.
+        """
+        _QUEUE_SECONDS.observe(time.perf_counter() - submitted)
+        
+        if self.pool is None:
+            server = self._connect()
+            try:
+                with _SEND_SECONDS.time():
+                    self._transmit(server, message)
+            finally:
+                server.quit()
+        else:
+            self._send_pooled(message)
+    
+    def _send_pooled(self, message: Union[MIMEMultipart, StreamingMessage]) -> None:
+        """
+        Envía por una conexión del pool. Si el servidor cerró la conexión
+        reutilizada, reintenta una vez con una conexión nueva.
+        """
+        try:
+            with self.pool.connection() as server:
+                with _SEND_SECONDS.time():
+                    self._transmit(server, message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            with self.pool.connection(fresh=True) as server:
+                with _SEND_SECONDS.time():
+                    self._transmit(server, message)
+    
+    def _transmit(self, server: smtplib.SMTP, message: Union[MIMEMultipart, StreamingMessage]) -> None:
+        if isinstance(message, StreamingMessage):
+            send_stream(server, message.sender or "", message.recipient, message.chunks())
+        else:
+            server.send_message(message)
+    
+    def _connect(self) -> smtplib.SMTP:
+        """Abre una conexión SMTP autenticada"""
+        with _CONNECT_SECONDS.time():
             if self.use_ssl:
                 # Usar SSL en puerto 465
-                print(f"🔌 Conectando a {self.smtp_host}:{self.smtp_port} con SSL...")
+                logger.debug("Conectando a SMTP", extra={"host": self.smtp_host, "port": self.smtp_port, "ssl": True})
                 server = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port, timeout=30)
-                print("🔐 Autenticando...")
-                server.login(self.smtp_user, self.smtp_password)
-                print("📧 Enviando mensaje...")
-                server.send_message(message)
-                server.quit()
-                print("✅ Conexión cerrada correctamente")
             else:
                 # Usar TLS en puerto 587
-                print(f"🔌 Conectando a {self.smtp_host}:{self.smtp_port} con TLS...")
+                logger.debug("Conectando a SMTP", extra={"host": self.smtp_host, "port": self.smtp_port, "ssl": False})
                 server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
                 server.ehlo()
                 if self.use_tls:
                     server.starttls()
                     server.ehlo()
-                
-                print("🔐 Autenticando...")
-                server.login(self.smtp_user, self.smtp_password)
-                print("📧 Enviando mensaje...")
-                server.send_message(message)
-                server.quit()
-                print("✅ Conexión cerrada correctamente")
-            
-            print(f"✅ Email enviado exitosamente a {recipient}")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Error al enviar email a {recipient}: {str(e)}")
-            return False
+        
+        try:
+            if self.smtp_user:
+                logger.debug("Autenticando", extra={"host": self.smtp_host, "user": self.smtp_user})
+                with _LOGIN_SECONDS.time():
+                    server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        
+        return server
+
+
+def build_message(
+    sender: str,
+    recipient: str,
+    subject: str,
+    body: str,
+    html_body: Optional[str] = None
+) -> MIMEMultipart:
+    """Construye el mensaje MIME con las partes de texto plano y HTML"""
+    message = alternative_part(body, html_body)
+    message["From"] = sender
+    message["To"] = recipient
+    message["Subject"] = subject
+    
+    return message
+
+
+def send_stream(server: smtplib.SMTP, sender: str, recipient: str, chunks: Iterable[bytes]) -> None:
+    """
+    Transacción SMTP con el contenido por partes (como SMTP.sendmail, pero
+    sin tener el mensaje entero en memoria)
+    
+    Las partes ya vienen con líneas CRLF y dot-stuffing; la última termina en CRLF.
+    """
+    server.ehlo_or_helo_if_needed()
+    
+    code, response = server.mail(sender)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, response, sender)
+    
+    code, response = server.rcpt(recipient)
+    if code not in (250, 251):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused({recipient: (code, response)})
+    
+    code, response = server.docmd("DATA")
+    if code != 354:
+        server.rset()
+        raise smtplib.SMTPDataError(code, response)
+    
+    for chunk in chunks:
+        server.send(chunk)
+    server.send(b".\r\n")
+    
+    code, response = server.getreply()
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPDataError(code, response)
 
 
 class MockEmailSender(IEmailSender):
@@ -112,15 +270,18 @@ class MockEmailSender(IEmailSender):
         recipient: str,
         subject: str,
         body: str,
-        html_body: Optional[str] = None
+        html_body: Optional[str] = None,
+        attachments: Sequence[Attachment] = ()
     ) -> bool:
         """Simula el envío de un email (para desarrollo/testing)"""
-        print("=" * 60)
-        print(f"📧 MOCK EMAIL")
-        print(f"Para: {recipient}")
-        print(f"Asunto: {subject}")
-        print(f"Cuerpo: {body[:100]}...")
-        if html_body:
-            print(f"HTML: {html_body[:100]}...")
-        print("=" * 60)
+        logger.info(
+            "Mock email",
+            extra={
+                "recipient": recipient,
+                "subject": subject,
+                "body_preview": body[:100],
+                "html_preview": html_body[:100] if html_body else None,
+                "attachments": [f"{a.filename} ({a.size} bytes)" for a in attachments]
+            }
+        )
         return True
\ No newline at end of file
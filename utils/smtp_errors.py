@@ -0,0 +1,39 @@
+import smtplib
+from interfaces.email_interfaces import EmailDeliveryError
+from utils.async_smtp_client import SMTPResponseError
+
+
+# Comandos cuyo rechazo 5xx depende del mensaje o del destinatario.
+# Un 5xx en EHLO, STARTTLS o AUTH es un problema de configuración del relay:
+# se trata como transitorio para no descartar emails mientras se corrige.
+MESSAGE_COMMANDS = ("MAIL FROM", "RCPT TO", "DATA", "DATA END")
+
+
+def classify_smtp_error(error: Exception) -> EmailDeliveryError:
+    """
+    Convierte un error de smtplib o de AsyncSMTPClient en EmailDeliveryError
+
+    Los rechazos 5xx del sobre o del contenido son permanentes; los 4xx,
+    los errores de conexión y cualquier otro error son transitorios.
+    """
+    if isinstance(error, EmailDeliveryError):
+        return error
+
+    code = None
+    permanent = False
+
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        code = max(codes) if codes else None
+        permanent = bool(codes) and all(c >= 500 for c in codes)
+    elif isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        code = error.smtp_code
+        permanent = 500 <= code < 600
+    elif isinstance(error, smtplib.SMTPResponseException):
+        # EHLO, STARTTLS, AUTH, NOOP...: igual que fuera de MESSAGE_COMMANDS
+        code = error.smtp_code
+    elif isinstance(error, SMTPResponseError):
+        code = error.code or None
+        permanent = 500 <= error.code < 600 and error.command in MESSAGE_COMMANDS
+
+    return EmailDeliveryError(str(error) or type(error).__name__, permanent=permanent, code=code)
@@ -0,0 +1,258 @@
+import asyncio
+import smtplib
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List
+from utils.async_smtp_client import AsyncSMTPClient, SMTPResponseError
+
+# Rechazos del servidor (sobre o contenido) que dejan la sesión SMTP abierta
+SMTP_REPLY_ERRORS = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+
+
+class PooledSMTPConnection:
+    """Conexión SMTP autenticada junto con sus datos de uso"""
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages_sent = 0
+
+    def close(self) -> None:
+        """Cierra la conexión ignorando errores (puede estar ya caída)"""
+        try:
+            self.smtp.quit()
+        except Exception:
+            try:
+                self.smtp.close()
+            except Exception:
+                pass
+
+
+class SMTPConnectionPool:
+    """
+    Pool de conexiones SMTP ya autenticadas
+    (Single Responsibility: solo administra el ciclo de vida de las conexiones)
+
+    Reutiliza la sesión (EHLO/STARTTLS/LOGIN) entre mensajes. Una conexión se
+    descarta cuando supera `idle_timeout` sin uso, cuando llega a
+    `max_messages` mensajes enviados, cuando falla el NOOP de verificación o
+    cuando se corta (desconexión, error de red o timeout). Si el servidor solo
+    rechaza un mensaje se envía RSET y la conexión vuelve al pool.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], smtplib.SMTP],
+        size: int = 5,
+        idle_timeout: float = 60.0,
+        max_messages: int = 100,
+        health_check_interval: float = 5.0
+    ):
+        """
+        Args:
+            connect: Función que abre y autentica una conexión nueva
+            size: Máximo de conexiones abiertas a la vez
+            idle_timeout: Segundos sin uso tras los cuales se cierra una conexión
+            max_messages: Mensajes enviados tras los cuales se recicla una conexión
+            health_check_interval: Segundos sin uso tras los cuales se verifica
+                la conexión con NOOP antes de reutilizarla
+        """
+        self._connect = connect
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.health_check_interval = health_check_interval
+
+        self._idle: List[PooledSMTPConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self, fresh: bool = False) -> Iterator[smtplib.SMTP]:
+        """
+        Entrega una conexión del pool y la devuelve al terminar.
+        Si el servidor rechaza el mensaje la conexión se limpia con RSET y se
+        devuelve; ante cualquier otro error se descarta.
+
+        Args:
+            fresh: Ignora las conexiones ociosas y abre una nueva
+        """
+        self._slots.acquire()
+        pooled = None
+        try:
+            pooled = self._new_connection() if fresh else self._checkout()
+            yield pooled.smtp
+            pooled.messages_sent += 1
+            self._checkin(pooled)
+        except SMTP_REPLY_ERRORS:
+            if pooled is not None:
+                if self._reset(pooled):
+                    self._checkin(pooled)
+                else:
+                    pooled.close()
+            raise
+        except BaseException:
+            if pooled is not None:
+                pooled.close()
+            raise
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Cierra todas las conexiones ociosas"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            pooled.close()
+
+    def _checkout(self) -> PooledSMTPConnection:
+        """Toma la conexión ociosa más reciente que siga viva o abre una nueva"""
+        while True:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+
+            if pooled is None:
+                return self._new_connection()
+
+            idle_for = time.monotonic() - pooled.last_used
+            if idle_for > self.idle_timeout:
+                pooled.close()
+                continue
+
+            if idle_for > self.health_check_interval and not self._is_alive(pooled):
+                pooled.close()
+                continue
+
+            return pooled
+
+    def _checkin(self, pooled: PooledSMTPConnection) -> None:
+        """Devuelve una conexión al pool o la recicla si ya envió demasiado"""
+        if pooled.messages_sent >= self.max_messages:
+            pooled.close()
+            return
+
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(pooled)
+
+    def _new_connection(self) -> PooledSMTPConnection:
+        return PooledSMTPConnection(self._connect())
+
+    @staticmethod
+    def _is_alive(pooled: PooledSMTPConnection) -> bool:
+        """Verifica la conexión con NOOP"""
+        try:
+            code, _ = pooled.smtp.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(pooled: PooledSMTPConnection) -> bool:
+        """Descarta la transacción rechazada con RSET (False si la sesión no sigue usable, ej: tras un 421)"""
+        try:
+            code, _ = pooled.smtp.rset()
+            return code == 250
+        except Exception:
+            return False
+
+
+class AsyncSMTPConnectionPool:
+    """
+    Versión asyncio de SMTPConnectionPool para AsyncSMTPClient
+    (mismas reglas de reciclaje: idle_timeout, max_messages, NOOP, y RSET
+    tras un SMTPResponseError)
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[AsyncSMTPClient]],
+        size: int = 5,
+        idle_timeout: float = 60.0,
+        max_messages: int = 100,
+        health_check_interval: float = 5.0
+    ):
+        self._connect = connect
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.health_check_interval = health_check_interval
+
+        self._idle: List[PooledSMTPConnection] = []
+        self._slots = asyncio.BoundedSemaphore(size)
+
+    @asynccontextmanager
+    async def connection(self, fresh: bool = False) -> AsyncIterator[AsyncSMTPClient]:
+        """
+        Entrega una conexión del pool y la devuelve al terminar.
+        Si el servidor rechaza el mensaje la conexión se limpia con RSET y se
+        devuelve; ante cualquier otro error se descarta.
+        """
+        async with self._slots:
+            pooled = None
+            try:
+                pooled = await self._new_connection() if fresh else await self._checkout()
+                yield pooled.smtp
+                pooled.messages_sent += 1
+                await self._checkin(pooled)
+            except SMTPResponseError:
+                if pooled is not None:
+                    if await self._reset(pooled):
+                        await self._checkin(pooled)
+                    else:
+                        await pooled.smtp.close()
+                raise
+            except BaseException:
+                if pooled is not None:
+                    await pooled.smtp.close()
+                raise
+
+    async def close(self) -> None:
+        """Cierra todas las conexiones ociosas"""
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await pooled.smtp.quit()
+
+    async def _checkout(self) -> PooledSMTPConnection:
+        while self._idle:
+            pooled = self._idle.pop()
+            idle_for = time.monotonic() - pooled.last_used
+
+            if idle_for > self.idle_timeout:
+                await pooled.smtp.quit()
+                continue
+
+            if idle_for > self.health_check_interval and not await self._is_alive(pooled):
+                await pooled.smtp.close()
+                continue
+
+            return pooled
+
+        return await self._new_connection()
+
+    async def _checkin(self, pooled: PooledSMTPConnection) -> None:
+        if pooled.messages_sent >= self.max_messages:
+            await pooled.smtp.quit()
+            return
+
+        pooled.last_used = time.monotonic()
+        self._idle.append(pooled)
+
+    async def _new_connection(self) -> PooledSMTPConnection:
+        return PooledSMTPConnection(await self._connect())
+
+    @staticmethod
+    async def _is_alive(pooled: PooledSMTPConnection) -> bool:
+        try:
+            return await pooled.smtp.noop() == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    async def _reset(pooled: PooledSMTPConnection) -> bool:
+        try:
+            await pooled.smtp.rset()
+            return True
+        except Exception:
+            return False
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from typing import AsyncContextManager, Callable, Dict, List, Optional
+from interfaces.email_interfaces import EmailSummary, IEmailRepository, StatusUpdate
+
+logger = logging.getLogger(__name__)
+
+
+class StatusWriteBuffer:
+    """
+    Write-behind de los estados de envío
+    (Single Responsibility: agrupa resultados de envío y los escribe juntos)
+
+    Cada envío deja su resultado en memoria; un flusher en segundo plano los
+    guarda cada `flush_interval` segundos (o al juntar `max_items`) con un
+    solo UPDATE, en lugar de una lectura, un UPDATE y un commit por email.
+
+    Mientras un resultado no se escribió, las lecturas del servicio lo
+    superponen a lo que devuelve la base de datos (`overlay`). Al detenerse se
+    escribe lo pendiente. Si el proceso muere sin detenerse se pierden como
+    mucho `flush_interval` segundos de estados. Esos emails siguen en la base
+    como PENDING y reservados (los del outbox por claim_pending, los enviados
+    dentro de la petición porque se crean reservados), así que cuando vence la
+    reserva el outbox los vuelve a tomar y los envía otra vez: la entrega es
+    "al menos una vez", igual que si el proceso muere durante un envío. Por
+    eso solo se usa en los procesos que corren el worker.
+    """
+
+    def __init__(
+        self,
+        repository_scope: Callable[[], AsyncContextManager[IEmailRepository]],
+        flush_interval: float = 0.2,
+        max_items: int = 500
+    ):
+        """
+        Args:
+            repository_scope: Factory de un context manager que entrega un
+                repositorio con su propia sesión de base de datos
+            flush_interval: Segundos que un resultado espera para juntarse con otros
+            max_items: Resultados por UPDATE; al alcanzarlos se escribe sin esperar
+        """
+        self.repository_scope = repository_scope
+        self.flush_interval = flush_interval
+        self.max_items = max_items
+
+        self._pending: Dict[int, StatusUpdate] = {}
+        # Lote que se está escribiendo: sigue visible para las lecturas hasta el commit
+        self._in_flight: Dict[int, StatusUpdate] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Inicia el flusher en segundo plano"""
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="status-flusher")
+
+    async def stop(self) -> None:
+        """Detiene el flusher y escribe los resultados pendientes"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("No se pudieron guardar los estados pendientes", extra={"pending": len(self._pending)})
+
+    async def record(self, update: StatusUpdate) -> None:
+        """
+        Agrega el resultado de un envío
+
+        Sin flusher (no se llamó a start) se escribe en el momento. Con
+        `max_items` pendientes, quien agrega espera a que se escriban
+        (backpressure si la base de datos va lenta).
+        """
+        self._pending[update.email_id] = update
+
+        if self._task is None or len(self._pending) >= self.max_items:
+            await self.flush()
+        else:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        """Escribe los resultados pendientes (los que fallen quedan para el próximo intento)"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            batch, self._pending = self._pending, {}
+            self._in_flight = batch
+            try:
+                updates = list(batch.values())
+                async with self.repository_scope() as repository:
+                    for start in range(0, len(updates), self.max_items):
+                        await repository.apply_status_updates(updates[start:start + self.max_items])
+            except BaseException:
+                # Los valores son absolutos: reescribir lo que sí se guardó no cambia nada
+                for email_id, update in batch.items():
+                    self._pending.setdefault(email_id, update)
+                raise
+            finally:
+                self._in_flight = {}
+
+    def get(self, email_id: int) -> Optional[StatusUpdate]:
+        """Resultado todavía no escrito de un email (None si no hay)"""
+        return self._pending.get(email_id) or self._in_flight.get(email_id)
+
+    def overlay(self, emails: List[EmailSummary]) -> List[EmailSummary]:
+        """Aplica a los emails leídos de la base de datos los resultados que todavía no se escribieron"""
+        if not self._pending and not self._in_flight:
+            return emails
+
+        result = []
+        for email in emails:
+            update = self.get(email.id)
+            if update is not None:
+                email = email._replace(
+                    status=update.status,
+                    error_message=update.error_message,
+                    next_attempt_at=update.next_attempt_at,
+                    attempts=update.attempts,
+                    sent_at=update.sent_at or email.sent_at,
+                    updated_at=update.updated_at
+                )
+            result.append(email)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._in_flight)
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Ventana para juntar los resultados de otros envíos
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error al guardar estados de envío; se reintenta", extra={"pending": len(self._pending)})
+                self._wakeup.set()
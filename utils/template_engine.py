@@ -1,88 +1,340 @@
-from jinja2 import Environment, FileSystemLoader, TemplateNotFound
-from interfaces.email_interfaces import ITemplateEngine
+from collections import OrderedDict, deque
+from itertools import chain, islice
+from interfaces.email_interfaces import ITemplateEngine, RenderResult
 from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+import threading
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+    from jinja2 import Environment, Template
 
 
 class Jinja2TemplateEngine(ITemplateEngine):
     """
     Motor de plantillas usando Jinja2
     (Single Responsibility: solo renderiza plantillas)
+
+    Pensado para crearse una vez por proceso: el Environment guarda hasta
+    `cache_size` plantillas compiladas y, con `auto_reload`, las recompila
+    cuando cambia el mtime del archivo. El bytecode compilado se guarda en
+    disco para que un proceso nuevo no tenga que volver a parsear las plantillas.
+
+    Jinja2 se importa y el Environment se crea en el primer uso: una petición
+    que no renderiza plantillas no paga ese costo en un arranque en frío.
     """
-    
-    def __init__(self, templates_dir: str = "templates"):
+
+    def __init__(
+        self,
+        templates_dir: str = "templates",
+        cache_size: int = 100,
+        auto_reload: bool = True,
+        bytecode_cache_dir: Optional[str] = None,
+        render_workers: int = 0,
+        parallel_threshold: int = 500,
+        chunk_size: int = 100
+    ):
         """
         Inicializa el motor de plantillas
-        
+
         Args:
             templates_dir: Directorio donde se encuentran las plantillas
+            cache_size: Máximo de plantillas compiladas en memoria
+            auto_reload: Verificar el mtime de la plantilla en cada render
+            bytecode_cache_dir: Directorio para el bytecode compilado (None lo desactiva)
+            render_workers: Procesos para render_many (0 o 1 renderiza en el proceso actual)
+            parallel_threshold: Contextos a partir de los cuales render_many usa los procesos
+            chunk_size: Contextos enviados a un proceso en cada tarea
         """
         self.templates_dir = Path(templates_dir)
-        
+        self.cache_size = cache_size
+        self.auto_reload = auto_reload
+        self.bytecode_cache_dir = bytecode_cache_dir
+        self.render_workers = render_workers
+        self.parallel_threshold = parallel_threshold
+        self.chunk_size = chunk_size
+
+        # Pool de procesos para mail-merge (se crea al primer lote grande)
+        self._pool: Optional["ProcessPoolExecutor"] = None
+        self._pool_lock = threading.Lock()
+
         # Crear directorio si no existe
         self.templates_dir.mkdir(exist_ok=True)
+
+        self.bytecode_cache = None
+        self._env: Optional["Environment"] = None
+        self._env_lock = threading.Lock()
+
+    @property
+    def env(self) -> "Environment":
+        """Environment de Jinja2 (se crea en el primer uso)"""
+        if self._env is None:
+            with self._env_lock:
+                if self._env is None:
+                    self._env = self._create_env()
+        return self._env
+
+    def _create_env(self) -> "Environment":
+        from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+        if self.bytecode_cache_dir:
+            Path(self.bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+            self.bytecode_cache = FileSystemBytecodeCache(self.bytecode_cache_dir)
+
         # Configurar Jinja2
-        self.env = Environment(
+        return Environment(
             loader=FileSystemLoader(self.templates_dir),
             autoescape=True,  # Protección contra XSS
             trim_blocks=True,
-            lstrip_blocks=True
+            lstrip_blocks=True,
+            cache_size=self.cache_size,
+            auto_reload=self.auto_reload,
+            bytecode_cache=self.bytecode_cache
         )
-    
+
     def render(self, template_name: str, context: dict) -> str:
         """
         Renderiza una plantilla con el contexto dado
-        
+
         Args:
             template_name: Nombre del archivo de plantilla (ej: "welcome.html")
             context: Diccionario con datos para la plantilla
-            
+
         Returns:
             str: HTML renderizado
-            
+
         Raises:
             TemplateNotFound: Si la plantilla no existe
         """
+        from jinja2 import TemplateNotFound
+
         try:
             template = self.env.get_template(template_name)
-            print(template_name)
-            print(self.templates_dir)
             return template.render(**context)
         except TemplateNotFound:
             raise FileNotFoundError(f"Template '{template_name}' not found in {self.templates_dir}")
-    
+
+    def render_many(self, template_name: str, contexts: Iterable[dict]) -> Iterator[RenderResult]:
+        """
+        Mail-merge: renderiza una plantilla compilada con cada contexto
+
+        Los lotes de hasta `parallel_threshold` contextos se renderizan en este
+        proceso. Los más grandes se reparten en bloques de `chunk_size` entre
+        `render_workers` procesos, con un número acotado de bloques en vuelo,
+        así la memoria no crece con el tamaño del lote.
+
+        Args:
+            template_name: Nombre del archivo de plantilla
+            contexts: Contextos a renderizar (puede ser un generador)
+
+        Returns:
+            Iterator[RenderResult]: Un resultado por contexto, en el mismo orden
+
+        Raises:
+            FileNotFoundError: Si la plantilla no existe
+        """
+        # Compilar (o validar) la plantilla antes de consumir los contextos
+        template = self._get_template(template_name)
+
+        contexts = iter(contexts)
+        head = list(islice(contexts, self.parallel_threshold))
+
+        # Con un solo proceso el pool solo agregaría el costo de serializar los contextos
+        if self.render_workers <= 1 or len(head) < self.parallel_threshold:
+            return _render_contexts(template, chain(head, contexts))
+
+        return self._render_parallel(template_name, chain(head, contexts))
+
+    def _render_parallel(self, template_name: str, contexts: Iterator[dict]) -> Iterator[RenderResult]:
+        """Reparte los contextos entre los procesos y entrega los resultados en orden"""
+        pool = self._get_pool()
+        max_in_flight = self.render_workers * 2
+        pending = deque()
+
+        try:
+            while True:
+                chunk = list(islice(contexts, self.chunk_size))
+                if chunk:
+                    try:
+                        future = pool.submit(_render_chunk, template_name, chunk)
+                    except RuntimeError:
+                        # clear_cache reemplazó el pool durante el lote: los bloques
+                        # ya enviados terminan en el anterior y el resto va al nuevo
+                        pool = self._replacement_pool(pool)
+                        future = pool.submit(_render_chunk, template_name, chunk)
+                    pending.append(future)
+                if pending and (not chunk or len(pending) >= max_in_flight):
+                    yield from pending.popleft().result()
+                if not chunk and not pending:
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _get_template(self, template_name: str) -> "Template":
+        from jinja2 import TemplateNotFound
+
+        try:
+            return self.env.get_template(template_name)
+        except TemplateNotFound:
+            raise FileNotFoundError(f"Template '{template_name}' not found in {self.templates_dir}")
+
+    def _get_pool(self) -> "ProcessPoolExecutor":
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = self._new_pool()
+            return self._pool
+
+    def _new_pool(self) -> "ProcessPoolExecutor":
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+
+        # spawn: no hereda hilos ni conexiones abiertas del proceso de la API
+        return ProcessPoolExecutor(
+            max_workers=self.render_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_render_worker,
+            initargs=(str(self.templates_dir), self.cache_size, self.auto_reload, self.bytecode_cache_dir)
+        )
+
+    def _replacement_pool(self, retired: "ProcessPoolExecutor") -> "ProcessPoolExecutor":
+        """
+        Pool que reemplazó a `retired` en clear_cache
+
+        Raises:
+            RuntimeError: Si no hay reemplazo (close detuvo los procesos)
+        """
+        with self._pool_lock:
+            if self._pool is None or self._pool is retired:
+                raise RuntimeError("Template render pool is closed")
+            return self._pool
+
+    def clear_cache(self) -> None:
+        """Descarta las plantillas compiladas (en memoria, en disco y en los procesos de render)"""
+        # Sin Environment todavía no hay nada compilado en memoria
+        if self._env is not None:
+            self._env.cache.clear()
+        if self.bytecode_cache is not None:
+            self.bytecode_cache.clear()
+        # Los procesos de render tienen su propio cache: se reemplazan por otros.
+        # Un lote en curso termina sus bloques ya enviados en los anteriores
+        # (sin cancelarlos) y envía el resto a los nuevos.
+        with self._pool_lock:
+            retired = self._pool
+            if retired is not None:
+                self._pool = self._new_pool()
+        if retired is not None:
+            retired.shutdown(wait=False)
+
+    def close(self) -> None:
+        """Detiene los procesos de render (al apagar la app: cancela lo pendiente)"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
     def list_templates(self) -> list:
         """Lista todas las plantillas disponibles"""
         return self.env.list_templates()
 
 
 
+# ============================================
+# MAIL-MERGE EN PROCESOS DE RENDER
+# ============================================
+
+# Motor del proceso de render (uno por proceso, creado por el initializer)
+_worker_engine: Optional[Jinja2TemplateEngine] = None
+
+
+def _init_render_worker(templates_dir: str, cache_size: int, auto_reload: bool, bytecode_cache_dir: Optional[str]) -> None:
+    global _worker_engine
+    _worker_engine = Jinja2TemplateEngine(
+        templates_dir=templates_dir,
+        cache_size=cache_size,
+        auto_reload=auto_reload,
+        bytecode_cache_dir=bytecode_cache_dir
+    )
+
+
+def _render_chunk(template_name: str, contexts: List[dict]) -> List[RenderResult]:
+    """Renderiza un bloque de contextos dentro de un proceso de render"""
+    return list(_render_contexts(_worker_engine._get_template(template_name), contexts))
+
+
+def _render_contexts(template: "Template", contexts: Iterable[dict]) -> Iterator[RenderResult]:
+    for context in contexts:
+        try:
+            yield RenderResult(template.render(**context))
+        except Exception as e:
+            yield RenderResult(None, f"{type(e).__name__}: {e}")
+
+
+
 class SimpleTemplateEngine(ITemplateEngine):
     """
     Motor de plantillas simple usando str.format()
     Útil para plantillas muy básicas sin lógica compleja
+
+    Guarda el contenido de hasta `cache_size` plantillas en memoria y, con
+    `auto_reload`, lo vuelve a leer solo si cambió el mtime del archivo.
     """
-    
-    def __init__(self, templates_dir: str = "templates"):
+
+    def __init__(self, templates_dir: str = "templates", cache_size: int = 100, auto_reload: bool = True):
         self.templates_dir = Path(templates_dir)
         self.templates_dir.mkdir(exist_ok=True)
-    
+        self.cache_size = cache_size
+        self.auto_reload = auto_reload
+
+        # nombre -> (mtime, contenido), en orden de uso (LRU)
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
     def render(self, template_name: str, context: dict) -> str:
         """
         Renderiza una plantilla simple usando str.format()
-        
+
         Args:
             template_name: Nombre del archivo de plantilla
             context: Diccionario con datos para la plantilla
-            
+
         Returns:
             str: HTML renderizado
         """
+        return self._load(template_name).format(**context)
+
+    def clear_cache(self) -> None:
+        """Descarta el contenido cacheado de las plantillas"""
+        with self._lock:
+            self._cache.clear()
+
+    def _load(self, template_name: str) -> str:
+        """Retorna el contenido de la plantilla desde el cache o desde disco"""
         template_path = self.templates_dir / template_name
-        
-        if not template_path.exists():
+
+        with self._lock:
+            cached = self._cache.get(template_name)
+            if cached is not None:
+                self._cache.move_to_end(template_name)
+
+        if cached is not None and not self.auto_reload:
+            return cached[1]
+
+        try:
+            mtime = template_path.stat().st_mtime
+        except FileNotFoundError:
             raise FileNotFoundError(f"Template '{template_name}' not found in {self.templates_dir}")
-        
+
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
         with open(template_path, 'r', encoding='utf-8') as f:
             template_content = f.read()
-        
-        return template_content.format(**context)
\ No newline at end of file
+
+        with self._lock:
+            self._cache[template_name] = (mtime, template_content)
+            self._cache.move_to_end(template_name)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return template_content